@@ -0,0 +1,116 @@
+"""
+Start a fleet of simulated agents locally and register them as DeploymentTargets.
+
+    python agent_fleet.py --count 30 --latency-dist lognormal --latency-ms 200 --failure-rate 0.02
+
+Every agent is an agent_server.py subprocess on its own port, or with --host-mode all
+agents share one agent_host.py process. Unknown options are passed through, so all
+simulation flags of agent_server.py are available.
+The fleet (name, url, target id) is written to a JSON manifest for load_test.py.
+Ctrl+C stops all agents.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import requests
+
+AGENT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'agent_server.py')
+HOST_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'agent_host.py')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Launch simulated deployment agents')
+    parser.add_argument('--count', type=int, default=10)
+    parser.add_argument('--base-port', type=int, default=6100)
+    parser.add_argument('--prefix', default='SIM-AGENT', help='Agent/target name prefix')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--manifest', default='fleet.json', help='Where to write the fleet description')
+    parser.add_argument('--no-register', action='store_true', help='Do not create DeploymentTargets')
+    parser.add_argument('--host-mode', action='store_true',
+                        help='Run all agents in one agent_host.py process on --base-port (path-prefix URLs)')
+    return parser.parse_known_args(argv)
+
+
+def register_targets(agents):
+    """Create or update one DeploymentTarget per agent (DB from DATABASE_URL, like app.py)."""
+    from app import create_app
+    from models import db, DeploymentTarget, TargetStatus
+
+    app = create_app()
+    with app.app_context():
+        for agent in agents:
+            target = DeploymentTarget.query.filter_by(name=agent['name']).first()
+            if not target:
+                target = DeploymentTarget(name=agent['name'], url=agent['url'], status=TargetStatus.available)
+                db.session.add(target)
+            else:
+                target.url = agent['url']
+            db.session.flush()
+            agent['target_id'] = target.id
+        db.session.commit()
+
+
+def wait_until_online(agents, timeout=30):
+    deadline = time.time() + timeout
+    pending = list(agents)
+    while pending and time.time() < deadline:
+        still_pending = []
+        for agent in pending:
+            try:
+                requests.get(agent['url'], timeout=1)
+            except requests.exceptions.RequestException:
+                still_pending.append(agent)
+        pending = still_pending
+        if pending:
+            time.sleep(0.2)
+    return pending
+
+
+def main():
+    args, agent_args = parse_args()
+    agents = []
+    processes = []
+    if args.host_mode:
+        for i in range(args.count):
+            name = f'{args.prefix}-{i + 1:03d}'
+            agents.append({'name': name, 'port': args.base_port, 'url': f'http://{args.host}:{args.base_port}/{name}'})
+        cmd = [sys.executable, HOST_SCRIPT, '--host', args.host, '--port', str(args.base_port),
+               '--count', str(args.count), '--prefix', args.prefix] + agent_args
+        processes.append(subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    else:
+        for i in range(args.count):
+            port = args.base_port + i
+            name = f'{args.prefix}-{i + 1:03d}'
+            agents.append({'name': name, 'port': port, 'url': f'http://{args.host}:{port}'})
+            cmd = [sys.executable, AGENT_SCRIPT, '--port', str(port), '--name', name] + agent_args
+            processes.append(subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+
+    try:
+        offline = wait_until_online(agents)
+        if offline:
+            print(f"WARNING: {len(offline)} agents did not come up: {', '.join(a['name'] for a in offline)}")
+        if not args.no_register:
+            register_targets(agents)
+        with open(args.manifest, 'w', encoding='utf-8') as f:
+            json.dump(agents, f, indent=2)
+        ports = args.base_port if args.host_mode else f'{args.base_port}-{args.base_port + args.count - 1}'
+        print(f'{len(agents) - len(offline)} agents running on port(s) {ports}. '
+              f'Manifest: {args.manifest}. Ctrl+C to stop.')
+        while all(p.poll() is None for p in processes):
+            time.sleep(1)
+        print('An agent exited, stopping the fleet.')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in processes:
+            p.terminate()
+        for p in processes:
+            p.wait()
+
+
+if __name__ == '__main__':
+    main()
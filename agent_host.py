@@ -0,0 +1,106 @@
+"""
+Serve many simulated agents from one process.
+
+    python agent_host.py --count 100 --port 7000 --latency-ms 200 --latency-dist lognormal
+
+Each agent is a separate agent_server app with its own history, random generator and
+in-flight counter. Requests are routed by path prefix (http://host:7000/SIM-AGENT-001/deploy)
+or by the first label of the Host header (http://sim-agent-001.localhost:7000/deploy).
+GET / lists the hosted agents. Uses waitress when installed, otherwise werkzeug's
+threaded server.
+"""
+import argparse
+import json
+import logging
+import os
+
+from agent_server import (add_artifact_arguments, add_command_arguments, add_simulation_arguments,
+                          configure_logging, create_agent_app)
+
+
+class AgentHost:
+    """WSGI dispatcher in front of the per-agent Flask apps."""
+
+    def __init__(self, apps):
+        self.apps = apps
+        self._by_key = {name.lower(): app for name, app in apps.items()}
+
+    def __call__(self, environ, start_response):
+        # Host header routing: <agent-name>.<anything>[:port]
+        host = environ.get('HTTP_HOST', '').split(':')[0]
+        if '.' in host:
+            app = self._by_key.get(host.split('.', 1)[0].lower())
+            if app is not None:
+                return app(environ, start_response)
+
+        # Path prefix routing: /<agent-name>/<endpoint>
+        path = environ.get('PATH_INFO', '')
+        segment, _, rest = path.lstrip('/').partition('/')
+        app = self._by_key.get(segment.lower())
+        if app is not None:
+            environ['SCRIPT_NAME'] = environ.get('SCRIPT_NAME', '') + '/' + segment
+            environ['PATH_INFO'] = '/' + rest
+            return app(environ, start_response)
+
+        if path in ('', '/'):
+            return self._respond(start_response, '200 OK', {'service': 'Deployment Agent Host', 'agents': sorted(self.apps)})
+        return self._respond(start_response, '404 NOT FOUND', {'error': f'No agent for {host}{path}'})
+
+    @staticmethod
+    def _respond(start_response, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        start_response(status, [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))])
+        return [body]
+
+
+def build_host(names, options):
+    apps = {}
+    for i, name in enumerate(names):
+        agent_options = argparse.Namespace(**vars(options))
+        if options.seed is not None:
+            agent_options.seed = options.seed + i  # reproducible, but not identical agents
+        if options.artifact_dir:
+            agent_options.artifact_dir = os.path.join(options.artifact_dir, name)  # one store per agent
+        apps[name] = create_agent_app(name, agent_options)
+    return AgentHost(apps)
+
+
+def agent_names(args):
+    if args.names:
+        return [n.strip() for n in args.names.split(',') if n.strip()]
+    return [f'{args.prefix}-{i + 1:03d}' for i in range(args.count)]
+
+
+def serve(wsgi_app, host, port, threads):
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        from werkzeug.serving import make_server
+        logging.getLogger(__name__).warning('waitress not installed, using werkzeug threaded server')
+        make_server(host, port, wsgi_app, threaded=True).serve_forever()
+    else:
+        waitress_serve(wsgi_app, host=host, port=port, threads=threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Host many simulated deployment agents in one process')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7000)
+    parser.add_argument('--count', type=int, default=10)
+    parser.add_argument('--prefix', default='SIM-AGENT', help='Agent name prefix (with --count)')
+    parser.add_argument('--names', default=None, help='Comma separated agent names (overrides --count/--prefix)')
+    parser.add_argument('--threads', type=int, default=64, help='Worker threads (waitress)')
+    add_simulation_arguments(parser)
+    add_command_arguments(parser)
+    add_artifact_arguments(parser)
+    args = parser.parse_args()
+
+    configure_logging()
+    names = agent_names(args)
+    wsgi_app = build_host(names, args)
+    print(f"Agent host serving {len(names)} agents on http://{args.host}:{args.port}/<name>/ ...")
+    serve(wsgi_app, args.host, args.port, args.threads)
+
+
+if __name__ == '__main__':
+    main()
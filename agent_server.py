@@ -1,94 +1,345 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, current_app, has_app_context, make_response, send_file
+from collections import OrderedDict
 from datetime import datetime
+from functools import wraps
+import argparse
 import logging
+import os
+import random
+import threading
+import time
 
-app = Flask(__name__)
+import tracing
+from artifact_cache import ArtifactCache, ArtifactError
 
-import argparse
+def build_parser():
+    parser = argparse.ArgumentParser(description='Deployment Agent Server')
+    parser.add_argument('--port', type=int, default=5001, help='Port to run the agent on')
+    parser.add_argument('--name', type=str, default='Default-Agent', help='Agent/Environment Name')
+    add_simulation_arguments(parser)
+    add_command_arguments(parser)
+    add_artifact_arguments(parser)
+    return parser
+
+def add_command_arguments(parser):
+    # Dedupe of repeated commands (Idempotency-Key header sent by the orchestrator)
+    parser.add_argument('--idempotency-size', type=int, default=1000,
+                        help='How many command results to keep for replay')
+    parser.add_argument('--idempotency-wait', type=float, default=30.0,
+                        help='How long a repeated command waits for the original one still in progress')
+
+def add_artifact_arguments(parser):
+    # Real artifact download on distribute (off by default: distribute is only simulated)
+    parser.add_argument('--artifact-dir', type=str, default=None,
+                        help='Download artifacts on distribute into this content-addressed store')
+    parser.add_argument('--cache-quota-mb', type=float, default=1024.0,
+                        help='Evict least recently used artifacts above this size')
+    parser.add_argument('--download-timeout', type=float, default=30.0, help='Timeout per download request')
+
+def add_simulation_arguments(parser):
+    # Simulation of slow / flaky agents for load testing
+    parser.add_argument('--latency-dist', choices=['fixed', 'uniform', 'normal', 'lognormal', 'exponential'],
+                        default='fixed', help='Distribution of simulated processing time')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Mean (median for lognormal) processing time')
+    parser.add_argument('--latency-spread', type=float, default=0.5,
+                        help='Std dev as a fraction of the mean (normal) or sigma (lognormal)')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of commands answered with HTTP 500')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='Share of commands that hang for --hang-seconds')
+    parser.add_argument('--hang-seconds', type=float, default=30.0, help='How long a "timed out" command hangs')
+    parser.add_argument('--max-concurrent', type=int, default=0, help='Answer HTTP 429 above this many in-flight commands (0 = unlimited)')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible runs')
+    parser.add_argument('--trace-file', type=str, default=None, help='Append OTLP/JSON spans to this file')
+
+class AgentLogFilter(logging.Filter):
+    # Adds the agent name and the orchestrator's correlation ID (if any) to every log line
+    def filter(self, record):
+        record.agent_name = current_app.config.get('AGENT_NAME', '-') if has_app_context() else '-'
+        record.correlation_id = tracing.correlation_id() or '-'
+        return True
+
+def configure_logging():
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - [%(levelname)s] - [%(agent_name)s] - [%(correlation_id)s] - %(message)s')
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(AgentLogFilter())
+
+class IdempotencyTable:
+    """
+    Results of recent commands by idempotency key, bounded (oldest keys are forgotten first).
+    Only successful results are kept; after a failure the next request with the key runs again.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def claim(self, key):
+        """Return (entry, owner). The owner runs the command, everyone else waits for entry['done']."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry, False
+            entry = {'done': threading.Event(), 'result': None}
+            self.entries[key] = entry
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+            return entry, True
+
+    def finish(self, key, entry, result):
+        with self.lock:
+            if result is not None:
+                entry['result'] = result
+            elif self.entries.get(key) is entry:
+                del self.entries[key]
+        entry['done'].set()
+
+class AgentState:
+    """Everything one simulated agent keeps in memory; one instance per agent app."""
+
+    def __init__(self, name, options):
+        self.name = name
+        self.options = options
+        # In-memory history
+        self.history = []
+        self.rng = random.Random(options.seed)
+        self.rng_lock = threading.Lock()
+        self.inflight = 0
+        self.inflight_lock = threading.Lock()
+        self.commands = IdempotencyTable(options.idempotency_size)
+        self.artifacts = ArtifactCache(options.artifact_dir, int(options.cache_quota_mb * 1024 * 1024),
+                                       options.download_timeout) if options.artifact_dir else None
+
+    def sample_latency(self):
+        """Simulated processing time in seconds according to --latency-dist."""
+        opts = self.options
+        mean = opts.latency_ms / 1000.0
+        if mean <= 0:
+            return 0.0
+        with self.rng_lock:
+            if opts.latency_dist == 'uniform':
+                value = self.rng.uniform(0, 2 * mean)
+            elif opts.latency_dist == 'normal':
+                value = self.rng.gauss(mean, mean * opts.latency_spread)
+            elif opts.latency_dist == 'lognormal':
+                value = mean * self.rng.lognormvariate(0, opts.latency_spread)
+            elif opts.latency_dist == 'exponential':
+                value = self.rng.expovariate(1.0 / mean)
+            else:
+                value = mean
+        return max(0.0, value)
+
+def create_agent_app(name, options):
+    """Build the Flask app of one agent. `options` is a namespace from build_parser()."""
+    app = Flask(__name__)
+    app.config['AGENT_NAME'] = name
+    state = AgentState(name, options)
+    app.extensions['agent_state'] = state
+    logger = logging.getLogger(f'agent.{name}')
+
+    # Correlation ID / spans from the orchestrator's headers; own processing time is returned
+    # in X-Agent-Processing-Ms so the orchestrator can tell agent time from network time
+    tracing.init_app(app, 'deployment-agent', options.trace_file, {'agent.name': name}, trace_db=False)
+
+    @app.before_request
+    def start_processing_timer():
+        g.processing_started = time.perf_counter()
+
+    @app.after_request
+    def add_processing_time(response):
+        started = g.pop('processing_started', None)
+        if started is not None:
+            response.headers['X-Agent-Processing-Ms'] = f'{(time.perf_counter() - started) * 1000:.3f}'
+        return response
+
+    def idempotent(operation):
+        """
+        Run a command once per Idempotency-Key. A repeated key gets the stored result of the
+        first run (waiting for it if that is still in progress) instead of doing the work again.
+        """
+        def decorator(f):
+            @wraps(f)
+            def wrapper(*a, **kw):
+                key = request.headers.get('Idempotency-Key')
+                if not key:
+                    return f(*a, **kw)
+                table_key = f'{operation}:{key}'
+                while True:
+                    entry, owner = state.commands.claim(table_key)
+                    if owner:
+                        break
+                    if not entry['done'].wait(options.idempotency_wait):
+                        return jsonify({"status": "in_progress", "message": f"{operation} {key} is still running on {name}"}), 409
+                    if entry['result'] is not None:
+                        body, status = entry['result']
+                        logger.info(f"{operation.upper()} REPLAYED: Idempotency-Key={key}")
+                        response = current_app.response_class(body, status=status, mimetype='application/json')
+                        response.headers['Idempotent-Replayed'] = 'true'
+                        return response
+                    # The first run failed, so this request runs the command itself
+
+                result = None
+                try:
+                    response = make_response(f(*a, **kw))
+                    if 200 <= response.status_code < 300:
+                        result = (response.get_data(), response.status_code)
+                    return response
+                finally:
+                    state.commands.finish(table_key, entry, result)
+            return wrapper
+        return decorator
+
+    def simulated(operation):
+        """
+        Wrap a command endpoint with the configured latency, failures, hangs and throttling.
+        Failed commands are still recorded in the history.
+        """
+        def decorator(f):
+            @wraps(f)
+            def wrapper(*a, **kw):
+                with state.inflight_lock:
+                    if options.max_concurrent and state.inflight >= options.max_concurrent:
+                        logger.warning(f"{operation.upper()} THROTTLED: {state.inflight} commands in flight")
+                        return jsonify({"status": "throttled", "message": f"{name} is busy"}), 429
+                    state.inflight += 1
+                try:
+                    with state.rng_lock:
+                        hang = state.rng.random() < options.timeout_rate
+                        fail = state.rng.random() < options.failure_rate
+                    time.sleep(options.hang_seconds if hang else state.sample_latency())
+                    if fail:
+                        data = request.json or {}
+                        logger.error(f"{operation.upper()} FAILED (simulated): Package={data.get('package')}")
+                        state.history.append({
+                            "type": operation,
+                            "timestamp": datetime.utcnow().isoformat(),
+                            "package": data.get('package'),
+                            "release": data.get('release'),
+                            "status": "failure",
+                            "agent": name,
+                            "correlation_id": tracing.correlation_id()
+                        })
+                        return jsonify({"status": "failure", "message": f"Simulated failure on {name}"}), 500
+                    return f(*a, **kw)
+                finally:
+                    with state.inflight_lock:
+                        state.inflight -= 1
+            return wrapper
+        return decorator
+
+    @app.route('/')
+    def home():
+        return jsonify({
+            "status": "online",
+            "service": "Deployment Agent",
+            "name": name,
+            "history_count": len(state.history),
+            "inflight": state.inflight,
+            "artifacts": state.artifacts.stats() if state.artifacts else None
+        })
+
+    @app.route('/distribute', methods=['POST'])
+    @idempotent('distribute')
+    @simulated('distribute')
+    def distribute():
+        data = request.json
+        package_name = data.get('package')
+        nexus_url = data.get('nexus_url')
+        release_name = data.get('release')
+
+        timestamp = datetime.utcnow().isoformat()
+
+        logger.info(f"DISTRIBUTE STARTED: Release={release_name}, Package={package_name}, URL={nexus_url}")
+
+        record = {
+            "type": "distribute",
+            "timestamp": timestamp,
+            "package": package_name,
+            "release": release_name,
+            "status": "success",
+            "agent": name,
+            "correlation_id": tracing.correlation_id()
+        }
+
+        if state.artifacts and nexus_url:
+            try:
+                with tracing.span('artifact.fetch', url=nexus_url) as span:
+                    artifact = state.artifacts.fetch(nexus_url, data.get('checksum'))
+                    if span is not None:
+                        span['attributes'].update({'artifact.cache_hit': artifact['cache_hit'],
+                                                   'artifact.downloaded_bytes': artifact['downloaded_bytes']})
+            except ArtifactError as e:
+                logger.error(f"DISTRIBUTE FAILED: Package={package_name}: {e}")
+                record.update({"status": "failure", "error": str(e)})
+                state.history.append(record)
+                return jsonify({"status": "failure", "message": str(e)}), 502
+            record.update({key: artifact[key] for key in ('digest', 'size', 'cache_hit', 'downloaded_bytes', 'resumed')})
+            logger.info(f"ARTIFACT {'CACHED' if artifact['cache_hit'] else 'DOWNLOADED'}: {os.path.basename(nexus_url)} "
+                        f"sha256={artifact['digest']} ({artifact['size']} bytes)")
+
+        logger.info(f"DISTRIBUTE COMPLETED: Release={release_name}, Package={package_name}")
+        state.history.append(record)
+
+        return jsonify({"status": "success", "message": f"Distribution of {package_name} completed on {name}",
+                        "digest": record.get("digest"), "cache_hit": record.get("cache_hit")}), 200
+
+    @app.route('/deploy', methods=['POST'])
+    @idempotent('deploy')
+    @simulated('deploy')
+    def deploy():
+        data = request.json
+        package_name = data.get('package')
+        nexus_url = data.get('nexus_url')
+        release_name = data.get('release')
+
+        timestamp = datetime.utcnow().isoformat()
+
+        logger.info(f"DEPLOY STARTED: Release={release_name}, Package={package_name}")
+
+        # Simulate work...
+
+        logger.info(f"DEPLOY COMPLETED: Release={release_name}, Package={package_name}")
+
+        record = {
+            "type": "deploy",
+            "timestamp": timestamp,
+            "package": package_name,
+            "release": release_name,
+            "status": "success",
+            "agent": name,
+            "correlation_id": tracing.correlation_id()
+        }
+        state.history.append(record)
+
+        return jsonify({"status": "success", "message": f"Deployment of {package_name} completed on {name}"}), 200
+
+    @app.route('/artifacts/<digest>', methods=['GET'])
+    def get_artifact(digest):
+        # Lets other agents pull an artifact from this one (fan-out distribution); streamed, Range capable
+        path = state.artifacts.object_path(digest.lower()) if state.artifacts else None
+        if path is None:
+            return jsonify({"status": "failure", "message": f"Artifact {digest} not held by {name}"}), 404
+        return send_file(path, mimetype='application/octet-stream', conditional=True, etag=digest.lower())
+
+    @app.route('/history', methods=['GET'])
+    def get_history():
+        # ?limit= (max 5000) pages through the append-only history from ?offset=:
+        # {"items", "next_offset" (null on the last page), "total"}. Without it: the whole list.
+        limit = request.args.get('limit', type=int)
+        if not limit:
+            return jsonify(state.history)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        total = len(state.history)
+        items = state.history[offset:offset + min(limit, 5000)]
+        next_offset = offset + len(items)
+        return jsonify({"items": items, "next_offset": next_offset if next_offset < total else None, "total": total})
 
-# Parse arguments
-parser = argparse.ArgumentParser(description='Deployment Agent Server')
-parser.add_argument('--port', type=int, default=5001, help='Port to run the agent on')
-parser.add_argument('--name', type=str, default='Default-Agent', help='Agent/Environment Name')
-args = parser.parse_args()
-
-AGENT_NAME = args.name
-PORT = args.port
-
-# Configure logging
-logging.basicConfig(level=logging.INFO, format=f'%(asctime)s - [%(levelname)s] - [{AGENT_NAME}] - %(message)s')
-logger = logging.getLogger(__name__)
-
-# In-memory history
-history = []
-
-@app.route('/')
-def home():
-    return jsonify({
-        "status": "online",
-        "service": "Deployment Agent",
-        "name": AGENT_NAME,
-        "history_count": len(history)
-    })
-
-@app.route('/distribute', methods=['POST'])
-def distribute():
-    data = request.json
-    package_name = data.get('package')
-    nexus_url = data.get('nexus_url')
-    release_name = data.get('release')
-    
-    timestamp = datetime.utcnow().isoformat()
-    
-    logger.info(f"DISTRIBUTE STARTED: Release={release_name}, Package={package_name}, URL={nexus_url}")
-    
-    # Simulate work...
-    
-    logger.info(f"DISTRIBUTE COMPLETED: Release={release_name}, Package={package_name}")
-    
-    record = {
-        "type": "distribute",
-        "timestamp": timestamp,
-        "package": package_name,
-        "release": release_name,
-        "status": "success",
-        "agent": AGENT_NAME
-    }
-    history.append(record)
-    
-    return jsonify({"status": "success", "message": f"Distribution of {package_name} completed on {AGENT_NAME}"}), 200
-
-@app.route('/deploy', methods=['POST'])
-def deploy():
-    data = request.json
-    package_name = data.get('package')
-    nexus_url = data.get('nexus_url')
-    release_name = data.get('release')
-    
-    timestamp = datetime.utcnow().isoformat()
-    
-    logger.info(f"DEPLOY STARTED: Release={release_name}, Package={package_name}")
-    
-    # Simulate work...
-    
-    logger.info(f"DEPLOY COMPLETED: Release={release_name}, Package={package_name}")
-    
-    record = {
-        "type": "deploy",
-        "timestamp": timestamp,
-        "package": package_name,
-        "release": release_name,
-        "status": "success",
-        "agent": AGENT_NAME
-    }
-    history.append(record)
-    
-    return jsonify({"status": "success", "message": f"Deployment of {package_name} completed on {AGENT_NAME}"}), 200
-
-@app.route('/history', methods=['GET'])
-def get_history():
-    return jsonify(history)
+    return app
 
 if __name__ == '__main__':
-    print(f"Agent Server '{AGENT_NAME}' running on port {PORT}...")
-    app.run(port=PORT, debug=True, use_reloader=False)
+    args = build_parser().parse_args()
+    configure_logging()
+    app = create_agent_app(args.name, args)
+    print(f"Agent Server '{args.name}' running on port {args.port}...")
+    app.run(port=args.port, debug=True, use_reloader=False, threaded=True)
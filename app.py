@@ -1,20 +1,75 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, g
-from models import db, User, Role, Release, Package, DeploymentTarget, ScheduledDeployment, PackageDeployment, EventLog, ReleaseDeploymentStatus, PackageStatus, PackageDeploymentStatus, TargetStatus
-from datetime import datetime, date
-import os
+from flask import Flask, Response, abort, render_template, request, redirect, url_for, flash, jsonify, session, g, stream_with_context
+from models import db, package_dependencies, User, Role, Release, Package, DeploymentTarget, ScheduledDeployment, ScheduleRun, PackageDeployment, EventLog, DeploymentAttempt, TargetLease, ReleaseDeploymentStatus, PackageStatus, PackageDeploymentStatus, TargetStatus, upgrade_schema
+from dependency_graph import dependency_graph, mark_dirty as mark_dependency_graph_dirty
+from deployment_plan import build_deployment_plan
+from schedule_executor import schedule_executor, window_bounds
+from schedule_index import schedule_index
+from leases import acquire_all, current_leases, lease_owner, LeaseBusy, LeaseLost
+from config import load_config
+from event_archive import EventArchive
+from deployment_history import ensure_baseline, naive_utc, record_transitions, snapshot
+from deployment_diff import DeploymentDiff, DIRECTIONS, PRESENCE, Side
+import export
+import invalidation
+import metrics
+import profiler
+import reconcile
+import tracing
+from datetime import datetime, date, timedelta
+from sqlalchemy import event, func, case, and_, or_, insert, literal, select, Table, MetaData, Column, Integer
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.exc import StaleDataError
+import math
+import time
 import requests
 from functools import wraps
 
 app = Flask(__name__)
-# Use a secret key for flash messages
-app.config['SECRET_KEY'] = 'dev-secret-key'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///release_orchestrator.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-db.init_app(app)
 
-with app.app_context():
-    db.create_all()
+def _enable_sqlite_wal(dbapi_connection, connection_record):
+    # Readers in one worker do not block the writer in another
+    dbapi_connection.execute('PRAGMA journal_mode=WAL')
+
+
+def create_app(overrides=None):
+    """
+    Configure the app from the environment (see config.py) plus `overrides`, set up the
+    extensions and the database, and return it. Routes live on the module-level `app`, so
+    there is one application per process: wsgi.py calls this in every worker, scripts and
+    `python app.py` call it before use. Later calls return the same app.
+    """
+    if 'sqlalchemy' in app.extensions:
+        if overrides:
+            raise RuntimeError('create_app() with overrides must be the first call in the process')
+        return app
+
+    app.config.update(load_config(app.instance_path))
+    app.config.update(overrides or {})
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+        options.setdefault('connect_args', {}).setdefault('timeout', app.config['SQLITE_BUSY_TIMEOUT'])
+
+    db.init_app(app)
+    metrics.init_app(app)
+    profiler.init_app(app)
+    tracing.init_app(app, 'release-orchestrator', app.config['TRACE_EXPORT_FILE'])
+
+    with app.app_context():
+        if app.config['SQLITE_WAL'] and db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', _enable_sqlite_wal)
+        try:
+            db.create_all()
+            upgrade_schema()
+        except OperationalError:
+            # Workers starting together race on CREATE/ALTER; the second pass sees the result
+            db.create_all()
+            upgrade_schema()
+        ensure_baseline()
+        invalidation.init_app(app, db.engine)
+    schedule_executor.init_app(app, run_scheduled_deployment)
+    return app
 
 def update_release_status(release):
     packages = release.packages
@@ -50,28 +105,114 @@ def log_event(category, operation, description):
     
     # Let's trust route commit.
 
-def call_agent(target_url, endpoint, payload):
+def _session_holds_write_lock():
+    """True if the session's SQLite connection has written in its open transaction (SQLite has a single writer)."""
+    session = db.session()
+    if db.engine.dialect.name != 'sqlite' or not session.in_transaction():
+        return False
+    # pysqlite only begins a transaction before the first write
+    return session.connection().connection.driver_connection.in_transaction
+
+def record_deployment_attempt(package_id, target_id, operation, started_at, latency, success, error=None):
+    """
+    Append one DeploymentAttempt row, numbered per (package, target, operation).
+    The row is inserted and committed on a connection of its own, so it survives a caller
+    that returns early or rolls back, and the caller's pending changes are not committed
+    with it. Only if the caller has already written in its transaction (on SQLite the
+    other connection would wait for that lock) does the row join the caller's transaction.
+    """
+    next_attempt = select(func.coalesce(func.max(DeploymentAttempt.attempt), 0) + 1).where(
+        DeploymentAttempt.package_id == package_id,
+        DeploymentAttempt.target_id == target_id,
+        DeploymentAttempt.operation == operation
+    ).scalar_subquery()
+    statement = insert(DeploymentAttempt).values(
+        package_id=package_id,
+        target_id=target_id,
+        operation=operation,
+        attempt=next_attempt,
+        started_at=started_at,
+        finished_at=datetime.utcnow(),
+        latency_seconds=latency,
+        outcome='success' if success else 'failure',
+        error=error[:255] if error else None
+    )
+    if _session_holds_write_lock():
+        db.session.execute(statement)
+        return
+    with db.engine.begin() as conn:
+        conn.execute(statement)
+
+def idempotency_key(package_id, target_id, operation):
+    """
+    Idempotency-Key of the next command for (package, target, operation).
+    The generation only moves on with a successful attempt, so retries after a failure or
+    timeout reuse the key (the agent replays its result), while a deliberate redeploy
+    after a success gets a new one.
+    """
+    with db.session.no_autoflush:  # a lookup, no reason to take the caller's write lock
+        generation = DeploymentAttempt.query.filter_by(
+            package_id=package_id, target_id=target_id, operation=operation, outcome='success').count()
+    return f'pkg{package_id}.tgt{target_id}.{operation}.g{generation}'
+
+def lease_targets(target_ids, operation, ttl=None):
+    """Lease the targets of a bulk operation (LeaseBusy if another operation holds one of them)."""
+    user = g.get('user')
+    return acquire_all(target_ids, lease_owner(user.username if user else None), operation,
+                       ttl=ttl or app.config['LEASE_TTL_SECONDS'], wait=app.config['LEASE_WAIT_SECONDS'])
+
+def agent_base_url(target_url):
+    # Ensure URL has scheme, remove trailing slash if present
+    if not target_url.startswith('http'):
+        target_url = f'http://{target_url}'
+    return target_url.rstrip('/')
+
+def call_agent(target_url, endpoint, payload, target_id=None, package_id=None, timeout=5, reply=None):
     """
     Helper to call the agent server.
     Returns (success, message)
+    If target_id and package_id are given, every call is appended to the DeploymentAttempt
+    history (which deployment plans estimate from) and carries an Idempotency-Key. A dict passed as `reply` receives the agent's JSON answer.
     """
-    try:
-        # Ensure URL has scheme
-        if not target_url.startswith('http'):
-            target_url = f'http://{target_url}'
-            
-        # Remove trailing slash if present
-        target_url = target_url.rstrip('/')
-        
-        url = f"{target_url}/{endpoint}"
-        response = requests.post(url, json=payload, timeout=5)
-        
-        if response.status_code == 200:
-            return True, "Agent accepted command"
-        else:
-            return False, f"Agent returned status {response.status_code}"
-    except requests.exceptions.RequestException as e:
-        return False, f"Agent connection failed: {str(e)}"
+    headers = {}
+    if target_id is not None and package_id is not None:
+        headers['Idempotency-Key'] = idempotency_key(package_id, target_id, endpoint)
+    started_at = datetime.utcnow()
+    started = time.perf_counter()
+    with tracing.span(f'agent.{endpoint}', tracing.SPAN_KIND_CLIENT,
+                      **{'agent.url': target_url, 'package': payload.get('package'),
+                         'idempotency_key': headers.get('Idempotency-Key')}) as span:
+        headers.update(tracing.outgoing_headers())  # traceparent of the client span
+        try:
+            target_url = agent_base_url(target_url)
+            url = f"{target_url}/{endpoint}"
+            response = requests.post(url, json=payload, headers=headers, timeout=timeout)
+            if reply is not None and response.headers.get('Content-Type', '').startswith('application/json'):
+                reply.update(response.json())
+
+            if response.status_code == 200:
+                success, msg, result = True, "Agent accepted command", 'success'
+            else:
+                success, msg, result = False, f"Agent returned status {response.status_code}", f'http_{response.status_code}'
+            agent_ms = response.headers.get('X-Agent-Processing-Ms')
+        except requests.exceptions.RequestException as e:
+            success, msg, result = False, f"Agent connection failed: {str(e)}", type(e).__name__
+            agent_ms = None
+
+        elapsed = time.perf_counter() - started
+        if span is not None:
+            # Split the call into agent work and everything else (network, queuing)
+            span['attributes']['agent.result'] = result
+            if agent_ms is not None:
+                span['attributes']['agent.processing_ms'] = float(agent_ms)
+                span['attributes']['network.overhead_ms'] = round(elapsed * 1000 - float(agent_ms), 3)
+            if not success:
+                span['status'] = tracing.STATUS_ERROR
+
+    metrics.observe_agent_call(target_url, endpoint, elapsed, result)
+    if target_id is not None and package_id is not None:
+        record_deployment_attempt(package_id, target_id, endpoint, started_at, elapsed, success, None if success else msg)
+    return success, msg
 
 # Authentication Logic
 @app.before_request
@@ -192,6 +333,8 @@ def delete_target(target_id):
          return redirect(url_for('targets'))
 
     name = target.name
+    DeploymentAttempt.query.filter_by(target_id=target_id).delete()
+    TargetLease.query.filter_by(target_id=target_id).delete()
     db.session.delete(target)
     log_event('target', 'delete', f'Deleted target {name}')
     db.session.commit()
@@ -226,6 +369,133 @@ def update_release(release_id):
     flash(f'Release "{release.name}" updated successfully.', 'success')
     return redirect(url_for('release_detail', release_id=release.id))
 
+def clone_release(source, name, description=None):
+    """
+    Copy a release with its packages (reset to registered) and the dependency edges between them
+    using INSERT ... SELECT. Old and new package ids are paired by their rank in id order (the copies
+    are inserted in that order) in a temporary table, which the edge copy then joins on its primary
+    key. Returns (release, package_count, edge_count).
+    """
+    clone = Release(name=name, description=description if description is not None else source.description,
+                    manager=source.manager, deputy=source.deputy)
+    db.session.add(clone)
+    db.session.flush()
+
+    copied = db.session.execute(Package.__table__.insert().from_select(
+        ['name', 'url', 'status', 'release_id'],
+        select(Package.name, Package.url, literal(PackageStatus.registered.name), literal(clone.id))
+        .where(Package.release_id == source.id).order_by(Package.id)
+    ))
+
+    def ranked(release_id):
+        return (select(Package.id, func.row_number().over(order_by=Package.id).label('n'))
+                .where(Package.release_id == release_id).subquery())
+
+    id_map = Table('clone_package_map', MetaData(), Column('old_id', Integer, primary_key=True),
+                   Column('new_id', Integer, nullable=False), prefixes=['TEMPORARY'])
+    connection = db.session.connection()
+    id_map.create(connection)
+    try:
+        old, new = ranked(source.id), ranked(clone.id)
+        db.session.execute(id_map.insert().from_select(
+            ['old_id', 'new_id'], select(old.c.id, new.c.id).join(new, new.c.n == old.c.n)))
+        requirer, provider = id_map.alias('requirer'), id_map.alias('provider')
+        linked = db.session.execute(package_dependencies.insert().from_select(
+            ['requirer_id', 'provider_id'],
+            select(requirer.c.new_id, provider.c.new_id)
+            .select_from(requirer)
+            .join(package_dependencies, package_dependencies.c.requirer_id == requirer.c.old_id)
+            .join(provider, provider.c.old_id == package_dependencies.c.provider_id)
+        ))
+    finally:
+        id_map.drop(connection)
+    mark_dependency_graph_dirty(db.session)
+    return clone, copied.rowcount, linked.rowcount
+
+@app.route('/release/<int:release_id>/clone', methods=['POST'])
+@requires_role(Role.release_manager)
+def clone_release_route(release_id):
+    source = Release.query.get_or_404(release_id)
+    name = request.form.get('name', '').strip()
+    if not name:
+        flash('A name for the new release is required.', 'error')
+        return redirect(url_for('release_detail', release_id=release_id))
+    if Release.query.filter_by(name=name).first():
+        flash(f'Release "{name}" already exists!', 'error')
+        return redirect(url_for('release_detail', release_id=release_id))
+
+    clone, packages, edges = clone_release(source, name, request.form.get('description') or None)
+    log_event('release', 'clone', f'Cloned release {source.name} as {name} ({packages} packages, {edges} dependencies)')
+    db.session.commit()
+    flash(f'Release "{name}" created from {source.name} with {packages} packages and {edges} dependencies.', 'success')
+    return redirect(url_for('release_detail', release_id=clone.id))
+
+def distribute_release_to_target(release, target, origin='Bulk', deadline=None, lease=None):
+    """
+    Distribute every package of the release that is not yet on the target.
+    Packages are not started after `deadline` (UTC). With a lease, it is kept alive
+    per package and every package is committed on its own.
+    Returns (count, errors); commits.
+    """
+    count = 0
+    errors = []
+    for pkg in release.packages:
+        if deadline is not None and datetime.utcnow() >= deadline:
+            errors.append(f'Window closed before {pkg.name}; remaining packages not started')
+            break
+        if lease is not None:
+            lease.heartbeat()
+        with tracing.span('package.distribute', package=pkg.name, release=release.name, target=target.name):
+            # Check if already distributed/deployed to this target
+            deployment = PackageDeployment.query.filter_by(package_id=pkg.id, target_id=target.id).first()
+        
+            if not deployment:
+                # Create new deployment
+            
+                # Call Agent
+                payload = {
+                    'package': pkg.name,
+                    'nexus_url': pkg.url,
+                    'release': release.name
+                }
+                success, msg = call_agent(target.url, 'distribute', payload, target_id=target.id, package_id=pkg.id)
+            
+                if not success:
+                   errors.append(f"{pkg.name}: {msg}")
+                   continue
+               
+                deployment = PackageDeployment(package_id=pkg.id, target_id=target.id, status=PackageDeploymentStatus.distributed)
+                db.session.add(deployment)
+                count += 1
+                log_event('package', 'distribute', f'Distributed {pkg.name} to {target.name} ({origin})')
+                if lease is not None:
+                    db.session.commit()
+            elif deployment.status == PackageDeploymentStatus.not_deployed:
+                # Re-distribute (e.g. from fallback)
+            
+                # Call Agent
+                payload = {
+                    'package': pkg.name,
+                    'nexus_url': pkg.url,
+                    'release': release.name
+                }
+                success, msg = call_agent(target.url, 'distribute', payload, target_id=target.id, package_id=pkg.id)
+            
+                if not success:
+                    errors.append(f"{pkg.name}: {msg}")
+                    continue
+
+                deployment.status = PackageDeploymentStatus.distributed
+                deployment.deployed_at = datetime.utcnow()
+                count += 1
+                log_event('package', 'distribute', f'Re-distributed {pkg.name} to {target.name} ({origin})')
+                if lease is not None:
+                    db.session.commit()
+            
+    db.session.commit()
+    update_release_status(release)
+    return count, errors
+
 @app.route('/release/<int:release_id>/distribute_all', methods=['POST'])
 @requires_role(Role.deployer)
 def distribute_release_all(release_id):
@@ -242,86 +512,229 @@ def distribute_release_all(release_id):
         flash(f'Target {target.name} is LOCKED. Distribution prevented.', 'error')
         return redirect(url_for('release_detail', release_id=release_id))
         
+    try:
+        with lease_targets([target.id], 'distribute_all') as lease:
+            count, errors = distribute_release_to_target(release, target, lease=lease)
+    except LeaseBusy as e:
+        flash(f'Distribution prevented: {e}', 'error')
+        return redirect(url_for('release_detail', release_id=release_id))
+    except (LeaseLost, StaleDataError) as e:
+        flash(f'Distribution aborted, {target.name} was changed concurrently: {e}', 'error')
+        return redirect(url_for('release_detail', release_id=release_id))
+    
+    if count > 0:
+        if errors:
+             flash(f'Distributed {count} packages to {target.name}. Errors: {", ".join(errors)}', 'warning')
+        else:
+             flash(f'Distributed {count} packages to {target.name}.', 'success')
+    else:
+        if errors:
+            flash(f'No packages distributed. Errors: {", ".join(errors)}', 'error')
+        else:
+            flash('No applicable packages to distribute.', 'warning')
+        
+    return redirect(url_for('release_detail', release_id=release_id))
+
+def fanout_release(release, targets, seed, fanout, lease):
+    """
+    Fan-out distribution of every package that is missing on some of the targets (see
+    distribute_release_fanout). Returns (count, errors, nexus_fetches); commits per package.
+    The lease is renewed before every agent call, and its TTL must exceed FANOUT_AGENT_TIMEOUT.
+    """
+    timeout = app.config['FANOUT_AGENT_TIMEOUT']
     count = 0
     errors = []
-    for pkg in release.packages:
-        # Check if already distributed/deployed to this target
-        deployment = PackageDeployment.query.filter_by(package_id=pkg.id, target_id=target.id).first()
-        
+    nexus_fetches = 0
+
+    def mark_distributed(pkg, target, deployment, source):
         if not deployment:
-            # Create new deployment
-            
-            # Call Agent
-            payload = {
-                'package': pkg.name,
-                'nexus_url': pkg.url,
-                'release': release.name
-            }
-            success, msg = call_agent(target.url, 'distribute', payload)
-            
-            if not success:
-               errors.append(f"{pkg.name}: {msg}")
-               continue
-               
-            deployment = PackageDeployment(package_id=pkg.id, target_id=target.id, status=PackageDeploymentStatus.distributed)
-            db.session.add(deployment)
-            count += 1
-            log_event('package', 'distribute', f'Distributed {pkg.name} to {target.name} (Bulk)')
-        elif deployment.status == PackageDeploymentStatus.not_deployed:
-            # Re-distribute (e.g. from fallback)
-            
-            # Call Agent
-            payload = {
-                'package': pkg.name,
-                'nexus_url': pkg.url,
-                'release': release.name
-            }
-            success, msg = call_agent(target.url, 'distribute', payload)
-            
+            db.session.add(PackageDeployment(package_id=pkg.id, target_id=target.id, status=PackageDeploymentStatus.distributed))
+            log_event('package', 'distribute', f'Distributed {pkg.name} to {target.name} via {source} (Fan-out)')
+        else:
+            deployment.status = PackageDeploymentStatus.distributed
+            deployment.deployed_at = datetime.utcnow()
+            log_event('package', 'distribute', f'Re-distributed {pkg.name} to {target.name} via {source} (Fan-out)')
+
+    for pkg in release.packages:
+        deployments = {d.target_id: d for d in PackageDeployment.query.filter(
+            PackageDeployment.package_id == pkg.id, PackageDeployment.target_id.in_([t.id for t in targets]))}
+        # Same rule as distribute_all: new, or back to distributed after a fallback
+        receivers = [t for t in targets if t.id not in deployments
+                     or deployments[t.id].status == PackageDeploymentStatus.not_deployed]
+        if not receivers:
+            continue
+
+        with tracing.span('package.fanout', package=pkg.name, release=release.name, receivers=len(receivers)):
+            # Hop 1: Nexus -> seed
+            lease.heartbeat(force=True)
+            reply = {}
+            payload = {'package': pkg.name, 'nexus_url': pkg.url, 'release': release.name}
+            success, msg = call_agent(seed.url, 'distribute', payload, target_id=seed.id, package_id=pkg.id,
+                                      timeout=timeout, reply=reply)
+            nexus_fetches += 1
+            digest = reply.get('digest')
+            if success and not digest:
+                success, msg = False, 'seed agent has no artifact store (--artifact-dir)'
             if not success:
-                errors.append(f"{pkg.name}: {msg}")
+                errors.append(f"{pkg.name}: seed {seed.name}: {msg}")
                 continue
+            if seed in receivers:
+                receivers.remove(seed)
+                mark_distributed(pkg, seed, deployments.get(seed.id), 'Nexus')
+                count += 1
+
+            # Further hops: every holder serves up to `fanout` receivers per round
+            holders = [seed]
+            while receivers:
+                pairs = []
+                for source in holders:
+                    pairs.extend((source, receivers.pop(0)) for _ in range(min(fanout, len(receivers))))
+                new_holders = []
+                for source, target in pairs:
+                    # Relays run one after another, each up to `timeout`: renew before every call
+                    lease.heartbeat(force=True)
+                    reply = {}
+                    payload = {'package': pkg.name, 'nexus_url': f'{agent_base_url(source.url)}/artifacts/{digest}',
+                               'checksum': digest, 'release': release.name}
+                    success, msg = call_agent(target.url, 'distribute', payload, target_id=target.id, package_id=pkg.id,
+                                              timeout=timeout, reply=reply)
+                    if success and reply.get('digest') != digest:
+                        success, msg = False, f"checksum mismatch (got {reply.get('digest')})"
+                    if not success:
+                        errors.append(f"{pkg.name}: {target.name} from {source.name}: {msg}")
+                        continue
+                    mark_distributed(pkg, target, deployments.get(target.id), source.name)
+                    new_holders.append(target)
+                    count += 1
+                holders.extend(new_holders)
+        db.session.commit()
 
-            deployment.status = PackageDeploymentStatus.distributed
-            deployment.deployed_at = datetime.utcnow()
-            count += 1
-            log_event('package', 'distribute', f'Re-distributed {pkg.name} to {target.name} (Bulk)')
-            
-    db.session.commit()
     update_release_status(release)
-    
+    return count, errors, nexus_fetches
+
+@app.route('/release/<int:release_id>/distribute_fanout', methods=['POST'])
+@requires_role(Role.deployer)
+def distribute_release_fanout(release_id):
+    """
+    Distribute a release to many targets while fetching every artifact from Nexus only once.
+    The seed agent downloads the package, then every agent that holds it serves up to
+    `fanout` further agents per round from its artifact store (a growing tree). The
+    relays are issued one after another, so the tree saves Nexus egress, not time. Agents
+    verify the SHA-256 while downloading; the orchestrator checks every reported digest
+    against the seed's. Needs agents started with --artifact-dir.
+    """
+    release = Release.query.get_or_404(release_id)
+    target_ids = [int(t) for t in request.form.getlist('target_ids') if t.isdigit()]
+    fanout = max(1, request.form.get('fanout', 3, type=int))
+    targets = DeploymentTarget.query.filter(DeploymentTarget.id.in_(target_ids)).order_by(DeploymentTarget.name).all()
+    seed = DeploymentTarget.query.get(request.form.get('seed_target_id', type=int) or 0) or (targets[0] if targets else None)
+
+    if not targets or seed is None:
+        flash('No targets selected for distribution.', 'error')
+        return redirect(url_for('release_detail', release_id=release_id))
+
+    locked = [t.name for t in targets + [seed] if t.status != TargetStatus.available]
+    if locked:
+        flash(f'Target(s) {", ".join(sorted(set(locked)))} LOCKED. Distribution prevented.', 'error')
+        return redirect(url_for('release_detail', release_id=release_id))
+
+    try:
+        # A single agent call may take FANOUT_AGENT_TIMEOUT; the lease has to outlive it
+        ttl = app.config['FANOUT_AGENT_TIMEOUT'] + app.config['LEASE_TTL_SECONDS']
+        with lease_targets([t.id for t in targets] + [seed.id], 'distribute_fanout', ttl=ttl) as lease:
+            count, errors, nexus_fetches = fanout_release(release, targets, seed, fanout, lease)
+    except LeaseBusy as e:
+        flash(f'Distribution prevented: {e}', 'error')
+        return redirect(url_for('release_detail', release_id=release_id))
+    except (LeaseLost, StaleDataError) as e:
+        flash(f'Distribution aborted, a target was changed concurrently: {e}', 'error')
+        return redirect(url_for('release_detail', release_id=release_id))
+
     if count > 0:
+        summary = f'Distributed {count} package copies to {len(targets)} targets with {nexus_fetches} Nexus downloads.'
         if errors:
-             flash(f'Distributed {count} packages to {target.name}. Errors: {", ".join(errors)}', 'warning')
+            flash(f'{summary} Errors: {", ".join(errors)}', 'warning')
         else:
-             flash(f'Distributed {count} packages to {target.name}.', 'success')
+            flash(summary, 'success')
     else:
         if errors:
             flash(f'No packages distributed. Errors: {", ".join(errors)}', 'error')
         else:
             flash('No applicable packages to distribute.', 'warning')
-        
+
     return redirect(url_for('release_detail', release_id=release_id))
 
+PACKAGE_PAGE_SIZE = 50
+
 @app.route('/release/<int:release_id>')
 def release_detail(release_id):
+    """
+    One page of package cards (?offset=, ?status=<PackageStatus>, ?q=<name part>). Deployment
+    badges and dependency lists are loaded by the cards themselves from the JSON endpoints below.
+    """
     release = Release.query.get_or_404(release_id)
-    packages = release.packages
-    # Get all packages in the release to allow dependency selection
-    all_packages = Package.query.filter_by(release_id=release_id).all()
+    status = request.args.get('status') or None
+    if status not in PackageStatus.__members__:
+        status = None
+    search = request.args.get('q', '').strip()
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    query = Package.query.filter_by(release_id=release_id)
+    if status:
+        query = query.filter(Package.status == PackageStatus[status])
+    if search:
+        query = query.filter(Package.name.contains(search))
+    matching = query.count()
+    packages = query.order_by(Package.name, Package.id).offset(offset).limit(PACKAGE_PAGE_SIZE).all()
+    package_total = db.session.query(func.count(Package.id)).filter_by(release_id=release_id).scalar()
     # Get available targets for deployment (for the dropdown)
     targets = DeploymentTarget.query.filter_by(status=TargetStatus.available).all()
     # Get all targets for scheduling (can schedule even if locked, maybe? Let's allow all)
     all_targets = DeploymentTarget.query.all()
-    # Calculate deployed package counts per target
-    deployed_counts = {}
-    for pkg in packages:
-        for d in pkg.deployments:
-            if d.status == PackageDeploymentStatus.deployed:
-                target_name = d.target.name
-                deployed_counts[target_name] = deployed_counts.get(target_name, 0) + 1
-            
-    return render_template('release_detail.html', release=release, packages=packages, all_packages=all_packages, PackageStatus=PackageStatus, targets=targets, all_targets=all_targets, PackageDeploymentStatus=PackageDeploymentStatus, deployed_counts=deployed_counts)
+    # Deployed package counts per target
+    deployed_counts = dict(
+        db.session.query(DeploymentTarget.name, func.count(PackageDeployment.id))
+        .join(PackageDeployment, PackageDeployment.target_id == DeploymentTarget.id)
+        .join(Package, Package.id == PackageDeployment.package_id)
+        .filter(Package.release_id == release_id, PackageDeployment.status == PackageDeploymentStatus.deployed)
+        .group_by(DeploymentTarget.name).order_by(DeploymentTarget.name).all())
+
+    return render_template('release_detail.html', release=release, packages=packages, package_total=package_total,
+                           matching=matching, offset=offset, page_size=PACKAGE_PAGE_SIZE, status_filter=status,
+                           search=search, PackageStatus=PackageStatus, targets=targets, all_targets=all_targets,
+                           deployed_counts=deployed_counts)
+
+@app.route('/api/release/<int:release_id>/deployments')
+def release_deployments_api(release_id):
+    """Deployments of ?package_ids=1,2,3 (packages of this release, at most 200) for the package card badges."""
+    try:
+        package_ids = [int(p) for p in request.args.get('package_ids', '').split(',') if p][:200]
+    except ValueError:
+        return jsonify({'error': 'package_ids must be a comma-separated list of ids'}), 400
+    deployments = {package_id: [] for package_id in package_ids}
+    rows = (db.session.query(PackageDeployment.package_id, DeploymentTarget.id, DeploymentTarget.name,
+                             PackageDeployment.status)
+            .join(DeploymentTarget, DeploymentTarget.id == PackageDeployment.target_id)
+            .join(Package, Package.id == PackageDeployment.package_id)
+            .filter(Package.release_id == release_id, PackageDeployment.package_id.in_(package_ids))
+            .order_by(DeploymentTarget.name))
+    for package_id, target_id, target_name, status in rows:
+        deployments[package_id].append({'target_id': target_id, 'target': target_name, 'status': status.value})
+    return jsonify({'deployments': {str(package_id): items for package_id, items in deployments.items()}})
+
+@app.route('/api/package/<int:package_id>/dependency_options')
+def package_dependency_options(package_id):
+    """Direct dependencies of a package and the other packages of its release it could depend on."""
+    pkg = Package.query.get_or_404(package_id)
+    dependencies = (db.session.query(Package.id, Package.name)
+                    .join(package_dependencies, package_dependencies.c.provider_id == Package.id)
+                    .filter(package_dependencies.c.requirer_id == pkg.id).order_by(Package.name).all())
+    excluded = {pkg.id} | {dep_id for dep_id, _ in dependencies}
+    candidates = [(cid, name) for cid, name in db.session.query(Package.id, Package.name)
+                  .filter_by(release_id=pkg.release_id).order_by(Package.name, Package.id) if cid not in excluded]
+    return jsonify({
+        'dependencies': [{'id': dep_id, 'name': name} for dep_id, name in dependencies],
+        'candidates': [{'id': cid, 'name': name} for cid, name in candidates],
+    })
 
 @app.route('/release/<int:release_id>/add_package', methods=['POST'])
 @requires_role(Role.deployer)
@@ -365,6 +778,11 @@ def delete_package(package_id):
     flash('Package removed successfully!', 'success')
     return redirect(url_for('release_detail', release_id=release_id))
 
+def describe_package_path(package_ids):
+    """Render a list of package ids as 'A -> B -> A' for error messages."""
+    names = dict(db.session.query(Package.id, Package.name).filter(Package.id.in_(set(package_ids))).all())
+    return ' -> '.join(names.get(pid, f'#{pid}') for pid in package_ids)
+
 @app.route('/package/<int:package_id>/dependency', methods=['POST'])
 @requires_role(Role.deployer)
 def add_dependency(package_id):
@@ -381,6 +799,8 @@ def add_dependency(package_id):
         flash('A package cannot depend on itself', 'error')
     elif dependency in pkg.dependencies:
         flash('Dependency already exists', 'warning')
+    elif (cycle := dependency_graph.cycle_for_edge(pkg.id, dependency.id)):
+        flash(f'Dependency rejected, it would create a cycle: {describe_package_path(cycle)}', 'error')
     else:
         pkg.dependencies.append(dependency)
         db.session.commit()
@@ -402,6 +822,93 @@ def remove_dependency(package_id):
         
     return redirect(url_for('release_detail', release_id=pkg.release_id))
 
+@app.route('/api/package/<int:package_id>/dependencies')
+def package_dependency_graph(package_id):
+    """
+    Dependency closure of a package, answered from the in-memory graph index.
+    Used for impact analysis: `requires` is everything the package needs,
+    `required_by` everything that breaks if it goes away.
+    """
+    pkg = Package.query.get_or_404(package_id)
+    transitive = request.args.get('transitive', '1') != '0'
+
+    if transitive:
+        requires = dependency_graph.transitive_dependencies(pkg.id)
+        required_by = dependency_graph.transitive_dependents(pkg.id)
+    else:
+        requires = dependency_graph.dependencies_of(pkg.id)
+        required_by = dependency_graph.dependents_of(pkg.id)
+
+    # Resolve names in one query (edges may cross releases)
+    related = {}
+    if requires or required_by:
+        rows = db.session.query(Package.id, Package.name, Release.name).join(Release).filter(
+            Package.id.in_(requires | required_by)).all()
+        related = {pid: {'id': pid, 'name': name, 'release': rel_name} for pid, name, rel_name in rows}
+
+    return jsonify({
+        'package': {'id': pkg.id, 'name': pkg.name, 'release': pkg.release.name},
+        'transitive': transitive,
+        'requires': [related[i] for i in sorted(requires) if i in related],
+        'required_by': [related[i] for i in sorted(required_by) if i in related]
+    })
+
+@app.route('/api/release/<int:release_id>/dependencies', methods=['POST'])
+@requires_role(Role.deployer)
+def import_dependencies(release_id):
+    """
+    Bulk import of dependency edges between packages of a release.
+    Body: {"edges": [["requirer name", "provider name"], ...]}
+    The import is all-or-nothing: every edge is cycle-checked against the
+    existing graph plus the edges accepted earlier in the same batch.
+    """
+    release = Release.query.get_or_404(release_id)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('edges', []), list):
+        return jsonify({'status': 'error', 'imported': 0,
+                        'errors': ['Expected a JSON object {"edges": [[requirer, provider], ...]}']}), 400
+    edges = data.get('edges', [])
+
+    packages_by_name = {p.name: p.id for p in release.packages}
+    existing = dependency_graph.requires
+    pending = {}
+    to_insert = []
+    errors = []
+
+    for edge in edges:
+        if not isinstance(edge, list) or len(edge) != 2 or not all(isinstance(name, str) for name in edge):
+            errors.append(f'Invalid edge {edge!r}, expected [requirer, provider] package names')
+            continue
+        requirer_name, provider_name = edge
+        requirer_id = packages_by_name.get(requirer_name)
+        provider_id = packages_by_name.get(provider_name)
+        if requirer_id is None or provider_id is None:
+            missing = requirer_name if requirer_id is None else provider_name
+            errors.append(f'Unknown package {missing} in release {release.name}')
+            continue
+        if provider_id in existing.get(requirer_id, ()) or provider_id in pending.get(requirer_id, ()):
+            continue  # Already present, nothing to do
+
+        cycle = dependency_graph.cycle_for_edge(requirer_id, provider_id, pending)
+        if cycle:
+            errors.append(f'{requirer_name} -> {provider_name} would create a cycle: {describe_package_path(cycle)}')
+            continue
+
+        pending.setdefault(requirer_id, set()).add(provider_id)
+        to_insert.append({'requirer_id': requirer_id, 'provider_id': provider_id})
+
+    if errors:
+        return jsonify({'status': 'error', 'imported': 0, 'errors': errors}), 400
+
+    if to_insert:
+        db.session.execute(package_dependencies.insert(), to_insert)
+        # Core insert bypasses the ORM flush hooks; the commit publishes it to the other workers
+        mark_dependency_graph_dirty(db.session)
+        log_event('package', 'dependency_import', f'Imported {len(to_insert)} dependencies into {release.name}')
+        db.session.commit()
+
+    return jsonify({'status': 'success', 'imported': len(to_insert), 'errors': []})
+
 # Deployment Targets Routes
 
 @app.route('/targets', methods=['GET', 'POST'])
@@ -437,7 +944,7 @@ def targets():
         return redirect(url_for('targets'))
         
     targets = DeploymentTarget.query.all()
-    return render_template('targets.html', targets=targets, TargetStatus=TargetStatus)
+    return render_template('targets.html', targets=targets, TargetStatus=TargetStatus, leases=current_leases())
 
 @app.route('/target/<int:target_id>/toggle_status', methods=['POST'])
 @requires_role(Role.admin)
@@ -454,6 +961,111 @@ def toggle_target_status(target_id):
     db.session.commit()
     return redirect(url_for('targets'))
 
+@app.route('/targets/reconcile', methods=['GET', 'POST'])
+@requires_role(Role.admin)
+def reconcile_targets():
+    """GET: the form; POST: fetch all agent histories, report drift and, with fix=1, correct it."""
+    if request.method == 'GET':
+        return render_template('reconcile.html', report=None)
+    report = reconcile.reconcile(lambda target: agent_base_url(target.url),
+                                 app.config['RECONCILE_BUDGET_SECONDS'], app.config['RECONCILE_WORKERS'])
+    if request.form.get('fix') == '1':
+        report['fix'] = reconcile.apply_corrections(report['drift'], lease_owner(g.user.username), g.user.username,
+                                                    ttl=app.config['LEASE_TTL_SECONDS'])
+        for release in Release.query.filter(Release.id.in_(report['fix']['release_ids'])):
+            update_release_status(release)
+        flash(f"Corrected {report['fix']['corrected']} deployments from the agent histories.", 'success')
+    return render_template('reconcile.html', report=report)
+
+def target_state_at(target, at):
+    """Rows of the target's deployments at `at` (see deployment_history.py), or None before the history."""
+    state = snapshot(target.id, at)
+    if state is None:
+        return None
+    packages = {p.id: p for p in Package.query.options(joinedload(Package.release)).filter(Package.id.in_(list(state)))}
+    rows = []
+    for package_id, status in state.items():
+        pkg = packages.get(package_id)
+        rows.append({'package_id': package_id, 'package': pkg.name if pkg else None,
+                     'release': pkg.release.name if pkg else None, 'status': status.value})
+    rows.sort(key=lambda r: (r['release'] or '', r['package'] or '', r['package_id']))
+    return rows
+
+def _parse_at_arg():
+    value = request.args.get('at')
+    return naive_utc(datetime.fromisoformat(value)) if value else datetime.utcnow()
+
+@app.route('/api/target/<int:target_id>/state')
+def target_state_api(target_id):
+    """Deployments on the target at ?at= (ISO date/time, UTC unless it has an offset; default now)."""
+    target = DeploymentTarget.query.get_or_404(target_id)
+    try:
+        at = _parse_at_arg()
+    except ValueError:
+        return jsonify({'error': 'at must be an ISO date/time, e.g. 2026-10-18T14:05'}), 400
+    rows = target_state_at(target, at)
+    if rows is None:
+        return jsonify({'error': f'No deployment history before {at.isoformat()}'}), 404
+    return jsonify({'target_id': target.id, 'target': target.name, 'at': at.isoformat(), 'deployments': rows})
+
+@app.route('/target/<int:target_id>/history')
+def target_history(target_id):
+    target = DeploymentTarget.query.get_or_404(target_id)
+    try:
+        at = _parse_at_arg()
+    except ValueError:
+        flash('Invalid point in time.', 'error')
+        at = datetime.utcnow()
+    return render_template('target_history.html', target=target, at=at, rows=target_state_at(target, at))
+
+DIFF_PAGE_SIZE = 100
+
+def _diff_from_args():
+    """DeploymentDiff of ?left=&right= (target:<id> or release:<id>), ?status=, ?release_id=; ValueError if invalid."""
+    return DeploymentDiff(Side.parse(request.args.get('left')), Side.parse(request.args.get('right')),
+                          request.args.get('status', 'deployed'), request.args.get('release_id', type=int))
+
+@app.route('/api/diff')
+def deployment_diff_api():
+    """
+    Counts of the packages only on the left and only on the right side, and one page
+    (?offset=&limit=, max 1000) of those on ?direction= (left, the default, or right).
+    """
+    try:
+        diff = _diff_from_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    direction = request.args.get('direction', 'left')
+    if direction not in DIRECTIONS:
+        return jsonify({'error': 'direction must be left or right'}), 400
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', DIFF_PAGE_SIZE, type=int), 1), 1000)
+    counts = diff.counts()
+    return jsonify({'left': diff.left.as_dict(), 'right': diff.right.as_dict(), 'status': diff.presence,
+                    'release_id': diff.release_id, 'counts': counts, 'direction': direction,
+                    'offset': offset, 'limit': limit, 'has_more': offset + limit < counts[direction],
+                    'items': diff.page(direction, offset, limit)})
+
+@app.route('/diff')
+def deployment_diff():
+    targets = DeploymentTarget.query.order_by(DeploymentTarget.name).all()
+    releases = Release.query.order_by(Release.name).all()
+    context = dict(targets=targets, releases=releases, presence=list(PRESENCE), args=request.args, diff=None)
+    if not request.args.get('left') or not request.args.get('right'):
+        return render_template('diff.html', **context)
+    try:
+        diff = _diff_from_args()
+    except ValueError as e:
+        flash(str(e), 'error')
+        return render_template('diff.html', **context)
+    direction = request.args.get('direction', 'left')
+    if direction not in DIRECTIONS:
+        direction = 'left'
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    context.update(diff=diff, counts=diff.counts(), direction=direction, offset=offset, page_size=DIFF_PAGE_SIZE,
+                   rows=diff.page(direction, offset, DIFF_PAGE_SIZE))
+    return render_template('diff.html', **context)
+
 @app.route('/target/<int:target_id>/edit', methods=['GET', 'POST'])
 @requires_role(Role.admin)
 def edit_target(target_id):
@@ -488,35 +1100,41 @@ def distribute_package(package_id):
         flash(f'Target {target.name} is LOCKED. Distribution prevented.', 'error')
         return redirect(url_for('release_detail', release_id=pkg.release_id))
 
-    deployment = PackageDeployment.query.filter_by(package_id=pkg.id, target_id=target.id).first()
-    # Logic moved below to handle agent call first
-    if deployment and deployment.status != PackageDeploymentStatus.not_deployed and deployment.status != PackageDeploymentStatus.distributed:
-         # Already deployed?
-         if deployment.status == PackageDeploymentStatus.deployed:
-             flash(f'Package {pkg.name} is already deployed on {target.name}', 'info')
-             return redirect(url_for('release_detail', release_id=pkg.release_id))
-
-    # Call Agent
-    payload = {
-        'package': pkg.name,
-        'nexus_url': pkg.url,
-        'release': pkg.release.name
-    }
-    success, msg = call_agent(target.url, 'distribute', payload)
-    
-    if not success:
-        flash(f'Distribution failed: {msg}', 'error')
-        return redirect(url_for('release_detail', release_id=pkg.release_id))
+    try:
+        # Read and change the deployment under the target's lease, like the bulk operations
+        with lease_targets([target.id], 'distribute'):
+            deployment = PackageDeployment.query.filter_by(package_id=pkg.id, target_id=target.id).first()
+            if deployment and deployment.status == PackageDeploymentStatus.deployed:
+                flash(f'Package {pkg.name} is already deployed on {target.name}', 'info')
+                return redirect(url_for('release_detail', release_id=pkg.release_id))
 
-    if not deployment:
-         deployment = PackageDeployment(package_id=pkg.id, target_id=target.id, status=PackageDeploymentStatus.distributed)
-         db.session.add(deployment)
-    else:
-         deployment.status = PackageDeploymentStatus.distributed
-         deployment.deployed_at = datetime.utcnow()
+            # Call Agent
+            payload = {
+                'package': pkg.name,
+                'nexus_url': pkg.url,
+                'release': pkg.release.name
+            }
+            success, msg = call_agent(target.url, 'distribute', payload, target_id=target.id, package_id=pkg.id)
 
-    log_event('package', 'distribute', f'Distributed {pkg.name} to {target.name}')
-    db.session.commit()
+            if not success:
+                flash(f'Distribution failed: {msg}', 'error')
+                return redirect(url_for('release_detail', release_id=pkg.release_id))
+
+            if not deployment:
+                deployment = PackageDeployment(package_id=pkg.id, target_id=target.id, status=PackageDeploymentStatus.distributed)
+                db.session.add(deployment)
+            else:
+                deployment.status = PackageDeploymentStatus.distributed
+                deployment.deployed_at = datetime.utcnow()
+
+            log_event('package', 'distribute', f'Distributed {pkg.name} to {target.name}')
+            db.session.commit()
+    except LeaseBusy as e:
+        flash(f'Distribution prevented: {e}', 'error')
+        return redirect(url_for('release_detail', release_id=pkg.release_id))
+    except (LeaseLost, StaleDataError) as e:
+        flash(f'Distribution aborted, {pkg.name} was changed on {target.name} concurrently: {e}', 'error')
+        return redirect(url_for('release_detail', release_id=pkg.release_id))
     
     update_release_status(pkg.release)
     flash(f'Package {pkg.name} distributed to {target.name}', 'success')
@@ -537,46 +1155,54 @@ def deploy_package(package_id):
         return redirect(url_for('release_detail', release_id=pkg.release_id))
         
     target = DeploymentTarget.query.get_or_404(target_id)
-    
-    deployment = PackageDeployment.query.filter_by(package_id=pkg.id, target_id=target.id).first()
-    
-    if not deployment or deployment.status != PackageDeploymentStatus.distributed:
-        flash(f'Package must be DISTRIBUTED to {target.name} before deployment.', 'error')
-        return redirect(url_for('release_detail', release_id=pkg.release_id))
         
     if target.status != TargetStatus.available:
         flash(f'Target {target.name} is LOCKED. Deployment prevented.', 'error')
         return redirect(url_for('release_detail', release_id=pkg.release_id))
- 
-    # Check dependencies
-    missing_deps = []
-    for dep in pkg.dependencies:
-        # Check if dependency has a DEPLOYED status on THIS target
-        dep_deployment = PackageDeployment.query.filter_by(package_id=dep.id, target_id=target.id).first()
-        if not dep_deployment or dep_deployment.status != PackageDeploymentStatus.deployed:
-            missing_deps.append(dep.name)
-    
-    if missing_deps:
-        flash(f"Deployment Failed. Dependency requirements not met on {target.name}. Missing: {', '.join(missing_deps)}", 'error')
-        return redirect(url_for('release_detail', release_id=pkg.release_id))
 
-    # Call Agent
-    payload = {
-        'package': pkg.name,
-        'nexus_url': pkg.url,
-        'release': pkg.release.name
-    }
-    success, msg = call_agent(target.url, 'deploy', payload)
-    
-    if not success:
-        flash(f'Deployment failed: {msg}', 'error')
-        return redirect(url_for('release_detail', release_id=pkg.release_id))
+    try:
+        with lease_targets([target.id], 'deploy'):
+            deployment = PackageDeployment.query.filter_by(package_id=pkg.id, target_id=target.id).first()
 
-    deployment.status = PackageDeploymentStatus.deployed
-    deployment.deployed_at = datetime.utcnow()
-    
-    log_event('package', 'deploy', f'Deployed {pkg.name} to {target.name}')
-    db.session.commit()
+            if not deployment or deployment.status != PackageDeploymentStatus.distributed:
+                flash(f'Package must be DISTRIBUTED to {target.name} before deployment.', 'error')
+                return redirect(url_for('release_detail', release_id=pkg.release_id))
+
+            # Check dependencies
+            missing_deps = []
+            for dep in pkg.dependencies:
+                # Check if dependency has a DEPLOYED status on THIS target
+                dep_deployment = PackageDeployment.query.filter_by(package_id=dep.id, target_id=target.id).first()
+                if not dep_deployment or dep_deployment.status != PackageDeploymentStatus.deployed:
+                    missing_deps.append(dep.name)
+
+            if missing_deps:
+                flash(f"Deployment Failed. Dependency requirements not met on {target.name}. Missing: {', '.join(missing_deps)}", 'error')
+                return redirect(url_for('release_detail', release_id=pkg.release_id))
+
+            # Call Agent
+            payload = {
+                'package': pkg.name,
+                'nexus_url': pkg.url,
+                'release': pkg.release.name
+            }
+            success, msg = call_agent(target.url, 'deploy', payload, target_id=target.id, package_id=pkg.id)
+
+            if not success:
+                flash(f'Deployment failed: {msg}', 'error')
+                return redirect(url_for('release_detail', release_id=pkg.release_id))
+
+            deployment.status = PackageDeploymentStatus.deployed
+            deployment.deployed_at = datetime.utcnow()
+
+            log_event('package', 'deploy', f'Deployed {pkg.name} to {target.name}')
+            db.session.commit()
+    except LeaseBusy as e:
+        flash(f'Deployment prevented: {e}', 'error')
+        return redirect(url_for('release_detail', release_id=pkg.release_id))
+    except (LeaseLost, StaleDataError) as e:
+        flash(f'Deployment aborted, {pkg.name} was changed on {target.name} concurrently: {e}', 'error')
+        return redirect(url_for('release_detail', release_id=pkg.release_id))
     
     update_release_status(pkg.release)
     
@@ -599,29 +1225,123 @@ def fallback_package(package_id):
 
     target = DeploymentTarget.query.get_or_404(target_id)
     
-    deployment = PackageDeployment.query.filter_by(package_id=pkg.id, target_id=target.id).first()
-    
-    if not deployment or deployment.status != PackageDeploymentStatus.deployed:
-        flash(f'Package is not deployed to {target.name}', 'warning')
-        return redirect(url_for('release_detail', release_id=pkg.release_id))
-    
     # Check if target is locked
     if target.status != TargetStatus.available:
          flash(f'Target {target.name} is LOCKED. Fallback prevented.', 'error')
          return redirect(url_for('release_detail', release_id=pkg.release_id))
-        
-    # Revert to Distributed
-    deployment.status = PackageDeploymentStatus.distributed
-    deployment.deployed_at = datetime.utcnow()
-    
-    log_event('package', 'fallback', f'Fallback {pkg.name} (reverted to distributed on {target.name})')
-    db.session.commit()
+
+    try:
+        with lease_targets([target.id], 'fallback'):
+            deployment = PackageDeployment.query.filter_by(package_id=pkg.id, target_id=target.id).first()
+
+            if not deployment or deployment.status != PackageDeploymentStatus.deployed:
+                flash(f'Package is not deployed to {target.name}', 'warning')
+                return redirect(url_for('release_detail', release_id=pkg.release_id))
+
+            # Revert to Distributed
+            deployment.status = PackageDeploymentStatus.distributed
+            deployment.deployed_at = datetime.utcnow()
+
+            log_event('package', 'fallback', f'Fallback {pkg.name} (reverted to distributed on {target.name})')
+            db.session.commit()
+    except LeaseBusy as e:
+        flash(f'Fallback prevented: {e}', 'error')
+        return redirect(url_for('release_detail', release_id=pkg.release_id))
+    except (LeaseLost, StaleDataError) as e:
+        flash(f'Fallback aborted, {pkg.name} was changed on {target.name} concurrently: {e}', 'error')
+        return redirect(url_for('release_detail', release_id=pkg.release_id))
     
     update_release_status(pkg.release)
     
     flash(f'Fallback executed for {pkg.name} on {target.name}', 'success')
     return redirect(url_for('release_detail', release_id=pkg.release_id))
 
+def compute_fallback_impact(pkg, target):
+    """
+    Deployments on `target` that a fallback of `pkg` would break: the package
+    itself plus every package (any release) that transitively requires it and
+    is deployed there. Returned dependents-first, i.e. in rollback order.
+    """
+    candidate_ids = dependency_graph.transitive_dependents(pkg.id) | {pkg.id}
+    deployments = PackageDeployment.query.filter(
+        PackageDeployment.target_id == target.id,
+        PackageDeployment.status == PackageDeploymentStatus.deployed,
+        PackageDeployment.package_id.in_(candidate_ids)
+    ).all()
+    by_package = {d.package_id: d for d in deployments}
+    # Order over the whole closure so paths through packages not deployed here still count
+    order = dependency_graph.topological_order(candidate_ids)
+    order.reverse()
+    return [by_package[pid] for pid in order if pid in by_package]
+
+@app.route('/package/<int:package_id>/fallback_cascade', methods=['GET', 'POST'])
+@requires_role(Role.deployer)
+def fallback_cascade(package_id):
+    pkg = Package.query.get_or_404(package_id)
+    target_id = request.values.get('target_id')
+
+    if not target_id:
+        flash('Target ID missing for fallback.', 'error')
+        return redirect(url_for('release_detail', release_id=pkg.release_id))
+
+    target = DeploymentTarget.query.get_or_404(target_id)
+    impacted = compute_fallback_impact(pkg, target)
+
+    if not any(d.package_id == pkg.id for d in impacted):
+        flash(f'Package is not deployed to {target.name}', 'warning')
+        return redirect(url_for('release_detail', release_id=pkg.release_id))
+
+    # GET is the dry-run: show what would be rolled back and ask for confirmation
+    if request.method == 'GET':
+        return render_template('fallback_cascade.html', package=pkg, target=target, impacted=impacted)
+
+    if target.status != TargetStatus.available:
+        flash(f'Target {target.name} is LOCKED. Fallback prevented.', 'error')
+        return redirect(url_for('release_detail', release_id=pkg.release_id))
+
+    # Versions the user confirmed on the dry-run page (or read now); nothing may have changed since
+    versions = {d.id: d.version for d in impacted}
+    confirmed = [v.split(':', 1) for v in request.form.getlist('versions') if ':' in v]
+    if confirmed:
+        try:
+            confirmed = {int(i): int(v) for i, v in confirmed}
+        except ValueError:
+            confirmed = None  # tampered with, or a form of an older page
+        if confirmed is None or set(confirmed) != set(versions):
+            flash(f'The fallback impact on {target.name} changed since the preview. Please review it again.', 'error')
+            return redirect(url_for('fallback_cascade', package_id=package_id, target_id=target.id))
+        versions = confirmed
+
+    try:
+        with lease_targets([target.id], 'fallback_cascade'):
+            # Single set-based update for the whole impacted set, guarded by the versions
+            now = datetime.utcnow()
+            updated = PackageDeployment.query.filter(
+                or_(*[and_(PackageDeployment.id == i, PackageDeployment.version == v) for i, v in versions.items()])
+            ).update(
+                {PackageDeployment.status: PackageDeploymentStatus.distributed, PackageDeployment.deployed_at: now,
+                 PackageDeployment.version: PackageDeployment.version + 1},
+                synchronize_session='fetch'
+            )
+            if updated != len(impacted):
+                raise StaleDataError(f'{len(impacted) - updated} of {len(impacted)} deployments changed since they were read')
+            record_transitions(db.session, [(target.id, d.package_id, PackageDeploymentStatus.distributed) for d in impacted], now)
+            for d in impacted:
+                log_event('package', 'fallback', f'Fallback {d.package.name} on {target.name} (Cascade from {pkg.name})')
+            db.session.commit()
+    except LeaseBusy as e:
+        flash(f'Fallback prevented: {e}', 'error')
+        return redirect(url_for('release_detail', release_id=pkg.release_id))
+    except StaleDataError as e:
+        flash(f'Fallback aborted, deployments on {target.name} were changed concurrently: {e}', 'error')
+        return redirect(url_for('release_detail', release_id=pkg.release_id))
+
+    for release in {d.package.release for d in impacted}:
+        update_release_status(release)
+
+    flash(f'Cascading fallback executed for {pkg.name} on {target.name}: {len(impacted)} packages reverted.', 'success')
+    return redirect(url_for('release_detail', release_id=pkg.release_id))
+
 # Schedule Routes
 
 @app.route('/release/<int:release_id>/schedule', methods=['POST'])
@@ -635,6 +1355,11 @@ def add_schedule(release_id):
     if not target_id or not start_date or not end_date:
         flash('All fields are required.', 'error')
         return redirect(url_for('release_detail', release_id=release_id))
+    # The schedule index is keyed by the integer target id
+    if not target_id.isdigit() or DeploymentTarget.query.get(int(target_id)) is None:
+        flash(f'Unknown target {target_id}.', 'error')
+        return redirect(url_for('release_detail', release_id=release_id))
+    target_id = int(target_id)
         
     try:
         start = datetime.strptime(start_date, '%Y-%m-%d').date()
@@ -644,17 +1369,92 @@ def add_schedule(release_id):
              flash('Start date must be before end date.', 'error')
              return redirect(url_for('release_detail', release_id=release_id))
 
+        overlapping = schedule_index.overlapping(target_id, start, end)
+
         schedule = ScheduledDeployment(release_id=release_id, target_id=target_id, start_date=start, end_date=end)
         db.session.add(schedule)
         db.session.commit()
         
         log_event('release', 'schedule', f'Scheduled Release {release.name} on Target {schedule.target.name} ({start} to {end})')
-        flash('Schedule added.', 'success')
+        if overlapping:
+            others = {s.id: s for s in ScheduledDeployment.query.filter(
+                ScheduledDeployment.id.in_([schedule_id for _, _, schedule_id in overlapping]))}
+            described = ', '.join(f'{others[i].release.name} ({s} to {e})' for s, e, i in overlapping if i in others)
+            flash(f'Schedule added, but it overlaps on {schedule.target.name} with: {described}', 'warning')
+        else:
+            flash('Schedule added.', 'success')
     except Exception as e:
         flash(f'Error adding schedule: {str(e)}', 'error')
         
     return redirect(url_for('release_detail', release_id=release_id))
 
+def record_schedule_run(schedule, started_at, distributed, deployed, errors):
+    if not errors:
+        outcome = 'success'
+    elif distributed or deployed:
+        outcome = 'partial'
+    else:
+        outcome = 'failure'
+    message = '; '.join(errors)
+    db.session.add(ScheduleRun(schedule_id=schedule.id, started_at=started_at, finished_at=datetime.utcnow(), outcome=outcome,
+                               distributed=distributed, deployed=deployed, message=message[:255] or None))
+    log_event('release', 'schedule_run', f'Scheduled deployment of Release {schedule.release.name} on {schedule.target.name}: {outcome} '
+                                         f'({distributed} distributed, {deployed} deployed, {len(errors)} errors)')
+    db.session.commit()
+
+def run_scheduled_deployment(schedule_id, retry=False):
+    """
+    Executor callback for an opened window: distribute and deploy the release to the target,
+    start nothing after end_date and record the outcome. While the target is locked the
+    window is retried every SCHEDULER_RETRY_SECONDS (returns the retry time).
+    """
+    schedule = ScheduledDeployment.query.get(schedule_id)
+    if schedule is None or schedule.runs:
+        return None  # removed, or already run
+    g.user = None  # log_event records the scheduler as 'system'
+    release, target = schedule.release, schedule.target
+    _, closes_at = window_bounds(schedule)
+    now = datetime.utcnow()
+
+    if now > closes_at:
+        db.session.add(ScheduleRun(schedule_id=schedule.id, started_at=now, finished_at=now, outcome='missed',
+                                   message=f'Window ended {schedule.end_date} before it could run'))
+        log_event('release', 'schedule_run', f'Missed schedule of Release {release.name} on {target.name} (window ended {schedule.end_date})')
+        db.session.commit()
+        return None
+
+    if target.status != TargetStatus.available:
+        if not retry:
+            log_event('release', 'schedule_run', f'Schedule of Release {release.name} waiting: target {target.name} is LOCKED')
+            db.session.commit()
+        return now + timedelta(seconds=app.config['SCHEDULER_RETRY_SECONDS'])
+
+    operation = f'scheduled_deployment #{schedule.id}'
+    try:
+        lease = lease_targets([target.id], operation)
+    except LeaseBusy as e:
+        # Every worker runs an executor: another one running this very window is not a wait
+        if not retry and e.lease.operation != operation:
+            log_event('release', 'schedule_run', f'Schedule of Release {release.name} waiting: {e}')
+            db.session.commit()
+        return now + timedelta(seconds=app.config['SCHEDULER_RETRY_SECONDS'])
+
+    try:
+        with lease:
+            # Every worker may run an executor: the lease serializes them, so a window
+            # recorded while we waited for it has been run elsewhere
+            if ScheduleRun.query.filter_by(schedule_id=schedule.id).count():
+                return None
+            log_event('release', 'schedule_run', f'Started scheduled deployment of Release {release.name} on {target.name} (until {schedule.end_date})')
+            db.session.commit()
+            distributed, errors = distribute_release_to_target(release, target, origin='Schedule', deadline=closes_at, lease=lease)
+            deployed, deploy_errors = deploy_release_to_target(release, target, origin='Schedule', deadline=closes_at, lease=lease)
+            errors += deploy_errors
+            record_schedule_run(schedule, now, distributed, deployed, errors)
+    except (LeaseLost, StaleDataError) as e:
+        record_schedule_run(schedule, now, 0, 0, [f'Aborted, target changed concurrently: {e}'])
+    return None
+
 @app.route('/schedule/<int:schedule_id>/delete', methods=['POST'])
 @requires_role(Role.release_manager)
 def delete_schedule(schedule_id):
@@ -662,10 +1462,10 @@ def delete_schedule(schedule_id):
     release_id = schedule.release_id
     target_name = schedule.target.name
     
+    log_event('release', 'unschedule', f'Removed schedule for Release {schedule.release.name} on {target_name}')
     db.session.delete(schedule)
     db.session.commit()
     
-    log_event('release', 'unschedule', f'Removed schedule for Release {schedule.release.name} on {target_name}')
     flash('Schedule removed.', 'success')
     return redirect(url_for('release_detail', release_id=release_id))
 
@@ -678,17 +1478,65 @@ def calendar():
 @app.route('/api/calendar_events')
 def calendar_events():
     schedules = ScheduledDeployment.query.all()
+    # Highlight windows that collide with another window on the same target
+    colliding = {}
+    if schedules:
+        first = min(s.start_date for s in schedules)
+        last = max(s.end_date for s in schedules)
+        for _, _, _, a, b in schedule_index.conflicts(first, last):
+            colliding.setdefault(a, set()).add(b)
+            colliding.setdefault(b, set()).add(a)
+    names = {s.id: s.release.name for s in schedules}
     events = []
     for s in schedules:
-        events.append({
+        event = {
             'title': f"{s.release.name} @ {s.target.name}",
             'start': s.start_date.isoformat(),
             'end': s.end_date.isoformat(), # FullCalendar end date is exclusive, might need +1 day if user expects inclusive
             'allDay': True,
             'url': url_for('release_detail', release_id=s.release.id)
-        })
+        }
+        if s.id in colliding:
+            event['color'] = '#dc3545'
+            event['title'] = f"\u26a0 {event['title']}"
+            event['extendedProps'] = {'conflicts_with': sorted(names.get(i, str(i)) for i in colliding[s.id])}
+        events.append(event)
     return jsonify(events)
 
+def _parse_date_arg(name, default):
+    value = request.args.get(name)
+    return datetime.strptime(value[:10], '%Y-%m-%d').date() if value else default
+
+@app.route('/api/schedule_conflicts')
+def schedule_conflicts():
+    """Overlapping windows on the same target within ?start=&end= (default: the next 365 days), optionally ?target_id=."""
+    try:
+        start = _parse_date_arg('start', date.today())
+        end = _parse_date_arg('end', start + timedelta(days=365))
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD'}), 400
+    if start > end:
+        return jsonify({'error': 'start must not be after end'}), 400
+    target_id = request.args.get('target_id', type=int)
+
+    pairs = schedule_index.conflicts(start, end, target_id)
+    ids = {i for pair in pairs for i in pair[3:]}
+    schedules = {s.id: s for s in ScheduledDeployment.query.filter(ScheduledDeployment.id.in_(ids))} if ids else {}
+
+    def describe(schedule_id):
+        s = schedules[schedule_id]
+        return {'id': s.id, 'release': s.release.name, 'release_id': s.release_id,
+                'start': s.start_date.isoformat(), 'end': s.end_date.isoformat()}
+
+    conflicts = [{
+        'target_id': tid,
+        'target': schedules[a].target.name,
+        'overlap_start': overlap_start.isoformat(),
+        'overlap_end': overlap_end.isoformat(),
+        'schedules': [describe(a), describe(b)],
+    } for tid, overlap_start, overlap_end, a, b in pairs if a in schedules and b in schedules]
+    return jsonify({'start': start.isoformat(), 'end': end.isoformat(), 'count': len(conflicts), 'conflicts': conflicts})
+
 # Helper for Topological Sort
 def get_sorted_packages(packages):
     """
@@ -724,6 +1572,82 @@ def get_sorted_packages(packages):
         
     return sorted_packages
 
+def deploy_release_to_target(release, target, origin='Bulk', deadline=None, lease=None):
+    """
+    Deploy the distributed packages of the release to the target in dependency order.
+    Packages are not started after `deadline` (UTC). With a lease, it is kept alive
+    per package and every package is committed on its own.
+    Returns (deployed_count, errors); commits.
+    """
+    errors = []
+    deployed_count = 0
+    # Get all packages in topological order
+    packages = get_sorted_packages(release.packages)
+    
+    for pkg in packages:
+        if deadline is not None and datetime.utcnow() >= deadline:
+            errors.append(f'Window closed before {pkg.name}; remaining packages not started')
+            break
+        if lease is not None:
+            lease.heartbeat()
+        with tracing.span('package.deploy', package=pkg.name, release=release.name, target=target.name):
+            # Check current deployment on this target
+            deployment = PackageDeployment.query.filter_by(package_id=pkg.id, target_id=target.id).first()
+        
+            if deployment and deployment.status == PackageDeploymentStatus.deployed:
+                continue # Already deployed here
+        
+            # If not distributed, we should distribute it first? 
+            # Requirement: "deploy... only... on packages which are already distributed"
+            # So if not distributed to this target (deployment doesn't exist or status is not distributed), we skip or fail?
+            # `distribute_release_all` handles distribution. 
+            # If user runs `deploy_all`, they expect distributed packages to be deployed.
+            # If package is NOT distributed to this target, we can either:
+            # 1. Skip (strict)
+            # 2. Auto-distribute (lenient)
+            # Let's be strict as per single package logic.
+            if not deployment or deployment.status != PackageDeploymentStatus.distributed:
+                # Skip validly? Or warn? 
+                # If we skip, the loop continues. Dependencies check might fail for others.
+                # But if it's not distributed, it can't be deployed.
+                continue
+
+            # Check dependencies
+            missing_deps = []
+            for dep in pkg.dependencies:
+                # Check dependency deployment on THIS target
+                dep_deployment = PackageDeployment.query.filter_by(package_id=dep.id, target_id=target.id).first()
+                if not dep_deployment or dep_deployment.status != PackageDeploymentStatus.deployed:
+                    missing_deps.append(dep.name)
+        
+            if missing_deps:
+                errors.append(f"Package {pkg.name} cannot be deployed because dependencies are missing on {target.name}: {', '.join(missing_deps)}")
+                continue # Skip this package
+            
+            # Call Agent
+            payload = {
+                'package': pkg.name,
+                'nexus_url': pkg.url,
+                'release': release.name
+            }
+            success, msg = call_agent(target.url, 'deploy', payload, target_id=target.id, package_id=pkg.id)
+        
+            if not success:
+                errors.append(f"{pkg.name}: {msg}")
+                continue
+
+            # Deploy
+            deployment.status = PackageDeploymentStatus.deployed
+            deployment.deployed_at = datetime.utcnow()
+            deployed_count += 1
+            log_event('package', 'deploy', f'Deployed {pkg.name} to {target.name} ({origin})')
+            if lease is not None:
+                db.session.commit()
+        
+    db.session.commit()
+    update_release_status(release)
+    return deployed_count, errors
+
 @app.route('/release/<int:release_id>/deploy_all', methods=['POST'])
 @requires_role(Role.deployer)
 def deploy_release_all(release_id):
@@ -739,66 +1663,15 @@ def deploy_release_all(release_id):
         flash(f'Target {target.name} is LOCKED. Deployment prevented.', 'error')
         return redirect(url_for('release_detail', release_id=release_id))
 
-    # Get all packages in topological order
-    packages = get_sorted_packages(release.packages)
-    
-    errors = []
-    deployed_count = 0
-    
-    for pkg in packages:
-        # Check current deployment on this target
-        deployment = PackageDeployment.query.filter_by(package_id=pkg.id, target_id=target.id).first()
-        
-        if deployment and deployment.status == PackageDeploymentStatus.deployed:
-            continue # Already deployed here
-        
-        # If not distributed, we should distribute it first? 
-        # Requirement: "deploy... only... on packages which are already distributed"
-        # So if not distributed to this target (deployment doesn't exist or status is not distributed), we skip or fail?
-        # `distribute_release_all` handles distribution. 
-        # If user runs `deploy_all`, they expect distributed packages to be deployed.
-        # If package is NOT distributed to this target, we can either:
-        # 1. Skip (strict)
-        # 2. Auto-distribute (lenient)
-        # Let's be strict as per single package logic.
-        if not deployment or deployment.status != PackageDeploymentStatus.distributed:
-            # Skip validly? Or warn? 
-            # If we skip, the loop continues. Dependencies check might fail for others.
-            # But if it's not distributed, it can't be deployed.
-            continue
-
-        # Check dependencies
-        missing_deps = []
-        for dep in pkg.dependencies:
-            # Check dependency deployment on THIS target
-            dep_deployment = PackageDeployment.query.filter_by(package_id=dep.id, target_id=target.id).first()
-            if not dep_deployment or dep_deployment.status != PackageDeploymentStatus.deployed:
-                missing_deps.append(dep.name)
-        
-        if missing_deps:
-            errors.append(f"Package {pkg.name} cannot be deployed because dependencies are missing on {target.name}: {', '.join(missing_deps)}")
-            continue # Skip this package
-            
-        # Call Agent
-        payload = {
-            'package': pkg.name,
-            'nexus_url': pkg.url,
-            'release': release.name
-        }
-        success, msg = call_agent(target.url, 'deploy', payload)
-        
-        if not success:
-            errors.append(f"{pkg.name}: {msg}")
-            continue
-
-        # Deploy
-        deployment.status = PackageDeploymentStatus.deployed
-        deployment.deployed_at = datetime.utcnow()
-        deployed_count += 1
-        log_event('package', 'deploy', f'Deployed {pkg.name} to {target.name} (Bulk)')
-        
-    db.session.commit()
-    update_release_status(release)
+    try:
+        with lease_targets([target.id], 'deploy_all') as lease:
+            deployed_count, errors = deploy_release_to_target(release, target, lease=lease)
+    except LeaseBusy as e:
+        flash(f'Deployment prevented: {e}', 'error')
+        return redirect(url_for('release_detail', release_id=release_id))
+    except (LeaseLost, StaleDataError) as e:
+        flash(f'Deployment aborted, {target.name} was changed concurrently: {e}', 'error')
+        return redirect(url_for('release_detail', release_id=release_id))
 
     if errors:
         flash(f"Partial Deployment Completed. {len(errors)} errors occurred: <br>" + "<br>".join(errors), 'warning')
@@ -807,6 +1680,26 @@ def deploy_release_all(release_id):
         
     return redirect(url_for('release_detail', release_id=release_id))
 
+@app.route('/release/<int:release_id>/plan')
+def deployment_plan(release_id):
+    release = Release.query.get_or_404(release_id)
+    target_id = request.args.get('target_id')
+    if not target_id:
+        flash('No target selected for the deployment plan', 'error')
+        return redirect(url_for('release_detail', release_id=release_id))
+    target = DeploymentTarget.query.get_or_404(target_id)
+    plan = build_deployment_plan(release, target)
+    return render_template('deployment_plan.html', release=release, target=target, plan=plan)
+
+@app.route('/api/release/<int:release_id>/plan')
+def deployment_plan_api(release_id):
+    release = Release.query.get_or_404(release_id)
+    target_id = request.args.get('target_id')
+    if not target_id:
+        return jsonify({'error': 'target_id is required'}), 400
+    target = DeploymentTarget.query.get_or_404(target_id)
+    return jsonify(build_deployment_plan(release, target))
+
 @app.route('/release/<int:release_id>/fallback_all', methods=['POST'])
 @requires_role(Role.release_manager)
 def fallback_release_all(release_id):
@@ -829,6 +1722,10 @@ def fallback_release_all(release_id):
     # Let's check `request.form`.
     
     target_id = request.form.get('target_id')
+    if target_id:
+        if not target_id.isdigit():
+            abort(400, 'target_id must be a target id')
+        target_id = DeploymentTarget.query.get_or_404(int(target_id)).id
     
     # Reverse topological order
     packages = get_sorted_packages(release.packages)
@@ -836,26 +1733,46 @@ def fallback_release_all(release_id):
     
     count = 0
     errors = []
-    
-    for pkg in packages:
-         # Find ALL deployments or Specific one? 
-         if target_id:
-             deployments = PackageDeployment.query.filter_by(package_id=pkg.id, target_id=target_id).all()
-         else:
-             deployments = pkg.deployments
-             
-         for d in deployments:
-             if d.status == PackageDeploymentStatus.deployed:
-                 if d.target.status != TargetStatus.available:
-                     errors.append(f"Package {pkg.name} stuck on LOCKED target {d.target.name}")
-                     continue
-                 
-                 d.status = PackageDeploymentStatus.distributed
-                 d.deployed_at = datetime.utcnow() # Updated time
-                 count += 1
-                 log_event('package', 'fallback', f'Fallback {pkg.name} on {d.target.name} (Bulk)')
-              
-    db.session.commit()
+
+    # Lease every target this fallback touches
+    if target_id:
+        leased_ids = [target_id]
+    else:
+        leased_ids = [t for (t,) in db.session.query(PackageDeployment.target_id).join(Package).filter(
+            Package.release_id == release.id, PackageDeployment.status == PackageDeploymentStatus.deployed).distinct()]
+    try:
+        with lease_targets(leased_ids, 'fallback_all') as lease:
+            # Acquiring commits (expiring everything), so the deployments below are read under the leases
+            for pkg in packages:
+                 lease.heartbeat()
+                 # Find ALL deployments or Specific one? 
+                 if target_id:
+                     deployments = PackageDeployment.query.filter_by(package_id=pkg.id, target_id=target_id).all()
+                 else:
+                     deployments = pkg.deployments
+                     
+                 for d in deployments:
+                     if d.status == PackageDeploymentStatus.deployed:
+                         if d.target_id not in leased_ids:
+                             # Deployed there between the lookup and the leases; not ours to change
+                             errors.append(f"Package {pkg.name} was deployed on {d.target.name} meanwhile, run the fallback again")
+                             continue
+                         if d.target.status != TargetStatus.available:
+                             errors.append(f"Package {pkg.name} stuck on LOCKED target {d.target.name}")
+                             continue
+                         
+                         d.status = PackageDeploymentStatus.distributed
+                         d.deployed_at = datetime.utcnow() # Updated time
+                         count += 1
+                         log_event('package', 'fallback', f'Fallback {pkg.name} on {d.target.name} (Bulk)')
+                      
+            db.session.commit()
+    except LeaseBusy as e:
+        flash(f'Fallback prevented: {e}', 'error')
+        return redirect(url_for('release_detail', release_id=release_id))
+    except (LeaseLost, StaleDataError) as e:
+        flash(f'Fallback aborted, a deployment was changed concurrently: {e}', 'error')
+        return redirect(url_for('release_detail', release_id=release_id))
     update_release_status(release)
     
     if errors:
@@ -865,18 +1782,128 @@ def fallback_release_all(release_id):
 
     return redirect(url_for('release_detail', release_id=release_id))
 
+EVENT_ARCHIVE_PAGE_SIZE = 200
+
 @app.route('/events')
 def events():
     category = request.args.get('category')
+    month = request.args.get('archive')
+    archive = EventArchive(app.config['EVENT_ARCHIVE_DIR'])
+    archive_months = archive.months()
+    if month:
+        # Archived months are streamed page by page from their gzip file, oldest first
+        if month not in dict(archive_months):
+            flash(f'No archived events for {month}.', 'error')
+            return redirect(url_for('events', category=category))
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        events, has_more = archive.page(month, category, offset, EVENT_ARCHIVE_PAGE_SIZE)
+        return render_template('events.html', events=events, category=category, archive_months=archive_months,
+                               archive_month=month, offset=offset, has_more=has_more, page_size=EVENT_ARCHIVE_PAGE_SIZE)
     if category:
         events = EventLog.query.filter_by(category=category).order_by(EventLog.timestamp.desc()).all()
     else:
         events = EventLog.query.order_by(EventLog.timestamp.desc()).all()
-    return render_template('events.html', events=events, category=category)
+    return render_template('events.html', events=events, category=category, archive_months=archive_months)
+
+@app.route('/export/<dataset>.<fmt>')
+def export_data(dataset, fmt):
+    """
+    Stream events (archived months included) or deployment state as CSV/JSONL, ?gzip=1 to compress.
+    Events: ?category=&since=&until= (YYYY-MM-DD, until exclusive). Deployments: ?release_id=&target_id=.
+    """
+    if dataset not in ('events', 'deployments') or fmt not in export.FORMATS:
+        return jsonify({'error': 'Use /export/events.<csv|jsonl> or /export/deployments.<csv|jsonl>'}), 404
+    if dataset == 'events':
+        try:
+            since = _parse_date_arg('since', None)
+            until = _parse_date_arg('until', None)
+        except ValueError:
+            return jsonify({'error': 'since and until must be YYYY-MM-DD'}), 400
+        filters = dict(category=request.args.get('category') or None,
+                       since=datetime.combine(since, datetime.min.time()) if since else None,
+                       until=datetime.combine(until, datetime.min.time()) if until else None,
+                       archive_dir=app.config['EVENT_ARCHIVE_DIR'])
+    else:
+        filters = dict(release_id=request.args.get('release_id', type=int),
+                       target_id=request.args.get('target_id', type=int))
+
+    compress = request.args.get('gzip') == '1'
+    filename = f'{dataset}-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}' + ('.gz' if compress else '')
+    return Response(stream_with_context(export.export(dataset, fmt, compress, **filters)),
+                    mimetype='application/gzip' if compress else export.FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+# Deployment attempt statistics
+
+def _attempt_filters():
+    operation = request.args.get('operation', 'deploy')
+    days = request.args.get('days', type=int)
+    filters = [DeploymentAttempt.operation == operation]
+    if days:
+        filters.append(DeploymentAttempt.started_at >= datetime.utcnow() - timedelta(days=days))
+    return operation, filters
+
+@app.route('/api/stats/slowest_packages')
+def stats_slowest_packages():
+    operation, filters = _attempt_filters()
+    limit = min(request.args.get('limit', 20, type=int), 500)
+    rows = db.session.query(
+        DeploymentAttempt.package_id,
+        Package.name,
+        Release.name,
+        func.count(DeploymentAttempt.id),
+        func.avg(DeploymentAttempt.latency_seconds),
+        func.max(DeploymentAttempt.latency_seconds)
+    ).join(Package, Package.id == DeploymentAttempt.package_id).join(Release).filter(*filters).group_by(
+        DeploymentAttempt.package_id, Package.name, Release.name
+    ).order_by(func.avg(DeploymentAttempt.latency_seconds).desc()).limit(limit).all()
+    return jsonify({
+        'operation': operation,
+        'packages': [{'package_id': pid, 'package': name, 'release': rel, 'attempts': n,
+                      'avg_seconds': avg, 'max_seconds': mx} for pid, name, rel, n, avg, mx in rows]
+    })
+
+@app.route('/api/stats/slowest_targets')
+def stats_slowest_targets():
+    operation, filters = _attempt_filters()
+    rows = db.session.query(
+        DeploymentAttempt.target_id,
+        DeploymentTarget.name,
+        func.count(DeploymentAttempt.id),
+        func.sum(case((DeploymentAttempt.outcome != 'success', 1), else_=0)),
+        func.avg(DeploymentAttempt.latency_seconds),
+        func.max(DeploymentAttempt.latency_seconds)
+    ).join(DeploymentTarget, DeploymentTarget.id == DeploymentAttempt.target_id).filter(*filters).group_by(
+        DeploymentAttempt.target_id, DeploymentTarget.name
+    ).order_by(func.avg(DeploymentAttempt.latency_seconds).desc()).all()
+    return jsonify({
+        'operation': operation,
+        'targets': [{'target_id': tid, 'target': name, 'attempts': n, 'failures': failures,
+                     'avg_seconds': avg, 'max_seconds': mx} for tid, name, n, failures, avg, mx in rows]
+    })
+
+@app.route('/api/stats/target_percentiles')
+def stats_target_percentiles():
+    """p-th percentile of agent latency per target (default p95 of deploys)."""
+    operation, filters = _attempt_filters()
+    pct = min(max(request.args.get('percentile', 95, type=float), 0), 100)
+    counts = db.session.query(DeploymentAttempt.target_id, DeploymentTarget.name, func.count(DeploymentAttempt.id)).join(
+        DeploymentTarget, DeploymentTarget.id == DeploymentAttempt.target_id
+    ).filter(*filters).group_by(DeploymentAttempt.target_id, DeploymentTarget.name).all()
+
+    result = []
+    for target_id, name, n in counts:
+        # Nearest-rank percentile; one indexed ORDER BY/OFFSET probe per target
+        offset = max(0, math.ceil(pct / 100.0 * n) - 1)
+        value = db.session.query(DeploymentAttempt.latency_seconds).filter(
+            DeploymentAttempt.target_id == target_id, *filters
+        ).order_by(DeploymentAttempt.latency_seconds).offset(offset).limit(1).scalar()
+        result.append({'target_id': target_id, 'target': name, 'attempts': n, f'p{pct:g}_seconds': value})
+    return jsonify({'operation': operation, 'percentile': pct, 'targets': result})
 
 if __name__ == '__main__':
+    create_app()
     with app.app_context():
-        db.create_all()
         # Seed Users if not exist
         if not User.query.first():
             print("Seeding Users...")
@@ -887,4 +1914,6 @@ if __name__ == '__main__':
             db.session.commit()
             print("Users seeded.")
 
+    if app.config['SCHEDULER_ENABLED']:
+        schedule_executor.start()
     app.run(debug=True, use_reloader=False)
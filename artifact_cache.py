@@ -0,0 +1,207 @@
+"""
+Content-addressed artifact store for agents.
+
+Artifacts are streamed from Nexus and hashed (SHA-256) during the download, then stored
+once under objects/<aa>/<digest>. An index maps each URL to its digest, so distributing
+an artifact that is already held (same URL, or same checksum) does not download it again.
+Interrupted downloads stay in partial/ and are resumed with an HTTP Range request.
+Objects are evicted least-recently-used once the store grows beyond its quota.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ArtifactError(Exception):
+    pass
+
+
+class ChecksumMismatch(ArtifactError):
+    pass
+
+
+class ArtifactCache:
+    def __init__(self, root, quota_bytes, timeout=30):
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self.timeout = timeout
+        self.objects_dir = os.path.join(root, 'objects')
+        self.partial_dir = os.path.join(root, 'partial')
+        self.index_path = os.path.join(root, 'index.json')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.partial_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._url_locks = {}
+        # digest -> {'size', 'last_used', 'urls'}; url -> digest
+        self.objects, self.urls = self._load_index()
+
+    # Index handling
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        objects = {d: o for d, o in data.get('objects', {}).items() if os.path.exists(self._object_path(d))}
+        urls = {u: d for u, d in data.get('urls', {}).items() if d in objects}
+        return objects, urls
+
+    def _save_index(self):
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'objects': self.objects, 'urls': self.urls}, f)
+        os.replace(tmp, self.index_path)
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _partial_path(self, url):
+        return os.path.join(self.partial_dir, hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+    @property
+    def used_bytes(self):
+        return sum(o['size'] for o in self.objects.values())
+
+    def lookup(self, url, expected_sha256=None):
+        """Digest of an artifact already held for this URL / checksum, or None."""
+        with self._lock:
+            digest = expected_sha256.lower() if expected_sha256 else self.urls.get(url)
+            if digest and digest in self.objects and os.path.exists(self._object_path(digest)):
+                self.objects[digest]['last_used'] = time.time()
+                if url not in self.urls:
+                    self.urls[url] = digest
+                    self.objects[digest]['urls'].append(url)
+                self._save_index()
+                return digest
+        return None
+
+    def object_path(self, digest):
+        """Path of a held object (counts as a use for LRU), or None."""
+        with self._lock:
+            entry = self.objects.get(digest)
+            if entry is None or not os.path.exists(self._object_path(digest)):
+                return None
+            entry['last_used'] = time.time()
+            return self._object_path(digest)
+
+    # Fetching
+
+    def fetch(self, url, expected_sha256=None):
+        """
+        Make sure the artifact behind `url` is in the store.
+        Returns dict(digest, size, path, cache_hit, downloaded_bytes, resumed).
+        """
+        # One download per URL at a time; concurrent callers wait and then hit the cache
+        with self._lock:
+            url_lock = self._url_locks.setdefault(url, threading.Lock())
+        with url_lock:
+            digest = self.lookup(url, expected_sha256)
+            if digest:
+                return {'digest': digest, 'size': self.objects[digest]['size'], 'path': self._object_path(digest),
+                        'cache_hit': True, 'downloaded_bytes': 0, 'resumed': False}
+            return self._download(url, expected_sha256)
+
+    def _download(self, url, expected_sha256):
+        partial = self._partial_path(url)
+        meta_path = partial + '.json'
+        hasher = hashlib.sha256()
+        offset = 0
+        validator = None
+
+        # Resume: re-hash what we already have, ask only for the rest
+        if os.path.exists(partial) and os.path.exists(meta_path):
+            try:
+                with open(meta_path, encoding='utf-8') as f:
+                    validator = json.load(f).get('validator')
+            except (OSError, ValueError):
+                validator = None
+            if validator:
+                with open(partial, 'rb') as f:
+                    for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                        hasher.update(chunk)
+                        offset += len(chunk)
+
+        headers = {}
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+            headers['If-Range'] = validator  # server sends the full file if it changed
+
+        try:
+            with requests.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                if response.status_code == 206 and offset:
+                    mode, resumed = 'ab', True
+                elif response.status_code == 200:
+                    mode, resumed = 'wb', False
+                    if offset:
+                        hasher, offset = hashlib.sha256(), 0
+                else:
+                    raise ArtifactError(f'Download of {url} failed with HTTP {response.status_code}')
+
+                validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+                with open(meta_path, 'w', encoding='utf-8') as f:
+                    json.dump({'url': url, 'validator': validator}, f)
+
+                downloaded = 0
+                with open(partial, mode) as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+                        hasher.update(chunk)
+                        downloaded += len(chunk)
+        except requests.exceptions.RequestException as e:
+            # Keep the partial file for the next attempt
+            raise ArtifactError(f'Download of {url} interrupted: {e}') from e
+
+        digest = hasher.hexdigest()
+        if expected_sha256 and digest != expected_sha256.lower():
+            os.remove(partial)
+            os.remove(meta_path)
+            raise ChecksumMismatch(f'Checksum mismatch for {url}: expected {expected_sha256}, got {digest}')
+
+        target = self._object_path(digest)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(partial, target)
+        os.remove(meta_path)
+        size = os.path.getsize(target)
+
+        with self._lock:
+            entry = self.objects.setdefault(digest, {'size': size, 'last_used': 0, 'urls': []})
+            entry['last_used'] = time.time()
+            if url not in entry['urls']:
+                entry['urls'].append(url)
+            self.urls[url] = digest
+            self._evict(keep=digest)
+            self._save_index()
+
+        return {'digest': digest, 'size': size, 'path': target, 'cache_hit': False,
+                'downloaded_bytes': downloaded, 'resumed': resumed}
+
+    def _evict(self, keep=None):
+        """Drop least recently used objects until the store fits the quota (lock held)."""
+        used = self.used_bytes
+        for digest, entry in sorted(self.objects.items(), key=lambda item: item[1]['last_used']):
+            if used <= self.quota_bytes:
+                break
+            if digest == keep:
+                continue
+            try:
+                os.remove(self._object_path(digest))
+            except OSError:
+                pass
+            used -= entry['size']
+            for url in entry['urls']:
+                if self.urls.get(url) == digest:
+                    del self.urls[url]
+            del self.objects[digest]
+
+    def stats(self):
+        with self._lock:
+            return {'objects': len(self.objects), 'urls': len(self.urls),
+                    'used_bytes': self.used_bytes, 'quota_bytes': self.quota_bytes}
@@ -0,0 +1,183 @@
+"""
+Repeatable route benchmark through the Flask test client.
+
+Runs against a copy of a database built by seed_data.py, so the seeded file is never
+modified, times the main pages and bulk operations, and appends the results to a
+JSONL file. Each run is compared with the previous run on the same dataset.
+
+    python seed_data.py --db sqlite:///bench.db
+    python benchmark.py --db bench.db --repeat 5
+
+Agent calls are answered in-process with an immediate success so the numbers
+measure the orchestrator only (DB + rendering), not the network.
+"""
+import argparse
+import json
+import math
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import closing
+from datetime import datetime
+
+REGRESSION_THRESHOLD = 0.20  # flag routes that got 20% slower
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark Release Orchestrator routes')
+    parser.add_argument('--db', default='bench.db', help='SQLite file created by seed_data.py')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per route')
+    parser.add_argument('--warmup', type=int, default=1, help='Untimed runs per route')
+    parser.add_argument('--output', default='benchmark_results.jsonl', help='JSONL file the results are appended to')
+    parser.add_argument('--label', default=None, help='Free text stored with the run (defaults to git describe)')
+    return parser.parse_args(argv)
+
+
+def git_version():
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+class _AgentResponse:
+    # What call_agent reads from a requests.Response
+    status_code = 200
+    headers = {}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    # Nearest-rank percentile
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run(args):
+    db_copy = os.path.join(tempfile.mkdtemp(prefix='ro-bench-'), 'bench.db')
+    # Backup API instead of a file copy: includes what is still in the -wal file
+    with closing(sqlite3.connect(f'file:{args.db}?mode=ro', uri=True)) as source, \
+            closing(sqlite3.connect(db_copy)) as copy:
+        source.backup(copy)
+
+    import app as app_module
+    app = app_module.create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_copy}'})
+    from sqlalchemy import event, func
+    from sqlalchemy.engine import Engine
+    from models import db, User, Role, Release, Package, DeploymentTarget, PackageDeployment, EventLog, TargetStatus
+
+    app_module.requests.post = lambda *a, **kw: _AgentResponse()
+
+    query_counter = {'n': 0}
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _count(*_):
+        query_counter['n'] += 1
+
+    client = app.test_client()
+    with app.app_context():
+        admin = User.query.filter_by(role=Role.admin).first()
+        # Benchmark the release with the most packages
+        release_id = db.session.query(Package.release_id).group_by(Package.release_id).order_by(
+            func.count().desc()).limit(1).scalar()
+        target = DeploymentTarget.query.filter_by(status=TargetStatus.available).first()
+        dataset = {
+            'releases': Release.query.count(),
+            'packages': Package.query.count(),
+            'targets': DeploymentTarget.query.count(),
+            'deployments': PackageDeployment.query.count(),
+            'events': EventLog.query.count(),
+        }
+        if admin is None or release_id is None or target is None:
+            sys.exit('Database is not seeded, run seed_data.py first')
+        admin_id, target_id = admin.id, target.id
+
+    client.post('/login', data={'user_id': admin_id})
+
+    def reset_bulk_state():
+        with app.app_context():
+            package_ids = db.session.query(Package.id).filter_by(release_id=release_id)
+            PackageDeployment.query.filter(PackageDeployment.target_id == target_id,
+                                           PackageDeployment.package_id.in_(package_ids)).delete(synchronize_session=False)
+            db.session.commit()
+
+    scenarios = [
+        ('index', 'GET', '/', None, None),
+        ('release_detail', 'GET', f'/release/{release_id}', None, None),
+        ('events', 'GET', '/events', None, None),
+        ('calendar_events', 'GET', '/api/calendar_events', None, None),
+        ('distribute_all', 'POST', f'/release/{release_id}/distribute_all', {'target_id': target_id}, reset_bulk_state),
+        ('deploy_all', 'POST', f'/release/{release_id}/deploy_all', {'target_id': target_id}, None),
+        ('fallback_all', 'POST', f'/release/{release_id}/fallback_all', {'target_id': target_id}, None),
+    ]
+
+    results = {}
+    for name, method, url, data, setup in scenarios:
+        timings, queries = [], []
+        for i in range(args.warmup + args.repeat):
+            if setup:
+                setup()
+            query_counter['n'] = 0
+            started = time.perf_counter()
+            response = client.open(url, method=method, data=data)
+            elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                sys.exit(f'{name}: {method} {url} returned {response.status_code}')
+            if i >= args.warmup:
+                timings.append(elapsed * 1000)
+                queries.append(query_counter['n'])
+        results[name] = {
+            'runs': len(timings),
+            'min_ms': round(min(timings), 2),
+            'median_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'max_ms': round(max(timings), 2),
+            'queries': max(queries),
+        }
+        print(f'{name:<18} median {results[name]["median_ms"]:>9.2f} ms   p95 {results[name]["p95_ms"]:>9.2f} ms   '
+              f'{results[name]["queries"]:>6} queries')
+
+    record = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'version': args.label or git_version(),
+        'dataset': dataset,
+        'results': results,
+    }
+    compare_with_previous(args.output, record)
+    with open(args.output, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + '\n')
+    print(f'Results appended to {args.output}')
+
+
+def compare_with_previous(path, record):
+    if not os.path.exists(path):
+        return
+    previous = None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry.get('dataset') == record['dataset']:
+                previous = entry
+    if previous is None:
+        print('No previous run on this dataset to compare with.')
+        return
+
+    print(f'Compared with {previous["version"]} ({previous["timestamp"]}):')
+    for name, current in record['results'].items():
+        before = previous['results'].get(name)
+        if not before or not before['median_ms']:
+            continue
+        change = (current['median_ms'] - before['median_ms']) / before['median_ms']
+        flag = '  REGRESSION' if change > REGRESSION_THRESHOLD else ''
+        print(f'  {name:<18} {before["median_ms"]:>9.2f} -> {current["median_ms"]:>9.2f} ms ({change:+.0%}), '
+              f'queries {before["queries"]} -> {current["queries"]}{flag}')
+
+
+if __name__ == '__main__':
+    run(parse_args())
@@ -0,0 +1,79 @@
+"""
+Application settings, read from the environment so every worker of a WSGI server
+(and every host behind a load balancer) is configured the same way.
+"""
+import os
+import secrets
+import time
+
+
+def _flag(environ, name, default):
+    return environ.get(name, default) == '1'
+
+
+def shared_secret_key(instance_path):
+    """
+    Sessions are signed cookies, so all workers must sign with the same key. Without
+    SECRET_KEY in the environment the first worker generates one into the instance folder
+    and the others read it (O_EXCL makes the creation race-free). Hosts that share a
+    database must set SECRET_KEY explicitly.
+    """
+    path = os.path.join(instance_path, 'secret_key')
+    os.makedirs(instance_path, exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        for _ in range(50):
+            with open(path) as f:
+                key = f.read().strip()
+            if key:
+                return key
+            # Created but not written yet by another worker
+            time.sleep(0.01)
+        raise RuntimeError(f'{path} is empty; set SECRET_KEY or delete the file')
+    key = secrets.token_hex(32)
+    with os.fdopen(fd, 'w') as f:
+        f.write(key)
+    return key
+
+
+def load_config(instance_path, environ=None):
+    environ = os.environ if environ is None else environ
+    config = {
+        'SECRET_KEY': environ.get('SECRET_KEY') or shared_secret_key(instance_path),
+        'SQLALCHEMY_DATABASE_URI': environ.get('DATABASE_URL', 'sqlite:///release_orchestrator.db'),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        # Workers write to the same SQLite file: wait for the write lock instead of failing
+        'SQLITE_BUSY_TIMEOUT': float(environ.get('SQLITE_BUSY_TIMEOUT', '30')),
+        'SQLITE_WAL': _flag(environ, 'SQLITE_WAL', '1'),
+        'SESSION_COOKIE_SECURE': _flag(environ, 'SESSION_COOKIE_SECURE', '0'),
+        'SESSION_COOKIE_SAMESITE': environ.get('SESSION_COOKIE_SAMESITE', 'Lax'),
+        # Opt-in SQL profiler (see profiler.py), e.g. SQL_PROFILER=1 SQL_PROFILER_HEADERS=1 on staging
+        'SQL_PROFILER': _flag(environ, 'SQL_PROFILER', '0'),
+        'SQL_PROFILER_HEADERS': _flag(environ, 'SQL_PROFILER_HEADERS', '0'),
+        'SQL_PROFILER_SLOW_SECONDS': float(environ.get('SQL_PROFILER_SLOW_SECONDS', '0.5')),
+        'SQL_PROFILER_LOG': environ.get('SQL_PROFILER_LOG'),
+        # Spans are written as OTLP/JSON lines to this file when set (see tracing.py)
+        'TRACE_EXPORT_FILE': environ.get('TRACE_EXPORT_FILE'),
+        # Agents download the artifact within the distribute call in fan-out mode, so allow more time
+        'FANOUT_AGENT_TIMEOUT': float(environ.get('FANOUT_AGENT_TIMEOUT', '120')),
+        # Background execution of ScheduledDeployment windows (see schedule_executor.py)
+        'SCHEDULER_ENABLED': _flag(environ, 'SCHEDULER_ENABLED', '1'),
+        'SCHEDULER_RETRY_SECONDS': int(environ.get('SCHEDULER_RETRY_SECONDS', '300')),
+        # Target leases of bulk operations (see leases.py): expiry without heartbeat, and how long
+        # a bulk operation waits for a busy target before it is rejected (0 = reject immediately)
+        'LEASE_TTL_SECONDS': int(environ.get('LEASE_TTL_SECONDS', '60')),
+        'LEASE_WAIT_SECONDS': float(environ.get('LEASE_WAIT_SECONDS', '0')),
+        # Where per-process caches learn about changes made by other workers (see invalidation.py):
+        # local:// (single process), sqlite:///path, redis://host:port/db; default: the app database
+        'INVALIDATION_URL': environ.get('INVALIDATION_URL'),
+        # Minimum seconds between two checks for remote invalidations (0 = before every request)
+        'INVALIDATION_POLL_SECONDS': float(environ.get('INVALIDATION_POLL_SECONDS', '0')),
+        # Events older than this move into monthly archives (see event_archive.py; 0 = keep all)
+        'EVENT_RETENTION_DAYS': int(environ.get('EVENT_RETENTION_DAYS', '0')),
+        'EVENT_ARCHIVE_DIR': environ.get('EVENT_ARCHIVE_DIR', os.path.join(instance_path, 'event_archive')),
+        # Time for fetching all agent histories in a drift reconciliation (see reconcile.py)
+        'RECONCILE_BUDGET_SECONDS': float(environ.get('RECONCILE_BUDGET_SECONDS', '30')),
+        'RECONCILE_WORKERS': int(environ.get('RECONCILE_WORKERS', '32')),
+    }
+    return config
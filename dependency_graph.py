@@ -0,0 +1,189 @@
+from collections import deque
+import threading
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+import invalidation
+from models import db, Package, package_dependencies
+
+
+class DependencyGraph:
+    """
+    Process-local index of all package_dependencies edges.
+    Built lazily on first use and dropped whenever a commit touches packages,
+    so transitive questions are answered from memory instead of one query per hop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requires = None      # requirer_id -> set of provider_ids
+        self._required_by = None   # provider_id -> set of requirer_ids
+
+    def invalidate(self):
+        with self._lock:
+            self._requires = None
+            self._required_by = None
+
+    def _load(self):
+        # Snapshot both adjacency maps; a concurrent invalidate only drops the
+        # references, readers keep working on the maps they already hold.
+        requires, required_by = self._requires, self._required_by
+        if requires is not None:
+            return requires, required_by
+
+        with self._lock:
+            if self._requires is None:
+                requires, required_by = {}, {}
+                rows = db.session.execute(
+                    select(package_dependencies.c.requirer_id, package_dependencies.c.provider_id)
+                )
+                for requirer_id, provider_id in rows:
+                    requires.setdefault(requirer_id, set()).add(provider_id)
+                    required_by.setdefault(provider_id, set()).add(requirer_id)
+                self._requires, self._required_by = requires, required_by
+            return self._requires, self._required_by
+
+    @property
+    def requires(self):
+        return self._load()[0]
+
+    @property
+    def required_by(self):
+        return self._load()[1]
+
+    def dependencies_of(self, package_id):
+        """Direct providers of package_id."""
+        return set(self.requires.get(package_id, ()))
+
+    def dependents_of(self, package_id):
+        """Direct requirers of package_id."""
+        return set(self.required_by.get(package_id, ()))
+
+    def transitive_dependencies(self, package_id):
+        """Everything package_id needs, directly or indirectly."""
+        return self._closure(self.requires, package_id)
+
+    def transitive_dependents(self, package_id):
+        """Everything that needs package_id, directly or indirectly."""
+        return self._closure(self.required_by, package_id)
+
+    def find_path(self, source_id, target_id, extra_edges=None):
+        """
+        Shortest requires-path [source_id, ..., target_id], or None if target_id
+        is not reachable. extra_edges ({requirer_id: set(provider_ids)}) are
+        treated as part of the graph, e.g. edges of a pending bulk import.
+        Only the part of the graph reachable from source_id is visited.
+        """
+        requires = self.requires
+        extra_edges = extra_edges or {}
+        parents = {source_id: None}
+        queue = deque([source_id])
+        while queue:
+            node = queue.popleft()
+            if node == target_id:
+                path = []
+                while node is not None:
+                    path.append(node)
+                    node = parents[node]
+                return path[::-1]
+            for nxt in requires.get(node, ()):
+                if nxt not in parents:
+                    parents[nxt] = node
+                    queue.append(nxt)
+            for nxt in extra_edges.get(node, ()):
+                if nxt not in parents:
+                    parents[nxt] = node
+                    queue.append(nxt)
+        return None
+
+    def cycle_for_edge(self, requirer_id, provider_id, extra_edges=None):
+        """
+        Cycle that adding requirer_id -> provider_id would close, as a list of ids
+        starting and ending with requirer_id; None if the edge is safe.
+        """
+        if requirer_id == provider_id:
+            return [requirer_id, requirer_id]
+        path = self.find_path(provider_id, requirer_id, extra_edges)
+        if path is None:
+            return None
+        return [requirer_id] + path
+
+    def topological_waves(self, package_ids):
+        """
+        Split package_ids into waves (lists of ids) so that every dependency
+        inside the set lies in an earlier wave; packages within one wave are
+        independent of each other. Edges leaving the set are ignored and any
+        leftover cycle members end up together in a final wave.
+        """
+        members = set(package_ids)
+        requires = self.requires
+        pending = {pid: len(requires.get(pid, set()) & members) for pid in members}
+        required_by = self.required_by
+        waves = []
+        current = sorted(pid for pid, n in pending.items() if n == 0)
+        while current:
+            waves.append(current)
+            nxt = []
+            for pid in current:
+                del pending[pid]
+                for dependent in required_by.get(pid, ()):
+                    if dependent in pending:
+                        pending[dependent] -= 1
+                        if pending[dependent] == 0:
+                            nxt.append(dependent)
+            current = sorted(nxt)
+        if pending:
+            waves.append(sorted(pending))
+        return waves
+
+    def topological_order(self, package_ids):
+        """package_ids ordered dependencies first."""
+        return [pid for wave in self.topological_waves(package_ids) for pid in wave]
+
+    @staticmethod
+    def _closure(adjacency, start_id):
+        seen = set()
+        queue = deque(adjacency.get(start_id, ()))
+        while queue:
+            node = queue.popleft()
+            if node in seen or node == start_id:
+                continue
+            seen.add(node)
+            queue.extend(adjacency.get(node, ()))
+        return seen
+
+
+dependency_graph = DependencyGraph()
+invalidation.bus.subscribe('dependency_graph', dependency_graph.invalidate)
+
+
+# Invalidation: any flush that adds, changes or removes a Package may have touched
+# the association table (append/remove on `dependencies`, cascaded deletes).
+@event.listens_for(Session, 'after_flush')
+def _mark_dependency_graph_dirty(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Package):
+            session.info['dependency_graph_dirty'] = True
+            # Drop now as well so reads later in the same transaction see the change
+            dependency_graph.invalidate()
+            return
+
+
+def mark_dirty(session):
+    """For Core statements on the association table, which the flush hook does not see."""
+    session.info['dependency_graph_dirty'] = True
+    dependency_graph.invalidate()
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_dependency_graph(session):
+    if session.info.pop('dependency_graph_dirty', False):
+        dependency_graph.invalidate()
+        invalidation.bus.publish('dependency_graph')
+
+
+@event.listens_for(Session, 'after_rollback')
+def _rollback_dependency_graph(session):
+    if session.info.pop('dependency_graph_dirty', False):
+        dependency_graph.invalidate()
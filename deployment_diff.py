@@ -0,0 +1,122 @@
+"""
+Set differences of deployment state, computed by the database.
+
+    target vs target    packages on STAGE but not on PROD (and the reverse), by package id,
+                        optionally only those of one release
+    target vs release   packages of the release definition a target does not have, and
+                        packages on the target that are not part of the release, by name
+
+Each side is a SELECT of keys (package ids, or names when a release is involved); the two
+differences are `left EXCEPT right` and `right EXCEPT left`. Only counts and the requested
+page are fetched, joined to names and to the other side's deployment status. Target sides
+and the other side's status come from ix_deployment_target_package_status alone.
+"""
+from sqlalchemy import and_, except_, func, literal, select
+from sqlalchemy.orm import aliased
+
+from models import db, DeploymentTarget, Package, PackageDeployment, PackageDeploymentStatus, Release
+
+# ?status=: what counts as "on the target"
+PRESENCE = {
+    'deployed': (PackageDeploymentStatus.deployed,),
+    'distributed': (PackageDeploymentStatus.distributed, PackageDeploymentStatus.deployed),
+}
+DIRECTIONS = ('left', 'right')
+
+
+class Side:
+    """One side of a diff: a target (its present packages) or a release definition (all its packages)."""
+
+    def __init__(self, kind, id, name):
+        self.kind = kind
+        self.id = id
+        self.name = name
+
+    @classmethod
+    def parse(cls, value):
+        """'target:<id>' or 'release:<id>'; ValueError if malformed or unknown."""
+        kind, _, raw_id = (value or '').partition(':')
+        model = {'target': DeploymentTarget, 'release': Release}.get(kind)
+        if model is None or not raw_id.isdigit():
+            raise ValueError(f'Expected target:<id> or release:<id>, got {value!r}')
+        obj = db.session.get(model, int(raw_id))
+        if obj is None:
+            raise ValueError(f'Unknown {kind} {raw_id}')
+        return cls(kind, obj.id, obj.name)
+
+    @property
+    def is_target(self):
+        return self.kind == 'target'
+
+    def __str__(self):
+        return f'{self.kind}:{self.id}'
+
+    def as_dict(self):
+        return {'kind': self.kind, 'id': self.id, 'name': self.name}
+
+
+class DeploymentDiff:
+    def __init__(self, left, right, presence='deployed', release_id=None):
+        if presence not in PRESENCE:
+            raise ValueError(f'status must be one of {", ".join(PRESENCE)}')
+        self.left = left
+        self.right = right
+        self.presence = presence
+        # Scope of target sides; a release side is its own scope
+        self.release_id = release_id
+        self.by_name = not (left.is_target and right.is_target)
+
+    def _deployment(self, side):
+        alias = aliased(PackageDeployment)
+        return alias, and_(alias.package_id == Package.id, alias.target_id == side.id,
+                           alias.status.in_(PRESENCE[self.presence]))
+
+    def _rows(self, side):
+        """(select of this side's package rows, their status on it: None for a release)."""
+        if side.is_target:
+            deployment, on = self._deployment(side)
+            statement = select(Package.id).select_from(Package).join(deployment, on)
+            if self.release_id:
+                statement = statement.where(Package.release_id == self.release_id)
+            return statement, deployment.status
+        return select(Package.id).where(Package.release_id == side.id), literal(None)
+
+    def _keys(self, side):
+        statement, _ = self._rows(side)
+        key = Package.name if self.by_name else Package.id
+        return statement.with_only_columns(key)
+
+    def _only(self, direction):
+        """(this side's rows whose key is missing on the other side, status column, other side)."""
+        side, other = (self.left, self.right) if direction == 'left' else (self.right, self.left)
+        missing = except_(self._keys(side), self._keys(other)).subquery()
+        statement, status = self._rows(side)
+        key = Package.name if self.by_name else Package.id
+        return statement.where(key.in_(select(missing.c[0]))), status, other
+
+    def count(self, direction):
+        statement, _, _ = self._only(direction)
+        return db.session.execute(select(func.count()).select_from(statement.subquery())).scalar_one()
+
+    def counts(self):
+        return {direction: self.count(direction) for direction in DIRECTIONS}
+
+    def page(self, direction, offset=0, limit=100):
+        """Rows only on `direction`'s side, ordered by release and package name."""
+        statement, status, other = self._only(direction)
+        columns = [Package.id, Package.name, Release.name, status]
+        if other.is_target:
+            # What the other target has of the package, if anything (e.g. distributed only)
+            other_deployment = aliased(PackageDeployment)
+            statement = statement.outerjoin(other_deployment, and_(other_deployment.package_id == Package.id,
+                                                                   other_deployment.target_id == other.id))
+            columns.append(other_deployment.status)
+        else:
+            columns.append(literal(None))
+        statement = (statement.with_only_columns(*columns).join(Release, Release.id == Package.release_id)
+                     .order_by(Release.name, Package.name, Package.id).offset(offset).limit(limit))
+        return [
+            {'package_id': package_id, 'package': package, 'release': release,
+             'status': own.value if own else None, 'other_status': other_status.value if other_status else None}
+            for package_id, package, release, own, other_status in db.session.execute(statement)
+        ]
@@ -0,0 +1,202 @@
+"""
+Point-in-time deployment state per target.
+
+Every PackageDeployment status change is appended to DeploymentTransition (one small row:
+target, time, package, state code) by a flush hook. Periodic DeploymentCheckpoints store a
+target's complete state, packed and compressed, so "what was on PROD at 14:05 yesterday?"
+is the newest checkpoint before 14:05 plus the transitions between the two, both found
+through the (target_id, timestamp) indexes.
+
+    python deployment_history.py checkpoint        # e.g. hourly from cron
+    python deployment_history.py snapshot --target PROD --at "2026-10-18 14:05"
+
+Checkpoints are only taken for times at least CHECKPOINT_SETTLE_SECONDS in the past, so
+transactions that were still open then (with earlier timestamps) are already committed.
+Core statements that change statuses must call record_transitions() themselves.
+"""
+import argparse
+import struct
+import sys
+import zlib
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+
+from sqlalchemy import event, func, insert, inspect, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import db, DeploymentCheckpoint, DeploymentTarget, DeploymentTransition, Package, PackageDeployment, PackageDeploymentStatus
+
+STATE_CODES = {PackageDeploymentStatus.not_deployed: 1, PackageDeploymentStatus.distributed: 2,
+               PackageDeploymentStatus.deployed: 3}
+STATUS_BY_CODE = {code: status for status, code in STATE_CODES.items()}
+REMOVED = 0
+
+CHECKPOINT_SETTLE_SECONDS = 3600
+# Target id of the empty baseline that marks the start of the history, even on an empty database
+HISTORY_START = 0
+
+
+def record_transitions(conn, changes, timestamp=None):
+    """Append [(target_id, package_id, status or None for removed)] to the history (conn: Session or Connection)."""
+    if not changes:
+        return
+    timestamp = timestamp or datetime.utcnow()
+    conn.execute(insert(DeploymentTransition), [
+        {'target_id': target_id, 'package_id': package_id, 'timestamp': timestamp,
+         'state': STATE_CODES[status] if status is not None else REMOVED}
+        for target_id, package_id, status in changes
+    ])
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_deployment_changes(session, flush_context):
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, PackageDeployment):
+            changes.append((obj.target_id, obj.package_id, obj.status or PackageDeploymentStatus.not_deployed))
+    for obj in session.dirty:
+        if isinstance(obj, PackageDeployment) and inspect(obj).attrs.status.history.has_changes():
+            changes.append((obj.target_id, obj.package_id, obj.status))
+    for obj in session.deleted:
+        if isinstance(obj, PackageDeployment):
+            changes.append((obj.target_id, obj.package_id, None))
+    if changes:
+        record_transitions(session.connection(), changes)
+
+
+def encode_state(state):
+    """{package_id: code} -> (entries, payload): sorted id deltas as uint32, then one byte per state."""
+    ids = sorted(state)
+    deltas = [b - a for a, b in zip([0] + ids, ids)]
+    return len(ids), zlib.compress(struct.pack(f'<{len(ids)}I', *deltas) + bytes(state[i] for i in ids))
+
+
+def decode_state(entries, payload):
+    raw = zlib.decompress(payload)
+    ids = accumulate(struct.unpack_from(f'<{entries}I', raw))
+    return dict(zip(ids, raw[4 * entries:]))
+
+
+def naive_utc(value):
+    """Timestamps are stored as naive UTC: convert an aware datetime, take a naive one as UTC."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def state_at(target_id, at):
+    """
+    ({package_id: code}, deltas_replayed) of the target at `at`, or (None, 0) when `at` is
+    before the history started (the baseline checkpoints).
+    """
+    at = naive_utc(at)
+    checkpoint = db.session.execute(
+        select(DeploymentCheckpoint)
+        .where(DeploymentCheckpoint.target_id == target_id, DeploymentCheckpoint.timestamp <= at)
+        .order_by(DeploymentCheckpoint.timestamp.desc()).limit(1)
+    ).scalar_one_or_none()
+    if checkpoint is None:
+        history_start = db.session.query(func.min(DeploymentCheckpoint.timestamp)).filter(DeploymentCheckpoint.baseline).scalar()
+        if history_start is not None and at < history_start:
+            return None, 0
+        state = {}
+    else:
+        state = decode_state(checkpoint.entries, checkpoint.payload)
+
+    deltas = select(DeploymentTransition.package_id, DeploymentTransition.state).where(
+        DeploymentTransition.target_id == target_id, DeploymentTransition.timestamp <= at)
+    if checkpoint is not None:
+        deltas = deltas.where(DeploymentTransition.timestamp > checkpoint.timestamp)
+    replayed = 0
+    for package_id, code in db.session.execute(deltas.order_by(DeploymentTransition.timestamp, DeploymentTransition.id)):
+        replayed += 1
+        if code == REMOVED:
+            state.pop(package_id, None)
+        else:
+            state[package_id] = code
+    return state, replayed
+
+
+def snapshot(target_id, at):
+    """{package_id: PackageDeploymentStatus} on the target at `at`, or None if unknown (before the history)."""
+    state, _ = state_at(target_id, at)
+    if state is None:
+        return None
+    return {package_id: STATUS_BY_CODE[code] for package_id, code in state.items()}
+
+
+def ensure_baseline():
+    """
+    Once per database: checkpoint the current PackageDeployment state as the start of the history.
+    Workers starting together may all get here; ux_checkpoint_baseline lets only one commit.
+    """
+    if db.session.query(DeploymentCheckpoint.id).first() is not None:
+        return 0
+    states = {HISTORY_START: {}}
+    for target_id, package_id, status in db.session.execute(
+            select(PackageDeployment.target_id, PackageDeployment.package_id, PackageDeployment.status)):
+        states.setdefault(target_id, {})[package_id] = STATE_CODES[status or PackageDeploymentStatus.not_deployed]
+    now = datetime.utcnow()
+    for target_id, state in states.items():
+        entries, payload = encode_state(state)
+        db.session.add(DeploymentCheckpoint(target_id=target_id, timestamp=now, entries=entries,
+                                            payload=payload, baseline=True))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()  # another worker wrote the baseline
+        return 0
+    return len(states)
+
+
+def create_checkpoints(settle_seconds=CHECKPOINT_SETTLE_SECONDS, min_deltas=1):
+    """Checkpoint every target with at least min_deltas transitions since its last checkpoint."""
+    at = datetime.utcnow() - timedelta(seconds=settle_seconds)
+    created = 0
+    for (target_id,) in db.session.execute(select(DeploymentTarget.id)).all():
+        state, replayed = state_at(target_id, at)
+        if state is None or replayed < min_deltas:
+            continue
+        entries, payload = encode_state(state)
+        db.session.add(DeploymentCheckpoint(target_id=target_id, timestamp=at, entries=entries, payload=payload))
+        created += 1
+    db.session.commit()
+    return created
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Deployment state history: checkpoints and point-in-time snapshots')
+    sub = parser.add_subparsers(dest='command', required=True)
+    checkpoint = sub.add_parser('checkpoint', help='Checkpoint targets with new transitions')
+    checkpoint.add_argument('--settle-seconds', type=int, default=CHECKPOINT_SETTLE_SECONDS)
+    checkpoint.add_argument('--min-deltas', type=int, default=1)
+    snap = sub.add_parser('snapshot', help='Print the state of a target at a point in time')
+    snap.add_argument('--target', required=True, help='Target name or id')
+    snap.add_argument('--at', type=datetime.fromisoformat, default=None, help='UTC unless an offset is given, e.g. "2026-10-18 14:05" (default: now)')
+    args = parser.parse_args(argv)
+
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        if args.command == 'checkpoint':
+            print(f'Created {create_checkpoints(args.settle_seconds, args.min_deltas)} checkpoints')
+            return 0
+        target = (DeploymentTarget.query.filter_by(name=args.target).first()
+                  or (db.session.get(DeploymentTarget, int(args.target)) if args.target.isdigit() else None))
+        if target is None:
+            print(f'Unknown target {args.target}', file=sys.stderr)
+            return 1
+        at = args.at or datetime.utcnow()
+        state = snapshot(target.id, at)
+        if state is None:
+            print(f'The deployment history starts after {at}')
+            return 1
+        names = dict(db.session.query(Package.id, Package.name).filter(Package.id.in_(list(state))))
+        for package_id, status in sorted(state.items()):
+            print(f'{package_id}\t{names.get(package_id, "(deleted)")}\t{status.value}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+from sqlalchemy import func
+
+from dependency_graph import dependency_graph
+from models import db, Package, Release, PackageDeployment, PackageDeploymentStatus, DeploymentAttempt, TargetStatus
+
+# Used when neither the package nor the target has any successful deploy on record
+DEFAULT_DEPLOY_SECONDS = 5.0
+
+
+def estimate_deploy_seconds(package_names, target_id):
+    """
+    Expected deploy duration per package name on a target, from the successful deploys in
+    the DeploymentAttempt history. Grouped by name (not package id) so a new release
+    inherits the history of its predecessors.
+    Returns {name: (seconds, source)} where source tells how good the estimate is:
+    'history' (this package on this target), 'other_targets' (this package elsewhere),
+    'target_average' (any package on this target) or 'default'.
+    """
+    names = set(package_names)
+    estimates = {}
+    if not names:
+        return estimates
+
+    deploys = (DeploymentAttempt.operation == 'deploy', DeploymentAttempt.outcome == 'success')
+    rows = db.session.query(
+        Package.name, DeploymentAttempt.target_id,
+        func.count(DeploymentAttempt.id), func.sum(DeploymentAttempt.latency_seconds)
+    ).join(Package, Package.id == DeploymentAttempt.package_id).filter(
+        *deploys, Package.name.in_(names)
+    ).group_by(Package.name, DeploymentAttempt.target_id).all()
+
+    elsewhere = {}
+    for name, row_target_id, samples, total in rows:
+        if row_target_id == target_id:
+            estimates[name] = (total / samples, 'history')
+        else:
+            n, total_seconds = elsewhere.get(name, (0, 0.0))
+            elsewhere[name] = (n + samples, total_seconds + total)
+
+    samples, total = db.session.query(
+        func.count(DeploymentAttempt.id), func.sum(DeploymentAttempt.latency_seconds)
+    ).filter(*deploys, DeploymentAttempt.target_id == target_id).one()
+    target_average = total / samples if samples else None
+
+    for name in names - set(estimates):
+        if name in elsewhere and elsewhere[name][0]:
+            n, total_seconds = elsewhere[name]
+            estimates[name] = (total_seconds / n, 'other_targets')
+        elif target_average is not None:
+            estimates[name] = (target_average, 'target_average')
+        else:
+            estimates[name] = (DEFAULT_DEPLOY_SECONDS, 'default')
+    return estimates
+
+
+def build_deployment_plan(release, target):
+    """
+    Offline simulation of deploy_release_all(release, target): no agent is called.
+    Works on preloaded state (a handful of queries independent of release size) and
+    reports, per package, whether it would be deployed, skipped or fail, groups the
+    deployable packages into waves that could run in parallel and estimates the
+    sequential and critical-path durations from historical agent latencies.
+    """
+    release_ids = {p.id for p in release.packages}
+    # deploy_release_all also walks dependencies outside the release, so the plan does too
+    scope = set(release_ids)
+    for pid in release_ids:
+        scope |= dependency_graph.transitive_dependencies(pid)
+
+    packages = {}
+    if scope:
+        rows = db.session.query(Package.id, Package.name, Release.name).join(Release).filter(Package.id.in_(scope)).all()
+        packages = {pid: {'name': name, 'release': rel_name} for pid, name, rel_name in rows}
+    status = dict(db.session.query(PackageDeployment.package_id, PackageDeployment.status).filter(
+        PackageDeployment.target_id == target.id,
+        PackageDeployment.package_id.in_(scope)
+    ).all()) if scope else {}
+    estimates = estimate_deploy_seconds((p['name'] for p in packages.values()), target.id)
+
+    requires = dependency_graph.requires
+    deployed = {pid for pid, st in status.items() if st == PackageDeploymentStatus.deployed}
+    steps = []
+    to_deploy = {}  # pid -> step
+
+    for pid in dependency_graph.topological_order(packages.keys()):
+        pkg = packages[pid]
+        step = {
+            'id': pid,
+            'name': pkg['name'],
+            'release': pkg['release'],
+            'external': pid not in release_ids,
+            'action': None,
+            'reason': None,
+            'wave': None,
+            'estimate_seconds': None,
+            'estimate_source': None,
+        }
+        current = status.get(pid)
+
+        if current == PackageDeploymentStatus.deployed:
+            step['action'] = 'already_deployed'
+        elif current != PackageDeploymentStatus.distributed:
+            step['action'] = 'skip'
+            step['reason'] = f'Not distributed to {target.name}'
+        else:
+            deps = requires.get(pid, set())
+            missing = [packages[d]['name'] if d in packages else f'#{d}' for d in deps if d not in deployed]
+            if missing:
+                step['action'] = 'fail'
+                step['reason'] = f"Dependencies missing on {target.name}: {', '.join(sorted(missing))}"
+            else:
+                step['action'] = 'deploy'
+                step['estimate_seconds'], step['estimate_source'] = estimates[pkg['name']]
+                # A package can start once the deps deployed in this run are done
+                earlier = [to_deploy[d] for d in deps if d in to_deploy]
+                step['wave'] = max((s['wave'] for s in earlier), default=-1) + 1
+                step['finish_seconds'] = step['estimate_seconds'] + max((s['finish_seconds'] for s in earlier), default=0.0)
+                step['critical_parent'] = max(earlier, key=lambda s: s['finish_seconds'])['id'] if earlier else None
+                deployed.add(pid)
+                to_deploy[pid] = step
+        steps.append(step)
+
+    waves = []
+    for step in to_deploy.values():
+        while len(waves) <= step['wave']:
+            waves.append([])
+        waves[step['wave']].append(step['name'])
+
+    critical_path = []
+    if to_deploy:
+        node = max(to_deploy.values(), key=lambda s: s['finish_seconds'])
+        while node:
+            critical_path.append(node['name'])
+            node = to_deploy.get(node['critical_parent'])
+        critical_path.reverse()
+
+    summary = {action: 0 for action in ('deploy', 'already_deployed', 'skip', 'fail')}
+    for step in steps:
+        summary[step['action']] += 1
+
+    return {
+        'release': {'id': release.id, 'name': release.name},
+        'target': {'id': target.id, 'name': target.name, 'locked': target.status != TargetStatus.available},
+        'steps': steps,
+        'waves': waves,
+        'summary': summary,
+        'estimate': {
+            'sequential_seconds': sum(s['estimate_seconds'] for s in to_deploy.values()),
+            'critical_path_seconds': max((s['finish_seconds'] for s in to_deploy.values()), default=0.0),
+            'critical_path': critical_path,
+        },
+    }
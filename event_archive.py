@@ -0,0 +1,229 @@
+"""
+EventLog retention: events older than the retention period are moved out of the database
+into one gzip-compressed JSON Lines file per month and the database is vacuumed.
+
+    python event_archive.py --days 365          # or EVENT_RETENTION_DAYS=365, e.g. from cron
+
+Only whole months are archived (the cutoff is rounded down to the first of the month).
+Every batch is appended to the month files as a new gzip member and fsynced before the
+rows are deleted, and index.json records each file's size and the ids of a batch whose rows
+are not deleted yet, so an interrupted run neither loses nor duplicates events when it is
+repeated. A missing or unreadable index.json is rebuilt from the complete members of the
+files. Run one archiver at a time. The /events page reads the archives lazily, one page at
+a time (EventArchive.page).
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import zlib
+from collections import namedtuple
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import delete, select
+
+from models import db, EventLog
+
+ArchivedEvent = namedtuple('ArchivedEvent', 'id timestamp category operation description user')
+
+_COLUMNS = (EventLog.id, EventLog.timestamp, EventLog.category, EventLog.operation, EventLog.description, EventLog.user)
+
+
+class EventArchive:
+    def __init__(self, directory):
+        self.directory = directory
+
+    @property
+    def _index_path(self):
+        return os.path.join(self.directory, 'index.json')
+
+    def path(self, month):
+        return os.path.join(self.directory, f'events-{month}.jsonl.gz')
+
+    def index(self):
+        """{month: {'count', 'size', 'max_id', 'first', 'last'[, 'pending']}} of all archived months."""
+        try:
+            with open(self._index_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return self._rebuild_index()
+
+    def _rebuild_index(self):
+        """Index of the month files on disk; appends truncate to 'size', so it must not be lost."""
+        index = {}
+        if not os.path.isdir(self.directory):
+            return index
+        for name in sorted(os.listdir(self.directory)):
+            if name.startswith('events-') and name.endswith('.jsonl.gz'):
+                info = self._scan(os.path.join(self.directory, name))
+                if info['count']:
+                    index[name[len('events-'):-len('.jsonl.gz')]] = info
+        return index
+
+    @staticmethod
+    def _scan(path):
+        """Index entry of a month file from its complete gzip members (a torn last member is left out)."""
+        info = {'count': 0, 'size': 0}
+        offset = 0
+        member, lines = zlib.decompressobj(wbits=31), b''
+        with open(path, 'rb') as f:
+            for data in iter(lambda: f.read(1 << 20), b''):
+                while data:
+                    try:
+                        lines += member.decompress(data)
+                    except zlib.error:
+                        return info  # torn (garbled) last member
+                    if not member.eof:
+                        offset += len(data)
+                        break
+                    # One member (one archived batch) is complete
+                    offset += len(data) - len(member.unused_data)
+                    data = member.unused_data
+                    for line in lines.splitlines():
+                        record = json.loads(line)
+                        info['count'] += 1
+                        info['max_id'] = max(info.get('max_id', 0), record['id'])
+                        info['first'] = min(info.get('first', record['timestamp']), record['timestamp'])
+                        info['last'] = max(info.get('last', record['timestamp']), record['timestamp'])
+                    info['size'] = offset
+                    member, lines = zlib.decompressobj(wbits=31), b''
+        return info
+
+    def _save_index(self, index):
+        tmp = self._index_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(index, f, indent=1, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._index_path)
+
+    def months(self):
+        """[(month, info)], newest month first."""
+        return sorted(self.index().items(), reverse=True)
+
+    def append(self, month, events, info):
+        """Write events (ArchivedEvent rows in id order) as one gzip member; updates info."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(month)
+        with open(path, 'ab') as raw:
+            # Drop the torn tail of an append that did not make it into the index
+            raw.truncate(info.get('size', 0))
+            raw.seek(0, os.SEEK_END)
+            with gzip.GzipFile(fileobj=raw, mode='ab') as gz:
+                for event in events:
+                    record = event._asdict()
+                    record['timestamp'] = event.timestamp.isoformat()
+                    gz.write(json.dumps(record, separators=(',', ':')).encode() + b'\n')
+            raw.flush()
+            os.fsync(raw.fileno())
+            info['size'] = raw.tell()
+        info['count'] = info.get('count', 0) + len(events)
+        info['max_id'] = events[-1].id
+        first, last = min(e.timestamp for e in events).isoformat(), max(e.timestamp for e in events).isoformat()
+        info['first'] = min(info.get('first', first), first)
+        info['last'] = max(info.get('last', last), last)
+
+    def read(self, month, category=None):
+        """Stream the archived events of a month in archive (id) order."""
+        path = self.path(month)
+        if not os.path.exists(path):
+            return
+        with gzip.open(path, 'rb') as f:
+            try:
+                for line in f:
+                    record = json.loads(line)
+                    if category and record['category'] != category:
+                        continue
+                    record['timestamp'] = datetime.fromisoformat(record['timestamp'])
+                    yield ArchivedEvent(**record)
+            except (EOFError, gzip.BadGzipFile, zlib.error):
+                # Torn member of an interrupted run; everything before it is complete
+                return
+
+    def page(self, month, category=None, offset=0, limit=200):
+        """(events, has_more): only offset + limit + 1 events are decoded, one at a time."""
+        events = list(islice(self.read(month, category), offset, offset + limit + 1))
+        return events[:limit], len(events) > limit
+
+
+def retention_cutoff(days, now=None):
+    """Start of the month that contains now - days: everything before it is archived."""
+    now = now or datetime.utcnow()
+    oldest_kept = datetime.fromordinal(now.toordinal() - days)
+    return oldest_kept.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def archive_events(archive, cutoff, batch_size=5000, vacuum=True):
+    """Move events with timestamp < cutoff into the archive. Call inside an app context."""
+    index = archive.index()
+    archived = deleted = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(*_COLUMNS).where(EventLog.timestamp < cutoff, EventLog.id > last_id)
+            .order_by(EventLog.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        by_month = {}
+        for row in rows:
+            event = ArchivedEvent(*row)
+            month = event.timestamp.strftime('%Y-%m')
+            pending = index.get(month, {}).get('pending')
+            if pending and pending[0] <= event.id <= pending[1]:
+                continue  # archived by an interrupted run that did not get to delete it
+            by_month.setdefault(month, []).append(event)
+        for month, events in by_month.items():
+            info = index.setdefault(month, {})
+            archive.append(month, events, info)
+            # Not max_id: SQLite reuses the ids of deleted rows once the newest ones are gone
+            info['pending'] = [events[0].id, events[-1].id]
+            archived += len(events)
+        if by_month:
+            archive._save_index(index)
+
+        result = db.session.execute(delete(EventLog).where(EventLog.id.in_([row.id for row in rows])))
+        db.session.commit()
+        deleted += result.rowcount
+        # Rows of the pending batches this scan has passed are gone now
+        done = [info for info in index.values() if info.get('pending') and info['pending'][1] <= last_id]
+        for info in done:
+            del info['pending']
+        if done:
+            archive._save_index(index)
+
+    if vacuum and deleted and db.engine.dialect.name == 'sqlite':
+        db.session.remove()
+        with db.engine.connect() as conn:
+            conn.execution_options(isolation_level='AUTOCOMMIT').exec_driver_sql('VACUUM')
+    return {'cutoff': cutoff, 'archived': archived, 'deleted': deleted}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Move old EventLog rows into monthly gzip JSONL archives')
+    parser.add_argument('--days', type=int, default=None,
+                        help='Retention in days (default: EVENT_RETENTION_DAYS; 0 keeps everything)')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--no-vacuum', action='store_true', help='Skip VACUUM after deleting')
+    args = parser.parse_args(argv)
+
+    from app import create_app
+    app = create_app()
+    days = args.days if args.days is not None else app.config['EVENT_RETENTION_DAYS']
+    if days <= 0:
+        print('Retention disabled (EVENT_RETENTION_DAYS=0); nothing to do.')
+        return 0
+    archive = EventArchive(app.config['EVENT_ARCHIVE_DIR'])
+    with app.app_context():
+        stats = archive_events(archive, retention_cutoff(days), args.batch_size, vacuum=not args.no_vacuum)
+    print(f"Archived {stats['archived']} events before {stats['cutoff']:%Y-%m-%d} "
+          f"(deleted {stats['deleted']}) into {archive.directory}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Streaming exports for audits: the event history (archived months, then the live table)
+and the current deployment state, as CSV or JSON Lines, optionally gzip-compressed.
+
+    python export.py events --format csv --gzip -o events.csv.gz
+    python export.py deployments --format jsonl --release-id 12 > state.jsonl
+    GET /export/events.csv?gzip=1&category=release&since=2024-01-01
+
+Rows are fetched with yield_per (a server-side cursor where the database has one) and
+encoded into ~64 KB chunks, so memory use does not depend on the size of the export.
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+import zlib
+from datetime import date, datetime
+
+from sqlalchemy import select
+
+from event_archive import EventArchive
+from models import db, EventLog, Package, PackageDeployment, Release, DeploymentTarget
+
+FETCH_ROWS = 1000
+CHUNK_BYTES = 64 * 1024
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+EVENT_COLUMNS = ('id', 'timestamp', 'category', 'operation', 'description', 'user')
+DEPLOYMENT_COLUMNS = ('id', 'release_id', 'release', 'package_id', 'package', 'target_id', 'target',
+                      'status', 'deployed_at', 'version')
+
+
+def _rows(statement):
+    for row in db.session.execute(statement.execution_options(yield_per=FETCH_ROWS)):
+        yield tuple(row)
+
+
+def event_rows(archive_dir=None, category=None, since=None, until=None):
+    """Archived months oldest first (if archive_dir), then the live table; each in insertion (id) order."""
+    if archive_dir:
+        archive = EventArchive(archive_dir)
+        for month, _ in reversed(archive.months()):
+            if (since and month < since.strftime('%Y-%m')) or (until and month > until.strftime('%Y-%m')):
+                continue
+            for event in archive.read(month, category):
+                if (since and event.timestamp < since) or (until and event.timestamp >= until):
+                    continue
+                yield tuple(event)
+
+    statement = select(EventLog.id, EventLog.timestamp, EventLog.category, EventLog.operation,
+                       EventLog.description, EventLog.user).order_by(EventLog.id)
+    if category:
+        statement = statement.where(EventLog.category == category)
+    if since:
+        statement = statement.where(EventLog.timestamp >= since)
+    if until:
+        statement = statement.where(EventLog.timestamp < until)
+    yield from _rows(statement)
+
+
+def deployment_rows(release_id=None, target_id=None):
+    """Current PackageDeployment state with release, package and target names."""
+    statement = (select(PackageDeployment.id, Release.id, Release.name, Package.id, Package.name,
+                        DeploymentTarget.id, DeploymentTarget.name, PackageDeployment.status,
+                        PackageDeployment.deployed_at, PackageDeployment.version)
+                 .join(Package, Package.id == PackageDeployment.package_id)
+                 .join(Release, Release.id == Package.release_id)
+                 .join(DeploymentTarget, DeploymentTarget.id == PackageDeployment.target_id)
+                 .order_by(PackageDeployment.id))
+    if release_id:
+        statement = statement.where(Release.id == release_id)
+    if target_id:
+        statement = statement.where(DeploymentTarget.id == target_id)
+    yield from _rows(statement)
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, 'value'):  # enums
+        return value.value
+    return value
+
+
+def encode(rows, columns, fmt):
+    """Yield the rows as CSV or JSONL text in chunks of about CHUNK_BYTES."""
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        write = lambda row: writer.writerow(['' if v is None else _plain(v) for v in row])
+    else:
+        write = lambda row: buffer.write(json.dumps(dict(zip(columns, map(_plain, row))), separators=(',', ':')) + '\n')
+    for row in rows:
+        write(row)
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def gzip_chunks(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(dataset, fmt, compress=False, **filters):
+    """Byte chunks of a whole export; iterate inside an app context."""
+    if dataset == 'events':
+        chunks = encode(event_rows(**filters), EVENT_COLUMNS, fmt)
+    elif dataset == 'deployments':
+        chunks = encode(deployment_rows(**filters), DEPLOYMENT_COLUMNS, fmt)
+    else:
+        raise ValueError(f'Unknown dataset {dataset}')
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stream events or deployment state as CSV/JSONL')
+    parser.add_argument('dataset', choices=('events', 'deployments'))
+    parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+    parser.add_argument('--gzip', action='store_true')
+    parser.add_argument('-o', '--output', default='-', help='File to write (default: stdout)')
+    parser.add_argument('--category', help='events: only this category')
+    parser.add_argument('--since', type=date.fromisoformat, help='events: from this date (YYYY-MM-DD)')
+    parser.add_argument('--until', type=date.fromisoformat, help='events: before this date (YYYY-MM-DD)')
+    parser.add_argument('--no-archive', action='store_true', help='events: skip archived months')
+    parser.add_argument('--release-id', type=int, help='deployments: only this release')
+    parser.add_argument('--target-id', type=int, help='deployments: only this target')
+    args = parser.parse_args(argv)
+
+    from app import create_app
+    app = create_app()
+    if args.dataset == 'events':
+        filters = dict(category=args.category,
+                       since=datetime.combine(args.since, datetime.min.time()) if args.since else None,
+                       until=datetime.combine(args.until, datetime.min.time()) if args.until else None,
+                       archive_dir=None if args.no_archive else app.config['EVENT_ARCHIVE_DIR'])
+    else:
+        filters = dict(release_id=args.release_id, target_id=args.target_id)
+
+    out = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+    try:
+        with app.app_context():
+            for chunk in export(args.dataset, args.format, args.gzip, **filters):
+                out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
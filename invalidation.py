@@ -0,0 +1,168 @@
+"""
+Cross-process invalidation for the per-process caches (dependency graph, schedule index,
+scheduler queue).
+
+Each cache owns a channel. A worker that commits a change publishes the channel, which
+bumps a version counter in a shared backend. Before handling a request every worker
+compares the versions with the ones it has seen and calls the subscribers of every channel
+that moved, so caches are dropped before anything reads them. Publishing happens right
+after the commit, before the response is sent: once a client sees its change succeed,
+no worker serves the old state anymore.
+
+Backends (INVALIDATION_URL):
+    local://                 in-process only (one worker)
+    sqlite:///path.db        a small table in any SQLite file shared by the workers
+    redis://host:6379/0      Redis counters (needs the `redis` package)
+Without INVALIDATION_URL the app database itself is used.
+"""
+import logging
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+
+logger = logging.getLogger('release_orchestrator.invalidation')
+
+
+class LocalBackend:
+    """Single process: nothing to share."""
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def bump(self, channel):
+        with self._lock:
+            self._versions[channel] = self._versions.get(channel, 0) + 1
+            return self._versions[channel]
+
+    def versions(self, channels):
+        with self._lock:
+            return {c: self._versions.get(c, 0) for c in channels}
+
+
+class DatabaseBackend:
+    """Version counters in an `invalidation_channel` table (SQLite or the app database)."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        with engine.begin() as conn:
+            conn.execute(text('CREATE TABLE IF NOT EXISTS invalidation_channel '
+                              '(name VARCHAR(50) PRIMARY KEY, version INTEGER NOT NULL)'))
+
+    @classmethod
+    def from_url(cls, url):
+        return cls(create_engine(url, connect_args={'timeout': 30} if url.startswith('sqlite') else {}))
+
+    def bump(self, channel):
+        # Own connection: publishing runs after the session's commit, outside its transaction
+        with self.engine.begin() as conn:
+            conn.execute(text('INSERT INTO invalidation_channel (name, version) VALUES (:name, 1) '
+                              'ON CONFLICT (name) DO UPDATE SET version = invalidation_channel.version + 1'),
+                         {'name': channel})
+            return conn.execute(text('SELECT version FROM invalidation_channel WHERE name = :name'),
+                                {'name': channel}).scalar_one()
+
+    def versions(self, channels):
+        with self.engine.connect() as conn:
+            rows = dict(conn.execute(text('SELECT name, version FROM invalidation_channel')).all())
+        return {c: rows.get(c, 0) for c in channels}
+
+
+class RedisBackend:
+    def __init__(self, url, prefix='release_orchestrator:invalidation:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def bump(self, channel):
+        return int(self.client.incr(self.prefix + channel))
+
+    def versions(self, channels):
+        values = self.client.mget([self.prefix + c for c in channels]) if channels else []
+        return {c: int(v or 0) for c, v in zip(channels, values)}
+
+
+def backend_from_url(url, engine=None):
+    if url is None:
+        return DatabaseBackend(engine) if engine is not None else LocalBackend()
+    if url.startswith('local:'):
+        return LocalBackend()
+    if url.startswith('redis:') or url.startswith('rediss:'):
+        return RedisBackend(url)
+    return DatabaseBackend.from_url(url)
+
+
+class InvalidationBus:
+    def __init__(self):
+        self.backend = LocalBackend()
+        self.poll_seconds = 0
+        self._lock = threading.Lock()
+        self._subscribers = {}   # channel -> [callback]
+        self._seen = {}          # channel -> last version this process acted on
+        self._last_poll = 0.0
+
+    def configure(self, backend, poll_seconds=0):
+        self.backend = backend
+        self.poll_seconds = poll_seconds
+        # Caches start empty, so the current versions need no action
+        with self._lock:
+            self._seen = backend.versions(list(self._subscribers))
+
+    def subscribe(self, channel, callback):
+        """callback() drops the cache; it runs in the thread that notices the change."""
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(callback)
+            self._seen.setdefault(channel, 0)
+
+    def publish(self, channel):
+        """Tell the other processes that `channel` changed (this process already applied it)."""
+        try:
+            version = self.backend.bump(channel)
+        except Exception:
+            # The change is committed; other workers catch up at their next successful poll
+            # of a later version, so log instead of failing the request
+            logger.exception('Could not publish invalidation of %s', channel)
+            return
+        with self._lock:
+            # Only skip our own bump; if another process bumped in between, the next
+            # poll must still notify our subscribers
+            if self._seen.get(channel, 0) + 1 == version:
+                self._seen[channel] = version
+
+    def poll(self, force=False):
+        """Run the subscribers of every channel another process has published since the last poll."""
+        now = time.monotonic()
+        if not force and self.poll_seconds and now - self._last_poll < self.poll_seconds:
+            return
+        self._last_poll = now
+        with self._lock:
+            channels = list(self._subscribers)
+        if not channels:
+            return
+        try:
+            versions = self.backend.versions(channels)
+        except Exception:
+            logger.exception('Could not poll invalidations')
+            return
+        callbacks = []
+        with self._lock:
+            for channel, version in versions.items():
+                if version != self._seen.get(channel, 0):
+                    self._seen[channel] = version
+                    callbacks.extend(self._subscribers[channel])
+        for callback in callbacks:
+            callback()
+
+
+bus = InvalidationBus()
+
+
+def init_app(app, engine):
+    """Pick the backend from INVALIDATION_URL (default: the app database) and poll before every request."""
+    bus.configure(backend_from_url(app.config.get('INVALIDATION_URL'), engine),
+                  app.config.get('INVALIDATION_POLL_SECONDS', 0))
+
+    @app.before_request
+    def _poll_invalidations():
+        bus.poll()
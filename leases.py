@@ -0,0 +1,144 @@
+"""
+Target leases: an expiring, exclusive claim on a deployment target for one bulk operation.
+
+Acquiring is a single INSERT (or a takeover UPDATE of an expired lease), so two requests
+or workers can never both hold a target. The holder extends the lease with heartbeats
+while it works; a crashed holder's lease simply expires. Operations on different targets
+do not share anything and run in parallel.
+"""
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, TargetLease
+
+
+class LeaseBusy(Exception):
+    """The target is leased by someone else."""
+
+    def __init__(self, lease):
+        self.lease = lease
+        super().__init__(f'{lease.target.name if lease.target else lease.target_id} is busy: '
+                         f'{lease.operation} by {lease.owner} (lease expires {lease.expires_at:%H:%M:%S} UTC)')
+
+
+class LeaseLost(Exception):
+    """The lease expired and was taken over while the operation was still running."""
+
+
+def lease_owner(username):
+    return f'{username or "system"}@{socket.gethostname()}:{os.getpid()}'
+
+
+class Lease:
+    def __init__(self, target_id, token, ttl):
+        self.target_id = target_id
+        self.token = token
+        self.ttl = ttl
+        self._last_beat = time.monotonic()
+
+    def heartbeat(self, force=False):
+        """Extend the lease (at most every ttl/3 unless forced). Commits. Raises LeaseLost."""
+        if not force and time.monotonic() - self._last_beat < self.ttl / 3:
+            return
+        now = datetime.utcnow()
+        result = db.session.execute(
+            update(TargetLease)
+            .where(TargetLease.target_id == self.target_id, TargetLease.token == self.token)
+            .values(heartbeat_at=now, expires_at=now + timedelta(seconds=self.ttl))
+        )
+        db.session.commit()
+        if result.rowcount != 1:
+            raise LeaseLost(f'Lease on target {self.target_id} was lost')
+        self._last_beat = time.monotonic()
+
+    def release(self):
+        db.session.execute(delete(TargetLease).where(TargetLease.target_id == self.target_id,
+                                                     TargetLease.token == self.token))
+        db.session.commit()
+
+
+def _try_acquire(target_id, owner, operation, ttl):
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+    values = dict(token=token, owner=owner[:100], operation=operation[:50], acquired_at=now,
+                  heartbeat_at=now, expires_at=now + timedelta(seconds=ttl))
+    # Take over an expired lease...
+    result = db.session.execute(
+        update(TargetLease).where(TargetLease.target_id == target_id, TargetLease.expires_at < now).values(**values))
+    if result.rowcount != 1:
+        # ...or create one; the primary key makes concurrent inserts fail for all but one
+        try:
+            # Core INSERT: the session may still hold the previous holder's row
+            db.session.execute(insert(TargetLease).values(target_id=target_id, **values))
+        except IntegrityError:
+            db.session.rollback()
+            return None
+    db.session.commit()
+    return Lease(target_id, token, ttl)
+
+
+def acquire(target_id, owner, operation, ttl=60, wait=0):
+    """
+    Lease one target. Waits up to `wait` seconds for a busy target (serialize),
+    then raises LeaseBusy (reject). Commits the session.
+    """
+    deadline = time.monotonic() + wait
+    while True:
+        lease = _try_acquire(target_id, owner, operation, ttl)
+        if lease is not None:
+            return lease
+        if time.monotonic() >= deadline:
+            holder = db.session.get(TargetLease, target_id)
+            if holder is None:
+                continue  # released in the meantime
+            raise LeaseBusy(holder)
+        time.sleep(min(0.5, max(0.0, deadline - time.monotonic())))
+
+
+class LeaseSet:
+    """Leases on several targets, taken in id order (no deadlocks) and released together."""
+
+    def __init__(self, leases):
+        self.leases = leases
+
+    def heartbeat(self, force=False):
+        for lease in self.leases:
+            lease.heartbeat(force)
+
+    def release(self):
+        for lease in self.leases:
+            lease.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            db.session.rollback()
+        self.release()
+        return False
+
+
+def acquire_all(target_ids, owner, operation, ttl=60, wait=0):
+    """Lease all targets or none (LeaseBusy names the first busy one)."""
+    leases = []
+    try:
+        for target_id in sorted(set(target_ids)):
+            leases.append(acquire(target_id, owner, operation, ttl, wait))
+    except Exception:
+        for lease in leases:
+            lease.release()
+        raise
+    return LeaseSet(leases)
+
+
+def current_leases():
+    """Active (not expired) leases by target id."""
+    now = datetime.utcnow()
+    return {lease.target_id: lease for lease in TargetLease.query.filter(TargetLease.expires_at >= now)}
@@ -1,4 +1,6 @@
-from app import app
+from app import create_app
+
+app = create_app()
 
 with open('routes_dump.txt', 'w') as f:
     f.write("Listing Routes:\n")
@@ -0,0 +1,123 @@
+"""
+Load driver for bulk distribute / deploy against a simulated agent fleet.
+
+    python agent_fleet.py --count 30 --latency-ms 100 &      # registers SIM-AGENT-* targets
+    python app.py &
+    python load_test.py --packages 50 --concurrency 10
+
+Creates a fresh release with --packages packages, then runs Distribute Release and
+Deploy Release for every target in the fleet manifest, --concurrency targets at a time,
+and reports throughput and tail latency of the bulk requests. Per agent-call latency
+is available from the orchestrator's /metrics endpoint.
+"""
+import argparse
+import json
+import math
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk distribute/deploy load test')
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--manifest', default='fleet.json', help='Written by agent_fleet.py')
+    parser.add_argument('--packages', type=int, default=20)
+    parser.add_argument('--chain', action='store_true', help='Make every package depend on the previous one')
+    parser.add_argument('--concurrency', type=int, default=5, help='Targets processed in parallel')
+    parser.add_argument('--cleanup', action='store_true', help='Delete the release afterwards')
+    return parser.parse_args(argv)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    # Nearest-rank percentile
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def login_as_admin(base_url):
+    session = requests.Session()
+    page = session.get(f'{base_url}/login')
+    match = re.search(r'value="(\d+)">admin_user', page.text)
+    session.post(f'{base_url}/login', data={'user_id': match.group(1) if match else '1'})
+    return session
+
+
+def create_release(session, base_url, packages, chain):
+    name = f'LOAD-{int(time.time())}'
+    r = session.post(f'{base_url}/release/new', data={'name': name, 'description': 'load test', 'manager': 'load', 'deputy': 'load'})
+    if '/release/' not in r.url:
+        sys.exit(f'Could not create release {name}')
+    release_id = r.url.rstrip('/').split('/')[-1]
+    for i in range(packages):
+        session.post(f'{base_url}/release/{release_id}/add_package',
+                     data={'name': f'load-pkg-{i:04d}', 'url': f'http://nexus.local/load-pkg-{i:04d}.tar.gz',
+                           'status': 'registered', 'status_message': ''})
+    if chain and packages > 1:
+        edges = [[f'load-pkg-{i:04d}', f'load-pkg-{i - 1:04d}'] for i in range(1, packages)]
+        session.post(f'{base_url}/api/release/{release_id}/dependencies', json={'edges': edges})
+    return name, release_id
+
+
+def run_phase(session, base_url, release_id, targets, operation, concurrency):
+    local = threading.local()
+
+    def worker_session():
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+            local.session.cookies.update(session.cookies)
+        return local.session
+
+    def run_one(target):
+        started = time.perf_counter()
+        r = worker_session().post(f'{base_url}/release/{release_id}/{operation}', data={'target_id': target['target_id']})
+        return target, time.perf_counter() - started, r.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(run_one, targets))
+    return results, time.perf_counter() - started
+
+
+def main():
+    args = parse_args()
+    with open(args.manifest, encoding='utf-8') as f:
+        targets = [a for a in json.load(f) if a.get('target_id')]
+    if not targets:
+        sys.exit(f'No registered targets in {args.manifest}, run agent_fleet.py first')
+
+    session = login_as_admin(args.base_url)
+    name, release_id = create_release(session, args.base_url, args.packages, args.chain)
+    print(f'Release {name} (id {release_id}): {args.packages} packages x {len(targets)} targets, '
+          f'concurrency {args.concurrency}')
+
+    for operation in ('distribute_all', 'deploy_all'):
+        results, wall = run_phase(session, args.base_url, release_id, targets, operation, args.concurrency)
+        latencies = [elapsed for _, elapsed, _ in results]
+        errors = sum(1 for _, _, status in results if status >= 400)
+        print(f'{operation:<15} wall {wall:8.2f}s  '
+              f'throughput {args.packages * len(targets) / wall:8.1f} pkg-ops/s  '
+              f'p50 {percentile(latencies, 50):6.2f}s  p95 {percentile(latencies, 95):6.2f}s  '
+              f'p99 {percentile(latencies, 99):6.2f}s  max {max(latencies):6.2f}s  http errors {errors}')
+
+    # Outcome per target, from the (agent-free) deployment plan
+    deployed = 0
+    for target in targets:
+        plan = session.get(f'{args.base_url}/api/release/{release_id}/plan', params={'target_id': target['target_id']}).json()
+        deployed += plan['summary']['already_deployed']
+    total = args.packages * len(targets)
+    print(f'Deployed {deployed}/{total} package-target pairs ({total - deployed} failed or skipped)')
+
+    if args.cleanup:
+        session.post(f'{args.base_url}/release/{release_id}/delete')
+
+
+if __name__ == '__main__':
+    main()
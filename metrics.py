@@ -0,0 +1,158 @@
+"""
+Minimal Prometheus instrumentation (text exposition format 0.0.4).
+Kept dependency-free on purpose: counters and histograms live in process memory,
+status gauges are computed with a few GROUP BY queries at scrape time.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event, func
+from sqlalchemy.engine import Engine
+
+# Agent calls and page renders: 5ms .. 30s
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, [f'le="{bound}"'])
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            inf = _format_labels(self.labelnames, labels, ['le="+Inf"'])
+            lines.append(f'{self.name}_bucket{inf} {series[-1]}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-2]}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}')
+        return lines
+
+
+agent_call_duration = Histogram(
+    'orchestrator_agent_call_duration_seconds', 'Latency of orchestrator to agent calls.',
+    ('target', 'endpoint'))
+agent_calls = Counter(
+    'orchestrator_agent_calls_total', 'Agent calls by outcome (success or error class).',
+    ('target', 'endpoint', 'result'))
+request_duration = Histogram(
+    'orchestrator_http_request_duration_seconds', 'Latency of HTTP requests by route.',
+    ('route', 'method', 'status'))
+request_db_queries = Histogram(
+    'orchestrator_http_request_db_queries', 'Number of SQL statements executed per HTTP request.',
+    ('route',), buckets=QUERY_COUNT_BUCKETS)
+
+COLLECTORS = [agent_call_duration, agent_calls, request_duration, request_db_queries]
+
+
+def observe_agent_call(target, endpoint, seconds, result):
+    agent_call_duration.observe(seconds, target, endpoint)
+    agent_calls.inc(target, endpoint, result)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'metrics_queries' in g:
+        g.metrics_queries += 1
+
+
+def _status_gauges():
+    # Imported here to keep this module importable without the models
+    from models import db, Release, Package, PackageDeployment
+
+    lines = []
+    gauges = [
+        ('orchestrator_releases', 'Releases by deployment status.', Release.deployment_status),
+        ('orchestrator_packages', 'Packages by status.', Package.status),
+        ('orchestrator_package_deployments', 'Package deployments by status.', PackageDeployment.status),
+    ]
+    for name, documentation, column in gauges:
+        lines += [f'# HELP {name} {documentation}', f'# TYPE {name} gauge']
+        for status, count in db.session.query(column, func.count()).group_by(column).all():
+            label = status.name if status is not None else 'none'
+            lines.append(f'{name}{{status="{label}"}} {count}')
+    return lines
+
+
+def render_metrics():
+    lines = []
+    for collector in COLLECTORS:
+        lines += collector.render()
+    lines += _status_gauges()
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    """Register request timing hooks and the /metrics endpoint."""
+
+    @app.before_request
+    def _start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        g.metrics_queries = 0
+
+    @app.after_request
+    def _record_request_metrics(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            request_duration.observe(time.perf_counter() - started, route, request.method, response.status_code)
+            request_db_queries.observe(g.pop('metrics_queries', 0), route)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
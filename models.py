@@ -1,5 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, Integer, String, ForeignKey, Enum, Table, Boolean, Date, DateTime
+from sqlalchemy import Column, Integer, SmallInteger, String, ForeignKey, Enum, Table, Boolean, Date, DateTime, Float, LargeBinary, Index, inspect, text
 from sqlalchemy.orm import relationship
 import enum
 from datetime import datetime
@@ -69,9 +69,15 @@ class PackageDeployment(db.Model):
     target_id = Column(Integer, ForeignKey('deployment_target.id'), nullable=False)
     status = Column(Enum(PackageDeploymentStatus), default=PackageDeploymentStatus.not_deployed)
     deployed_at = Column(DateTime, default=datetime.utcnow)
+    # Optimistic locking: every UPDATE checks and bumps it, a concurrent change raises StaleDataError
+    version = Column(Integer, nullable=False, default=1)
     
     target = relationship('DeploymentTarget')
 
+    __mapper_args__ = {'version_id_col': version}
+    # A target's packages with their status from the index alone, and (target, package) lookups (deployment_diff.py)
+    __table_args__ = (Index('ix_deployment_target_package_status', 'target_id', 'package_id', 'status'),)
+
     def __repr__(self):
         return f'<StartDeployment Pkg:{self.package_id} Target:{self.target_id} Status:{self.status}>'
 
@@ -84,6 +90,7 @@ class Package(db.Model):
     
     # New Relationship
     deployments = relationship('PackageDeployment', backref='package', lazy=True, cascade="all, delete-orphan")
+    attempts = relationship('DeploymentAttempt', backref='package', lazy='dynamic', cascade="all, delete-orphan")
 
     release_id = Column(Integer, ForeignKey('release.id'), nullable=False)
 
@@ -128,3 +135,114 @@ class EventLog(db.Model):
 
     def __repr__(self):
         return f'<Event {self.operation} on {self.category} at {self.timestamp}>'
+
+class DeploymentAttempt(db.Model):
+    # Append-only record of every agent command (distribute / deploy) for a package on a target.
+    # PackageDeployment only holds the current state; this keeps timing and outcome of each try.
+    __table_args__ = (
+        Index('ix_attempt_package_target_op', 'package_id', 'target_id', 'operation', 'attempt'),
+        # Covering indexes for "slowest packages" and "slowest targets / p95 per target"
+        Index('ix_attempt_op_package_latency', 'operation', 'package_id', 'latency_seconds'),
+        Index('ix_attempt_target_op_latency', 'target_id', 'operation', 'latency_seconds'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    package_id = Column(Integer, ForeignKey('package.id'), nullable=False)
+    target_id = Column(Integer, ForeignKey('deployment_target.id'), nullable=False)
+    operation = Column(String(20), nullable=False)  # distribute / deploy
+    attempt = Column(Integer, nullable=False, default=1)  # 1-based per (package, target, operation)
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=False)
+    latency_seconds = Column(Float, nullable=False)
+    outcome = Column(String(20), nullable=False)  # success / failure
+    error = Column(String(255))
+
+    target = relationship('DeploymentTarget')
+
+    def __repr__(self):
+        return f'<DeploymentAttempt Pkg:{self.package_id} Target:{self.target_id} {self.operation} #{self.attempt} {self.outcome}>'
+
+class ScheduleRun(db.Model):
+    # Outcome of a ScheduledDeployment window run by the schedule executor (one row per finished window)
+    id = Column(Integer, primary_key=True)
+    schedule_id = Column(Integer, ForeignKey('scheduled_deployment.id'), nullable=False, index=True)
+    started_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+    outcome = Column(String(20), nullable=False)  # success / partial / failure / missed
+    distributed = Column(Integer, nullable=False, default=0)
+    deployed = Column(Integer, nullable=False, default=0)
+    message = Column(String(255))
+
+    schedule = relationship('ScheduledDeployment', backref=db.backref('runs', lazy=True, cascade="all, delete-orphan"))
+
+    def __repr__(self):
+        return f'<ScheduleRun Schedule:{self.schedule_id} {self.outcome}>'
+
+class TargetLease(db.Model):
+    # Exclusive, expiring claim on a target for one bulk operation (see leases.py).
+    # One row per leased target; the holder proves ownership with its token.
+    target_id = Column(Integer, ForeignKey('deployment_target.id'), primary_key=True)
+    token = Column(String(32), nullable=False)
+    owner = Column(String(100), nullable=False)
+    operation = Column(String(50), nullable=False)
+    acquired_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    heartbeat_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+
+    target = relationship('DeploymentTarget')
+
+    def __repr__(self):
+        return f'<TargetLease Target:{self.target_id} {self.operation} by {self.owner} until {self.expires_at}>'
+
+class DeploymentTransition(db.Model):
+    # Append-only history of PackageDeployment status changes (see deployment_history.py).
+    # No foreign keys on purpose: the history outlives deleted packages.
+    __table_args__ = (Index('ix_transition_target_time', 'target_id', 'timestamp'),)
+
+    id = Column(Integer, primary_key=True)
+    target_id = Column(Integer, nullable=False)
+    timestamp = Column(DateTime, nullable=False)
+    package_id = Column(Integer, nullable=False)
+    state = Column(SmallInteger, nullable=False)  # deployment_history.STATE_CODES, 0 = removed
+
+    def __repr__(self):
+        return f'<DeploymentTransition Target:{self.target_id} Pkg:{self.package_id} -> {self.state} at {self.timestamp}>'
+
+class DeploymentCheckpoint(db.Model):
+    # Full state of a target as of `timestamp`, so point-in-time queries only replay the transitions after it.
+    # `baseline` marks the first checkpoint taken from PackageDeployment when the history started.
+    __table_args__ = (
+        Index('ix_checkpoint_target_time', 'target_id', 'timestamp'),
+        # One baseline per target: of two workers starting together, the second one's insert fails
+        Index('ux_checkpoint_baseline', 'target_id', unique=True,
+              sqlite_where=text('baseline'), postgresql_where=text('baseline')),
+    )
+
+    id = Column(Integer, primary_key=True)
+    target_id = Column(Integer, nullable=False)
+    timestamp = Column(DateTime, nullable=False)
+    entries = Column(Integer, nullable=False)
+    payload = Column(LargeBinary, nullable=False)  # zlib(delta-encoded package ids + state bytes)
+    baseline = Column(Boolean, nullable=False, default=False)
+
+    def __repr__(self):
+        return f'<DeploymentCheckpoint Target:{self.target_id} at {self.timestamp} ({self.entries} packages)>'
+
+# Columns added to existing tables after their first release; create_all() only creates missing tables
+ADDED_COLUMNS = [
+    ('package_deployment', 'version', 'INTEGER NOT NULL DEFAULT 1'),
+]
+
+def upgrade_schema():
+    """Add ADDED_COLUMNS and model indexes that an existing database does not have yet (call after create_all)."""
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    with db.engine.begin() as conn:
+        for table, column, ddl in ADDED_COLUMNS:
+            if table in tables and column not in {c['name'] for c in inspector.get_columns(table)}:
+                conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+        for table in db.metadata.sorted_tables:
+            existing = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(conn)
@@ -0,0 +1,95 @@
+"""
+Static file server standing in for Nexus when testing agent downloads.
+
+    python nexus_stub.py --dir ./artifacts --port 8081
+    python agent_server.py --artifact-dir ./agent-store --cache-quota-mb 500
+
+Serves files like `python -m http.server`, but with ETag and Range / If-Range support so
+that resumed downloads can be exercised. --throttle-kbps slows responses down and
+--drop-after-kb cuts every full response off after that many KB, to simulate a broken
+connection.
+"""
+import argparse
+import os
+import re
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+_RANGE_RE = re.compile(r'^bytes=(\d+)-(\d*)$')
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    throttle_kbps = 0
+    drop_after_kb = 0
+
+    def do_GET(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            return super().do_GET()
+
+        stat = os.stat(path)
+        size = stat.st_size
+        etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+        start, end = 0, size - 1
+        match = _RANGE_RE.match(self.headers.get('Range', ''))
+        if_range = self.headers.get('If-Range')
+        partial_content = bool(match) and (if_range is None or if_range == etag)
+        if partial_content:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+        self.send_response(206 if partial_content else 200)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('ETag', etag)
+        self.send_header('Accept-Ranges', 'bytes')
+        if partial_content:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.end_headers()
+
+        remaining = end - start + 1
+        limit = self.drop_after_kb * 1024 if self.drop_after_kb and not partial_content else None
+        with open(path, 'rb') as f:
+            f.seek(start)
+            while remaining > 0:
+                chunk = f.read(min(64 * 1024, remaining))
+                if not chunk:
+                    break
+                if limit is not None and len(chunk) >= limit:
+                    self.wfile.write(chunk[:limit])
+                    self.close_connection = True
+                    return
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+                if limit is not None:
+                    limit -= len(chunk)
+                if self.throttle_kbps:
+                    time.sleep(len(chunk) / (self.throttle_kbps * 1024.0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Range-capable static file server (Nexus stand-in)')
+    parser.add_argument('--dir', default='.', help='Directory to serve')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--throttle-kbps', type=float, default=0, help='Limit transfer speed per response')
+    parser.add_argument('--drop-after-kb', type=int, default=0,
+                        help='Abort full (non-range) responses after this many KB')
+    args = parser.parse_args()
+
+    RangeRequestHandler.throttle_kbps = args.throttle_kbps
+    RangeRequestHandler.drop_after_kb = args.drop_after_kb
+    server = ThreadingHTTPServer((args.host, args.port), partial(RangeRequestHandler, directory=args.dir))
+    print(f'Serving {os.path.abspath(args.dir)} on http://{args.host}:{args.port}/ ...')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Opt-in per-request SQL profiler.
+Counts statements and DB time per request, flags statements repeated often enough
+to look like an N+1 pattern and logs slow requests as one JSON line each.
+
+Config (app.config):
+    SQL_PROFILER                 enable the hooks at all
+    SQL_PROFILER_SLOW_SECONDS    request duration that counts as slow (default 0.5)
+    SQL_PROFILER_N_PLUS_ONE      repetitions of one statement that flag an N+1 suspect (default 5)
+    SQL_PROFILER_LOG             optional file for the slow-request log (default: app logging)
+    SQL_PROFILER_HEADERS         add X-SQL-* and Server-Timing headers to every response (staging only)
+"""
+import json
+import logging
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('release_orchestrator.profiler')
+
+TOP_STATEMENTS = 5
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_profile' in g:
+        conn.info.setdefault('profiler_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not (has_request_context() and 'sql_profile' in g):
+        return
+    stack = conn.info.get('profiler_started')
+    if not stack:
+        return
+    elapsed = time.perf_counter() - stack.pop()
+    # Keyed by statement text: the same SELECT with different parameters is what an N+1 looks like
+    entry = g.sql_profile.get(statement)
+    if entry is None:
+        g.sql_profile[statement] = [1, elapsed]
+    else:
+        entry[0] += 1
+        entry[1] += elapsed
+
+
+def summarize(profile, n_plus_one_threshold):
+    """Aggregate a {statement: [count, seconds]} profile into a report dict."""
+    query_count = sum(count for count, _ in profile.values())
+    db_seconds = sum(seconds for _, seconds in profile.values())
+    ranked = sorted(profile.items(), key=lambda item: item[1][1], reverse=True)
+    suspects = sorted(
+        ((stmt, count, seconds) for stmt, (count, seconds) in profile.items() if count >= n_plus_one_threshold),
+        key=lambda item: item[1], reverse=True
+    )
+    return {
+        'queries': query_count,
+        'distinct_statements': len(profile),
+        'db_ms': round(db_seconds * 1000, 2),
+        'top_statements': [
+            {'statement': stmt, 'count': count, 'ms': round(seconds * 1000, 2)}
+            for stmt, (count, seconds) in ranked[:TOP_STATEMENTS]
+        ],
+        'n_plus_one_suspects': [
+            {'statement': stmt, 'count': count, 'ms': round(seconds * 1000, 2)}
+            for stmt, count, seconds in suspects
+        ],
+    }
+
+
+def init_app(app):
+    """Install the profiling hooks if SQL_PROFILER is enabled."""
+    if not app.config.get('SQL_PROFILER'):
+        return
+
+    slow_seconds = app.config.get('SQL_PROFILER_SLOW_SECONDS', 0.5)
+    n_plus_one = app.config.get('SQL_PROFILER_N_PLUS_ONE', 5)
+    with_headers = app.config.get('SQL_PROFILER_HEADERS', False)
+
+    if app.config.get('SQL_PROFILER_LOG'):
+        handler = logging.FileHandler(app.config['SQL_PROFILER_LOG'])
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def _start_sql_profile():
+        g.sql_profile = {}
+        g.sql_profile_started = time.perf_counter()
+
+    @app.after_request
+    def _finish_sql_profile(response):
+        profile = g.pop('sql_profile', None)
+        if profile is None:
+            return response
+        elapsed = time.perf_counter() - g.pop('sql_profile_started')
+        report = summarize(profile, n_plus_one)
+
+        if elapsed >= slow_seconds or report['n_plus_one_suspects']:
+            record = {
+                'event': 'slow_request' if elapsed >= slow_seconds else 'n_plus_one',
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'duration_ms': round(elapsed * 1000, 2),
+            }
+            record.update(report)
+            logger.info(json.dumps(record))
+
+        if with_headers:
+            response.headers['X-SQL-Queries'] = str(report['queries'])
+            response.headers['X-SQL-Time-ms'] = str(report['db_ms'])
+            response.headers['X-SQL-N-Plus-One'] = str(len(report['n_plus_one_suspects']))
+            response.headers['Server-Timing'] = (
+                f'db;dur={report["db_ms"]};desc="{report["queries"]} queries", '
+                f'total;dur={round(elapsed * 1000, 2)}'
+            )
+        return response
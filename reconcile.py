@@ -0,0 +1,308 @@
+"""
+Drift reconciliation: compare what the agents report with what the database believes.
+
+The history of every target is fetched concurrently (a thread pool, one paged stream per
+agent via GET /history?offset=&limit=) within one time budget; targets whose history is not
+complete when the budget runs out are reported as incomplete and left out of the diff.
+The agent's latest successful distribute/deploy per package is then compared with
+PackageDeployment using set operations:
+
+    db_behind    the agent did something after the DB's last change (deployed_at) that the
+                 DB does not show, e.g. the reply was lost in a timeout; correctable
+    unconfirmed  distributed/deployed in the DB without a successful record on the agent
+                 (agent histories are in-memory, so also after an agent restart); report only
+    unknown      agent records of release/package names the DB does not know; report only
+
+    python reconcile.py --budget 60 --workers 32            # report
+    python reconcile.py --fix --json drift.json             # report and correct db_behind
+
+Corrections take the target's lease (busy targets are skipped) and re-check each row, so
+a change made after the report is never overwritten with older agent state.
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+
+import requests
+from sqlalchemy import select
+
+from leases import acquire, LeaseBusy
+from models import db, DeploymentTarget, EventLog, Package, PackageDeployment, PackageDeploymentStatus, Release
+
+PAGE_SIZE = 1000
+WORKERS = 32
+REQUEST_TIMEOUT = 10
+
+AGENT_STATES = {'distribute': PackageDeploymentStatus.distributed, 'deploy': PackageDeploymentStatus.deployed}
+ACTIVE = {PackageDeploymentStatus.distributed, PackageDeploymentStatus.deployed}
+
+
+class BudgetExhausted(Exception):
+    pass
+
+
+def fetch_history(base_url, deadline, page_size=PAGE_SIZE, timeout=REQUEST_TIMEOUT):
+    """All history records of one agent, page by page; no request outlives the deadline."""
+    records = []
+    offset = 0
+    with requests.Session() as http:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise BudgetExhausted(f'time budget exhausted after {len(records)} records')
+            response = http.get(f'{base_url}/history', params={'offset': offset, 'limit': page_size},
+                                timeout=min(timeout, remaining))
+            response.raise_for_status()
+            page = response.json()
+            if isinstance(page, list):
+                # Agent without paging: the whole history at once
+                return page
+            records.extend(page['items'])
+            if page.get('next_offset') is None:
+                return records
+            offset = page['next_offset']
+
+
+def fetch_all(targets, budget, workers=WORKERS, page_size=PAGE_SIZE, timeout=REQUEST_TIMEOUT):
+    """
+    targets: [(target_id, base_url)]. Returns ({target_id: records}, {target_id: error}).
+    Returns after at most `budget` seconds; unfinished targets count as failed.
+    """
+    deadline = time.monotonic() + budget
+    histories, errors = {}, {}
+    pool = ThreadPoolExecutor(max_workers=max(1, min(workers, len(targets))), thread_name_prefix='reconcile')
+    try:
+        futures = {pool.submit(fetch_history, url, deadline, page_size, timeout): target_id
+                   for target_id, url in targets}
+        done, pending = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+        for future in done:
+            target_id = futures[future]
+            try:
+                histories[target_id] = future.result()
+            except (requests.exceptions.RequestException, ValueError, KeyError, BudgetExhausted) as e:
+                errors[target_id] = str(e)
+        for future in pending:
+            errors[futures[future]] = 'time budget exhausted'
+    finally:
+        # Stragglers stop at their next page: every request is bounded by the deadline
+        pool.shutdown(wait=False, cancel_futures=True)
+    return histories, errors
+
+
+def agent_state(records):
+    """{(release, package): (PackageDeploymentStatus, timestamp)} of the latest successful record per package."""
+    state = {}
+    for record in records:
+        status = AGENT_STATES.get(record.get('type'))
+        if status is None or record.get('status') != 'success':
+            continue
+        try:
+            timestamp = datetime.fromisoformat(record['timestamp'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        key = (record.get('release'), record.get('package'))
+        if key not in state or timestamp >= state[key][1]:
+            state[key] = (status, timestamp)
+    return state
+
+
+def _package_ids(release_names):
+    ids = {}
+    names = sorted(n for n in release_names if n)
+    for start in range(0, len(names), 500):
+        rows = db.session.execute(
+            select(Release.name, Package.name, Package.id).join(Package, Package.release_id == Release.id)
+            .where(Release.name.in_(names[start:start + 500])))
+        ids.update({(release, package): package_id for release, package, package_id in rows})
+    return ids
+
+
+def diff(histories):
+    """Drift entries between the agent histories ({target_id: records}) and PackageDeployment."""
+    agents = {target_id: agent_state(records) for target_id, records in histories.items()}
+    package_ids = _package_ids({release for state in agents.values() for release, _ in state})
+
+    agent, unknown = {}, []
+    for target_id, state in agents.items():
+        for (release, package), value in state.items():
+            package_id = package_ids.get((release, package))
+            if package_id is None:
+                unknown.append({'target_id': target_id, 'release': release, 'package': package,
+                                'agent_status': value[0].value, 'agent_at': value[1]})
+            else:
+                agent[(target_id, package_id)] = value
+
+    database = {}
+    target_ids = list(histories)
+    for start in range(0, len(target_ids), 500):
+        rows = db.session.execute(
+            select(PackageDeployment.target_id, PackageDeployment.package_id, PackageDeployment.status,
+                   PackageDeployment.deployed_at)
+            .where(PackageDeployment.target_id.in_(target_ids[start:start + 500]))
+            .execution_options(yield_per=5000))
+        database.update({(t, p): (status, deployed_at) for t, p, status, deployed_at in rows})
+
+    # Agent knows something newer than the DB's last change, and it disagrees
+    newer = {key for key, (_, at) in agent.items()
+             if key not in database or database[key][1] is None or at > database[key][1]}
+    behind = {key for key in newer if database.get(key, (None,))[0] != agent[key][0]}
+    active = {key for key, (status, _) in database.items() if status in ACTIVE}
+    unconfirmed = active - agent.keys()
+
+    drift = []
+    for kind, keys in (('db_behind', behind), ('unconfirmed', unconfirmed)):
+        for target_id, package_id in keys:
+            db_status, db_at = database.get((target_id, package_id), (None, None))
+            agent_status, agent_at = agent.get((target_id, package_id), (None, None))
+            drift.append({'kind': kind, 'target_id': target_id, 'package_id': package_id,
+                          'db_status': db_status.value if db_status else None, 'db_at': db_at,
+                          'agent_status': agent_status.value if agent_status else None, 'agent_at': agent_at})
+    drift.extend(dict(entry, kind='unknown', package_id=None, db_status=None, db_at=None) for entry in unknown)
+    return drift
+
+
+def _describe(drift):
+    """Add target, release and package names to the drift entries (one query each)."""
+    targets = dict(db.session.query(DeploymentTarget.id, DeploymentTarget.name))
+    package_ids = [d['package_id'] for d in drift if d['package_id']]
+    names = {}
+    for start in range(0, len(package_ids), 500):
+        rows = db.session.execute(
+            select(Package.id, Package.name, Release.name).join(Release, Release.id == Package.release_id)
+            .where(Package.id.in_(package_ids[start:start + 500])))
+        names.update({package_id: (package, release) for package_id, package, release in rows})
+    for entry in drift:
+        entry['target'] = targets.get(entry['target_id'])
+        if entry['package_id']:
+            entry['package'], entry['release'] = names.get(entry['package_id'], (None, None))
+    drift.sort(key=lambda d: (d['kind'], d['target'] or '', d['release'] or '', d['package'] or ''))
+    return drift
+
+
+def reconcile(url_of, budget=60, workers=WORKERS, page_size=PAGE_SIZE, target_ids=None):
+    """
+    Fetch and diff; url_of(target) gives the agent base URL (app.agent_base_url). Returns the report:
+    {'started_at', 'elapsed', 'budget', 'targets', 'complete', 'records', 'incomplete', 'drift', 'counts'}.
+    """
+    started_at, started = datetime.utcnow(), time.monotonic()
+    query = DeploymentTarget.query.order_by(DeploymentTarget.id)
+    if target_ids:
+        query = query.filter(DeploymentTarget.id.in_(target_ids))
+    targets = query.all()
+    names = {t.id: t.name for t in targets}
+
+    histories, errors = fetch_all([(t.id, url_of(t)) for t in targets], budget, workers, page_size)
+    drift = _describe(diff(histories))
+    counts = {}
+    for entry in drift:
+        counts[entry['kind']] = counts.get(entry['kind'], 0) + 1
+    return {
+        'started_at': started_at,
+        'elapsed': round(time.monotonic() - started, 3),
+        'budget': budget,
+        'targets': len(targets),
+        'complete': len(histories),
+        'records': sum(len(records) for records in histories.values()),
+        'incomplete': sorted(({'target_id': t, 'target': names.get(t), 'error': e} for t, e in errors.items()),
+                             key=lambda i: i['target'] or ''),
+        'drift': drift,
+        'counts': counts,
+    }
+
+
+def apply_corrections(drift, owner, user='system', ttl=60):
+    """
+    Set the db_behind entries to the agent's state, one target at a time under its lease.
+    Returns {'corrected', 'skipped' (rows changed since the report), 'busy' (target names), 'release_ids'}.
+    """
+    by_target = {}
+    for entry in drift:
+        if entry['kind'] == 'db_behind':
+            by_target.setdefault(entry['target_id'], []).append(entry)
+    result = {'corrected': 0, 'skipped': 0, 'busy': [], 'release_ids': set()}
+    for target_id, entries in sorted(by_target.items()):
+        try:
+            lease = acquire(target_id, owner, 'reconcile', ttl=ttl)
+        except LeaseBusy:
+            result['busy'].append(entries[0]['target'] or str(target_id))
+            continue
+        try:
+            rows = {d.package_id: d for d in PackageDeployment.query.filter(
+                PackageDeployment.target_id == target_id,
+                PackageDeployment.package_id.in_([e['package_id'] for e in entries]))}
+            corrected = 0
+            for entry in entries:
+                row = rows.get(entry['package_id'])
+                if row is not None and row.deployed_at is not None and row.deployed_at >= entry['agent_at']:
+                    result['skipped'] += 1  # changed after the report
+                    continue
+                if row is None:
+                    row = PackageDeployment(package_id=entry['package_id'], target_id=target_id)
+                    db.session.add(row)
+                # The flush hook records the transition (deployment_history.py)
+                row.status = PackageDeploymentStatus(entry['agent_status'])
+                row.deployed_at = entry['agent_at']
+                corrected += 1
+                result['release_ids'].add(db.session.get(Package, entry['package_id']).release_id)
+            if corrected:
+                db.session.add(EventLog(category='target', operation='reconcile', user=user,
+                                        description=f'Reconciled {corrected} deployments on '
+                                                    f'{entries[0]["target"]} with the agent history'))
+            db.session.commit()
+            result['corrected'] += corrected
+        except Exception:
+            # Releasing commits: the partial corrections must not go with it
+            db.session.rollback()
+            raise
+        finally:
+            lease.release()
+    return result
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, set):
+        return sorted(value)
+    raise TypeError(type(value).__name__)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare agent histories with the database and report drift')
+    parser.add_argument('--budget', type=float, default=None,
+                        help='Seconds for fetching all histories (default: RECONCILE_BUDGET_SECONDS)')
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE)
+    parser.add_argument('--target', action='append', type=int, dest='target_ids', help='Only this target id (repeatable)')
+    parser.add_argument('--fix', action='store_true', help='Correct db_behind drift')
+    parser.add_argument('--json', help='Write the full report to this file')
+    args = parser.parse_args(argv)
+
+    from app import create_app, agent_base_url, update_release_status
+    from leases import lease_owner
+    app = create_app()
+    with app.app_context():
+        budget = args.budget if args.budget is not None else app.config['RECONCILE_BUDGET_SECONDS']
+        report = reconcile(lambda target: agent_base_url(target.url), budget, args.workers, args.page_size,
+                           args.target_ids)
+        print(f"{report['complete']}/{report['targets']} targets, {report['records']} records "
+              f"in {report['elapsed']}s: {report['counts'] or 'no drift'}")
+        for item in report['incomplete']:
+            print(f"  incomplete: {item['target']}: {item['error']}")
+        if args.fix:
+            report['fix'] = apply_corrections(report['drift'], lease_owner(None), ttl=app.config['LEASE_TTL_SECONDS'])
+            for release in Release.query.filter(Release.id.in_(report['fix']['release_ids'])):
+                update_release_status(release)
+            print(f"Corrected {report['fix']['corrected']}, skipped {report['fix']['skipped']}, "
+                  f"busy targets: {', '.join(report['fix']['busy']) or 'none'}")
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(report, f, indent=1, default=_json_default)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import heapq
+import logging
+import threading
+from datetime import datetime, time as dt_time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import invalidation
+import tracing
+from models import db, ScheduledDeployment
+
+logger = logging.getLogger('release_orchestrator.scheduler')
+
+POLL_SECONDS = 60
+
+
+def window_bounds(schedule):
+    """A window runs from start_date 00:00 until the end of end_date (UTC, like all timestamps here)."""
+    opens_at = datetime.combine(schedule.start_date, dt_time.min)
+    closes_at = datetime.combine(schedule.end_date, dt_time.max)
+    return opens_at, closes_at
+
+
+class ScheduleExecutor:
+    """
+    Background thread that runs ScheduledDeployment windows when they open.
+    Pending windows are kept in a heap ordered by opening time, so the thread sleeps
+    until the earliest one opens instead of polling the table. New schedules are pushed
+    on commit; deleted ones are dropped when they come up. Schedules added by other
+    workers reload the queue (channel 'schedules', checked at least every POLL_SECONDS).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._heap = []            # (due_at, schedule_id, retry)
+        self._thread = None
+        self.app = None
+        self.run_window = None
+
+    def init_app(self, app, run_window):
+        """
+        run_window(schedule_id, retry) is called inside an app context when a window is due
+        (retry is True when it was postponed before). It returns None when the window is done,
+        or a datetime to try again (e.g. target locked).
+        """
+        self.app = app
+        self.run_window = run_window
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='schedule-executor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
+
+    def push(self, due_at, schedule_id, retry=False):
+        with self._lock:
+            heapq.heappush(self._heap, (due_at, schedule_id, retry))
+        self._wake.set()
+
+    def pending(self):
+        with self._lock:
+            return sorted(self._heap)
+
+    def load(self):
+        """(Re)build the heap from windows that have not ended and were not run yet."""
+        today = datetime.utcnow().date()
+        rows = (ScheduledDeployment.query
+                .filter(ScheduledDeployment.end_date >= today, ~ScheduledDeployment.runs.any())
+                .all())
+        heap = [(window_bounds(s)[0], s.id, False) for s in rows]
+        heapq.heapify(heap)
+        with self._lock:
+            self._heap = heap
+        self._wake.set()
+
+    def reload(self):
+        """Schedules changed in another process: rebuild the queue if this process runs it."""
+        if self.running:
+            self.load()
+
+    def _loop(self):
+        with self.app.app_context():
+            self.load()
+        while not self._stop.is_set():
+            self._wake.clear()
+            with self.app.app_context():
+                invalidation.bus.poll(force=True)
+            with self._lock:
+                next_at = self._heap[0][0] if self._heap else None
+            now = datetime.utcnow()
+            if next_at is None or next_at > now:
+                # Cap the sleep so clock adjustments and other workers' schedules are picked up
+                timeout = POLL_SECONDS if next_at is None else min(POLL_SECONDS, (next_at - now).total_seconds())
+                self._wake.wait(timeout)
+                continue
+            with self._lock:
+                _, schedule_id, retry = heapq.heappop(self._heap)
+            self.run_due(schedule_id, retry)
+
+    def run_due(self, schedule_id, retry=False):
+        # Each run is a job of its own: one correlation ID for all its agent calls
+        with self.app.app_context(), tracing.job('scheduled_deployment', schedule_id=schedule_id, retry=retry):
+            try:
+                retry_at = self.run_window(schedule_id, retry)
+            except Exception:
+                logger.exception('Scheduled deployment %s failed', schedule_id)
+                db.session.rollback()
+                return
+            finally:
+                db.session.remove()
+        if retry_at is not None:
+            self.push(retry_at, schedule_id, retry=True)
+
+
+schedule_executor = ScheduleExecutor()
+invalidation.bus.subscribe('schedules', schedule_executor.reload)
+
+
+# New schedules are queued once their transaction commits
+@event.listens_for(Session, 'after_flush')
+def _collect_new_schedules(session, flush_context):
+    for obj in session.new:
+        if isinstance(obj, ScheduledDeployment):
+            session.info.setdefault('new_schedules', []).append((window_bounds(obj)[0], obj.id))
+
+
+@event.listens_for(Session, 'after_commit')
+def _queue_new_schedules(session):
+    for opens_at, schedule_id in session.info.pop('new_schedules', []):
+        schedule_executor.push(opens_at, schedule_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_new_schedules(session):
+    session.info.pop('new_schedules', None)
@@ -0,0 +1,197 @@
+import random
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import invalidation
+from models import db, ScheduledDeployment
+
+
+class _Node:
+    __slots__ = ('key', 'start', 'end', 'schedule_id', 'priority', 'left', 'right', 'max_end')
+
+    def __init__(self, start, end, schedule_id):
+        self.key = (start, schedule_id)
+        self.start = start
+        self.end = end
+        self.schedule_id = schedule_id
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+        self.max_end = end
+
+
+def _update(node):
+    node.max_end = node.end
+    if node.left is not None and node.left.max_end > node.max_end:
+        node.max_end = node.left.max_end
+    if node.right is not None and node.right.max_end > node.max_end:
+        node.max_end = node.right.max_end
+
+
+def _split(node, key):
+    """Split into (keys < key, keys >= key)."""
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        _update(node)
+        return node, right
+    left, node.left = _split(node.left, key)
+    _update(node)
+    return left, node
+
+
+def _merge(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    right.left = _merge(left, right.left)
+    _update(right)
+    return right
+
+
+def _overlapping(node, start, end, out):
+    # Subtrees whose intervals all end before `start` are skipped via max_end,
+    # right subtrees once the starts pass `end`: O(log n + k)
+    if node is None or node.max_end < start:
+        return
+    _overlapping(node.left, start, end, out)
+    if node.start <= end:
+        if node.end >= start:
+            out.append((node.start, node.end, node.schedule_id))
+        _overlapping(node.right, start, end, out)
+
+
+class ScheduleIndex:
+    """
+    Process-local interval index of ScheduledDeployment windows, one treap per target
+    ordered by start date and augmented with the latest end date of each subtree.
+    Loaded lazily, then kept in sync with committed inserts and deletes; changes
+    committed by other workers drop it (channel 'schedules', see invalidation.py).
+    Dates are inclusive, like the schedule windows themselves.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._roots = None   # target_id -> treap root
+
+    def invalidate(self):
+        with self._lock:
+            self._roots = None
+
+    def _ensure_loaded(self):
+        # Caller holds the lock
+        if self._roots is None:
+            roots = {}
+            rows = db.session.query(ScheduledDeployment.id, ScheduledDeployment.target_id,
+                                    ScheduledDeployment.start_date, ScheduledDeployment.end_date)
+            for schedule_id, target_id, start, end in rows:
+                roots[target_id] = self._insert(roots.get(target_id), start, end, schedule_id)
+            self._roots = roots
+        return self._roots
+
+    @staticmethod
+    def _insert(root, start, end, schedule_id):
+        left, right = _split(root, (start, schedule_id))
+        return _merge(_merge(left, _Node(start, end, schedule_id)), right)
+
+    @staticmethod
+    def _remove(root, start, schedule_id):
+        left, rest = _split(root, (start, schedule_id))
+        _, right = _split(rest, (start, schedule_id + 1))
+        return _merge(left, right)
+
+    def add(self, target_id, start, end, schedule_id):
+        with self._lock:
+            if self._roots is not None:
+                # Idempotent: a lazy load inside the inserting transaction may already hold the window
+                root = self._remove(self._roots.get(target_id), start, schedule_id)
+                self._roots[target_id] = self._insert(root, start, end, schedule_id)
+
+    def remove(self, target_id, start, schedule_id):
+        with self._lock:
+            if self._roots is not None and target_id in self._roots:
+                self._roots[target_id] = self._remove(self._roots[target_id], start, schedule_id)
+
+    def overlapping(self, target_id, start, end, exclude_id=None):
+        """[(start, end, schedule_id)] of windows on the target that overlap [start, end], by start date."""
+        with self._lock:
+            out = []
+            _overlapping(self._ensure_loaded().get(target_id), start, end, out)
+        return [item for item in out if item[2] != exclude_id]
+
+    def conflicts(self, start, end, target_id=None):
+        """
+        Pairs of windows on the same target that overlap each other within [start, end].
+        Returns [(target_id, overlap_start, overlap_end, schedule_id_a, schedule_id_b)].
+        """
+        with self._lock:
+            roots = self._ensure_loaded()
+            targets = [target_id] if target_id is not None else list(roots)
+            candidates = {}
+            for tid in targets:
+                out = []
+                _overlapping(roots.get(tid), start, end, out)
+                candidates[tid] = out
+
+        pairs = []
+        for tid, windows in candidates.items():
+            # Sweep by start date; `active` holds the windows that have not ended yet
+            active = []
+            for w_start, w_end, w_id in windows:
+                active = [a for a in active if a[1] >= w_start]
+                for a_start, a_end, a_id in active:
+                    overlap_start = max(w_start, start)
+                    overlap_end = min(a_end, w_end, end)
+                    if overlap_start <= overlap_end:
+                        pairs.append((tid, overlap_start, overlap_end, a_id, w_id))
+                active.append((w_start, w_end, w_id))
+        return pairs
+
+
+schedule_index = ScheduleIndex()
+invalidation.bus.subscribe('schedules', schedule_index.invalidate)
+
+
+# Sync: collect inserted/deleted windows at flush, apply them once committed
+@event.listens_for(Session, 'after_flush')
+def _collect_schedule_changes(session, flush_context):
+    changes = session.info.setdefault('schedule_index_changes', [])
+    for obj in session.new:
+        if isinstance(obj, ScheduledDeployment):
+            changes.append(('add', int(obj.target_id), obj.start_date, obj.end_date, obj.id))
+    for obj in session.deleted:
+        if isinstance(obj, ScheduledDeployment):
+            changes.append(('remove', int(obj.target_id), obj.start_date, obj.end_date, obj.id))
+    for obj in session.dirty:
+        if isinstance(obj, ScheduledDeployment) and session.is_modified(obj):
+            # Dates or target edited in place: simplest is to rebuild on next use
+            changes.append(('reload', None, None, None, None))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_schedule_changes(session):
+    changes = session.info.pop('schedule_index_changes', [])
+    for op, target_id, start, end, schedule_id in changes:
+        if op == 'add':
+            schedule_index.add(target_id, start, end, schedule_id)
+        elif op == 'remove':
+            schedule_index.remove(target_id, start, schedule_id)
+        else:
+            schedule_index.invalidate()
+    if changes:
+        invalidation.bus.publish('schedules')
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_schedule_changes(session):
+    if session.info.pop('schedule_index_changes', None):
+        # A load during the transaction may have seen the rolled back rows
+        schedule_index.invalidate()
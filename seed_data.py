@@ -0,0 +1,143 @@
+"""
+Synthetic data generator for performance work.
+
+Builds a realistic dataset with bulk Core inserts: releases with packages and a
+configurable dependency fan-out (always a DAG), targets, deployments, schedules and
+years of EventLog history. Deterministic for a given --seed.
+
+    python seed_data.py --db sqlite:///bench.db --releases 2000 --packages 10 --fanout 3
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+CHUNK = 5000
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Seed a Release Orchestrator database with synthetic data')
+    parser.add_argument('--db', default='sqlite:///bench.db', help='SQLAlchemy URL of the database to fill')
+    parser.add_argument('--releases', type=int, default=2000)
+    parser.add_argument('--packages', type=int, default=10, help='Packages per release')
+    parser.add_argument('--fanout', type=int, default=3, help='Max dependencies per package (on earlier packages)')
+    parser.add_argument('--cross-release', type=float, default=0.05,
+                        help='Share of dependencies pointing to the previous release')
+    parser.add_argument('--targets', type=int, default=20)
+    parser.add_argument('--years', type=float, default=3, help='Span of EventLog and schedule history')
+    parser.add_argument('--events-per-day', type=int, default=100)
+    parser.add_argument('--schedules', type=int, default=2, help='Scheduled deployments per release')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help='Drop all tables first')
+    return parser.parse_args(argv)
+
+
+def insert_chunked(db, table, rows):
+    for i in range(0, len(rows), CHUNK):
+        db.session.execute(table.insert(), rows[i:i + CHUNK])
+
+
+def seed(args):
+    from app import create_app
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.db})
+    from models import (db, User, Role, Release, Package, DeploymentTarget, PackageDeployment, ScheduledDeployment,
+                        EventLog, package_dependencies, PackageStatus, PackageDeploymentStatus,
+                        ReleaseDeploymentStatus, TargetStatus)
+
+    rnd = random.Random(args.seed)
+    now = datetime.utcnow()
+    history_start = now - timedelta(days=int(args.years * 365))
+    history_seconds = int((now - history_start).total_seconds())
+    started = time.perf_counter()
+
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+        db.create_all()
+        if Release.query.first():
+            sys.exit('Database already contains releases, use --reset to rebuild it')
+
+        if not User.query.first():
+            db.session.add_all([
+                User(username='admin_user', role=Role.admin),
+                User(username='rel_mgr', role=Role.release_manager),
+                User(username='deployer_user', role=Role.deployer),
+                User(username='view_only', role=Role.viewer),
+            ])
+
+        targets = [{'id': i + 1, 'name': f'TARGET-{i + 1:03d}', 'url': f'http://127.0.0.1:{6000 + i}',
+                    'status': TargetStatus.locked.name if rnd.random() < 0.1 else TargetStatus.available.name}
+                   for i in range(args.targets)]
+        insert_chunked(db, DeploymentTarget.__table__, targets)
+
+        releases, packages, edges, deployments, schedules = [], [], [], [], []
+        package_id = 0
+        previous_ids = []
+        for r in range(1, args.releases + 1):
+            releases.append({'id': r, 'name': f'REL-{r:05d}', 'description': f'Synthetic release {r}',
+                             'manager': f'manager{r % 17}', 'deputy': f'deputy{r % 13}',
+                             'deployment_status': rnd.choice(list(ReleaseDeploymentStatus)).name})
+            ids = []
+            for p in range(args.packages):
+                package_id += 1
+                packages.append({'id': package_id, 'name': f'pkg-{p:04d}', 'release_id': r,
+                                 'url': f'http://nexus.local/repository/pkg-{p:04d}/{r}.tar.gz',
+                                 'status': rnd.choice(list(PackageStatus)).name, 'status_message': 'synthetic'})
+                # Dependencies only on earlier packages keep the graph acyclic
+                providers = set()
+                for _ in range(rnd.randint(0, args.fanout)):
+                    if previous_ids and rnd.random() < args.cross_release:
+                        providers.add(rnd.choice(previous_ids))
+                    elif ids:
+                        providers.add(rnd.choice(ids))
+                edges.extend({'requirer_id': package_id, 'provider_id': pid} for pid in providers)
+
+                for t in rnd.sample(range(1, args.targets + 1), k=min(args.targets, rnd.randint(0, 3))):
+                    deployments.append({'package_id': package_id, 'target_id': t,
+                                        'status': rnd.choice(list(PackageDeploymentStatus)).name,
+                                        'deployed_at': history_start + timedelta(seconds=rnd.randrange(history_seconds))})
+                ids.append(package_id)
+            previous_ids = ids
+
+            for _ in range(args.schedules):
+                start = history_start + timedelta(days=rnd.randrange(max(1, int(args.years * 365))))
+                schedules.append({'release_id': r, 'target_id': rnd.randint(1, args.targets),
+                                  'start_date': start.date(), 'end_date': (start + timedelta(days=rnd.randint(0, 3))).date()})
+
+        insert_chunked(db, Release.__table__, releases)
+        insert_chunked(db, Package.__table__, packages)
+        insert_chunked(db, package_dependencies, edges)
+        insert_chunked(db, PackageDeployment.__table__, deployments)
+        insert_chunked(db, ScheduledDeployment.__table__, schedules)
+
+        operations = [('package', 'distribute'), ('package', 'deploy'), ('package', 'fallback'),
+                      ('release', 'create'), ('release', 'update'), ('release', 'schedule'), ('target', 'status_change')]
+        users = ['admin_user', 'rel_mgr', 'deployer_user']
+        total_events = int(args.years * 365 * args.events_per_day)
+        events = []
+        for i in range(total_events):
+            category, operation = rnd.choice(operations)
+            events.append({'timestamp': history_start + timedelta(seconds=rnd.randrange(history_seconds)),
+                           'category': category, 'operation': operation, 'user': rnd.choice(users),
+                           'description': f'Synthetic {operation} #{i}'})
+            if len(events) >= CHUNK:
+                insert_chunked(db, EventLog.__table__, events)
+                events = []
+        insert_chunked(db, EventLog.__table__, events)
+
+        db.session.commit()
+        if db.engine.dialect.name == 'sqlite':
+            # WAL mode: move the log into the database file so the file alone holds the data
+            db.session.remove()
+            with db.engine.connect() as conn:
+                conn.exec_driver_sql('PRAGMA wal_checkpoint(TRUNCATE)')
+        db.engine.dispose()
+
+    print(f'Seeded {len(releases)} releases, {len(packages)} packages, {len(edges)} dependencies, '
+          f'{len(targets)} targets, {len(deployments)} deployments, {len(schedules)} schedules, '
+          f'{total_events} events in {time.perf_counter() - started:.1f}s')
+
+
+if __name__ == '__main__':
+    seed(parse_args())
@@ -0,0 +1,271 @@
+"""
+Correlation IDs and lightweight timing spans, shared by the orchestrator and the agents.
+
+Every request gets a correlation ID (reused from an incoming X-Correlation-ID header)
+that doubles as the trace id; work outside a request (a scheduled deployment run by the
+executor thread) gets one per job. call_agent forwards it together with a W3C `traceparent`
+header, so agent spans attach to the orchestrator span that issued the command.
+When an export file is configured, finished traces are appended to it as OTLP/JSON
+(one ExportTraceServiceRequest per line, like the OpenTelemetry collector file exporter).
+"""
+from contextlib import contextmanager, nullcontext
+import json
+import re
+import secrets
+import threading
+import time
+import uuid
+
+from flask import current_app, g, has_app_context, has_request_context, request
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_TRACE_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+_TRACEPARENT_RE = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+
+def new_trace_id():
+    return uuid.uuid4().hex
+
+
+def new_span_id():
+    return secrets.token_hex(8)
+
+
+def parse_traceparent(header):
+    """Return (trace_id, parent_span_id) from a W3C traceparent header, or (None, None)."""
+    match = _TRACEPARENT_RE.match((header or '').strip().lower())
+    return (match.group(1), match.group(2)) if match else (None, None)
+
+
+def correlation_from_headers(headers):
+    """Trace id and remote parent span id for an incoming request; a new trace if none is given."""
+    trace_id, parent_span_id = parse_traceparent(headers.get('traceparent'))
+    if trace_id is None:
+        correlation_id = (headers.get('X-Correlation-ID') or '').strip().lower()
+        trace_id = correlation_id if _TRACE_ID_RE.match(correlation_id) else new_trace_id()
+    return trace_id, parent_span_id
+
+
+class Trace:
+    """Spans of one request; the trace id is the correlation ID."""
+
+    def __init__(self, trace_id, parent_span_id=None, recording=True):
+        self.trace_id = trace_id
+        self.remote_parent = parent_span_id
+        self.recording = recording
+        self.spans = []
+        self.stack = []
+
+    @property
+    def current(self):
+        return self.stack[-1] if self.stack else None
+
+    def start_span(self, name, kind=SPAN_KIND_INTERNAL, **attributes):
+        span = {
+            'name': name,
+            'kind': kind,
+            'span_id': new_span_id(),
+            'parent_span_id': self.stack[-1]['span_id'] if self.stack else self.remote_parent,
+            'start': time.time_ns(),
+            'end': None,
+            'attributes': {k: v for k, v in attributes.items() if v is not None},
+            'status': STATUS_OK,
+        }
+        self.stack.append(span)
+        return span
+
+    def end_span(self, span, error=None):
+        span['end'] = time.time_ns()
+        if error is not None:
+            span['status'] = STATUS_ERROR
+            span['attributes']['error'] = str(error)
+        if self.stack and self.stack[-1] is span:
+            self.stack.pop()
+        elif span in self.stack:
+            self.stack.remove(span)
+        if self.recording:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, name, kind=SPAN_KIND_INTERNAL, **attributes):
+        span = self.start_span(name, kind, **attributes)
+        try:
+            yield span
+        except Exception as e:
+            self.end_span(span, error=e)
+            raise
+        else:
+            self.end_span(span)
+
+    def outgoing_headers(self):
+        span_id = self.current['span_id'] if self.current else new_span_id()
+        return {'X-Correlation-ID': self.trace_id, 'traceparent': f'00-{self.trace_id}-{span_id}-01'}
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def to_otlp(trace, service_name, resource_attributes=None):
+    """Trace as an OTLP/JSON ExportTraceServiceRequest dict."""
+    resource = {'service.name': service_name}
+    resource.update(resource_attributes or {})
+    spans = []
+    for span in trace.spans:
+        otlp = {
+            'traceId': trace.trace_id,
+            'spanId': span['span_id'],
+            'name': span['name'],
+            'kind': span['kind'],
+            'startTimeUnixNano': str(span['start']),
+            'endTimeUnixNano': str(span['end']),
+            'attributes': [{'key': k, 'value': _otlp_value(v)} for k, v in span['attributes'].items()],
+            'status': {'code': span['status']},
+        }
+        if span['parent_span_id']:
+            otlp['parentSpanId'] = span['parent_span_id']
+        spans.append(otlp)
+    return {'resourceSpans': [{
+        'resource': {'attributes': [{'key': k, 'value': _otlp_value(v)} for k, v in resource.items()]},
+        'scopeSpans': [{'scope': {'name': 'release_orchestrator.tracing'}, 'spans': spans}],
+    }]}
+
+
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+
+class FileExporter:
+    """Append traces as OTLP/JSON lines to a local file (collector 'file' exporter format)."""
+
+    def __init__(self, path, service_name, resource_attributes=None):
+        self.path = path
+        self.service_name = service_name
+        self.resource_attributes = resource_attributes or {}
+        # Several apps in one process (agent host) may share a file
+        with _file_locks_guard:
+            self._lock = _file_locks.setdefault(path, threading.Lock())
+
+    def export(self, trace):
+        if not trace.spans:
+            return
+        line = json.dumps(to_otlp(trace, self.service_name, self.resource_attributes))
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+# Flask helpers (work in both the orchestrator and the agent)
+
+_job = threading.local()
+
+
+def current_trace():
+    if has_request_context():
+        return g.get('trace')
+    return getattr(_job, 'trace', None)
+
+
+@contextmanager
+def job(name, **attributes):
+    """
+    Correlation ID and root span for a job run outside a request (in an app context, on
+    this thread): span(), outgoing_headers() and DB timing use it like a request's trace.
+    """
+    exporter = current_app.extensions.get('tracing') if has_app_context() else None
+    trace = Trace(new_trace_id(), recording=exporter is not None)
+    previous = getattr(_job, 'trace', None)
+    _job.trace = trace
+    try:
+        with trace.span(name, SPAN_KIND_INTERNAL, **attributes):
+            yield trace
+    finally:
+        _job.trace = previous
+        if exporter:
+            exporter.export(trace)
+
+
+def span(name, kind=SPAN_KIND_INTERNAL, **attributes):
+    """Child span of the current request, or a no-op outside of a traced request."""
+    trace = current_trace()
+    if trace is None:
+        return nullcontext()
+    return trace.span(name, kind, **attributes)
+
+
+def correlation_id():
+    trace = current_trace()
+    return trace.trace_id if trace else None
+
+
+def outgoing_headers():
+    trace = current_trace()
+    return trace.outgoing_headers() if trace else {}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = current_trace()
+    if trace is not None and trace.current is not None:
+        conn.info.setdefault('tracing_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = current_trace()
+    stack = conn.info.get('tracing_started')
+    if trace is None or trace.current is None or not stack:
+        return
+    elapsed_ms = (time.perf_counter() - stack.pop()) * 1000
+    # DB time is attributed to the innermost open span
+    attributes = trace.current['attributes']
+    attributes['db.duration_ms'] = round(attributes.get('db.duration_ms', 0.0) + elapsed_ms, 3)
+    attributes['db.statements'] = attributes.get('db.statements', 0) + 1
+
+
+def init_app(app, service_name, export_file=None, resource_attributes=None, trace_db=True):
+    """
+    Give every request a correlation ID and a root span. Spans are only recorded
+    (and DB time only attributed) when export_file is set.
+    """
+    exporter = FileExporter(export_file, service_name, resource_attributes) if export_file else None
+    app.extensions['tracing'] = exporter  # for job()
+    if exporter and trace_db:
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def _start_trace():
+        trace_id, parent_span_id = correlation_from_headers(request.headers)
+        g.trace = Trace(trace_id, parent_span_id, recording=exporter is not None)
+        rule = request.url_rule.rule if request.url_rule else request.path
+        g.trace_root = g.trace.start_span(f'{request.method} {rule}', SPAN_KIND_SERVER,
+                                          **{'http.method': request.method, 'http.target': request.path})
+
+    @app.after_request
+    def _finish_trace(response):
+        trace = g.pop('trace', None)
+        root = g.pop('trace_root', None)
+        if trace is None:
+            return response
+        response.headers['X-Correlation-ID'] = trace.trace_id
+        if root is not None:
+            root['attributes']['http.status_code'] = response.status_code
+            trace.end_span(root, error=f'HTTP {response.status_code}' if response.status_code >= 500 else None)
+        if exporter:
+            exporter.export(trace)
+        return response
+
+    return exporter
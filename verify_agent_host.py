@@ -0,0 +1,65 @@
+"""user-036: many simulated agents in one process, routed by path prefix or Host header."""
+from urllib.parse import urlsplit
+
+from werkzeug.test import Client
+
+from verify_support import AgentResponse, AgentStub, check, client, create_release, create_target, set_deployments
+from agent_host import build_host
+from agent_server import build_parser
+from models import PackageDeploymentStatus
+
+
+def host(*names, flags=()):
+    return build_host(list(names), build_parser().parse_args(list(flags)))
+
+
+def verify_routing():
+    print("Verifying path prefix and Host header routing...")
+    agents = host('SIM-A', 'SIM-B')
+    http = Client(agents)
+    check(http.get('/').get_json() == {'service': 'Deployment Agent Host', 'agents': ['SIM-A', 'SIM-B']}, 'agent list')
+    r = http.post('/sim-a/deploy', json={'package': 'p1', 'release': 'R'})
+    check(r.status_code == 200 and 'SIM-A' in r.get_json()['message'], 'path prefix routing (case-insensitive)')
+    r = http.post('/deploy', json={'package': 'p2', 'release': 'R'}, headers={'Host': 'sim-b.localhost:7000'})
+    check(r.status_code == 200 and 'SIM-B' in r.get_json()['message'], 'Host header routing')
+    check([h['package'] for h in http.get('/SIM-A/history').get_json()] == ['p1'], 'SIM-A keeps its own history')
+    check([h['package'] for h in http.get('/SIM-B/history').get_json()] == ['p2'], 'SIM-B keeps its own history')
+    check(http.get('/SIM-C/deploy').status_code == 404, 'unknown agent')
+    print("Routing Verified.")
+
+
+def verify_agents_are_independent():
+    print("Verifying per-agent random generators and simulation state...")
+    agents = host('R1', 'R2', flags=['--seed', '7', '--latency-ms', '100', '--latency-dist', 'uniform'])
+    states = [app.extensions['agent_state'] for app in agents.apps.values()]
+    samples = [[state.sample_latency() for _ in range(5)] for state in states]
+    check(samples[0] != samples[1], 'seeds differ per agent')
+    again = host('R1', flags=['--seed', '7', '--latency-ms', '100', '--latency-dist', 'uniform'])
+    check([again.apps['R1'].extensions['agent_state'].sample_latency() for _ in range(5)] == samples[0], 'reproducible')
+    print("Agent State Verified.")
+
+
+def verify_orchestrator_through_host():
+    print("Verifying the orchestrator deploys to a path-prefix target URL...")
+    agents = host('HOSTED-1', 'HOSTED-2')
+    http = Client(agents)
+
+    def forward(url, payload):
+        response = http.post(urlsplit(url).path, json=payload)
+        return AgentResponse(response.status_code, response.get_json())
+
+    AgentStub(forward).install()
+    _, ids = create_release('Hosted 1', ['svc'])
+    target_id = create_target('Hosted PROD', url='127.0.0.1:7000/HOSTED-2/')
+    set_deployments(target_id, [ids['svc']], PackageDeploymentStatus.distributed)
+    client('deployer').post(f"/package/{ids['svc']}/deploy", data={'target_id': target_id})
+    check([h['package'] for h in http.get('/HOSTED-2/history').get_json()] == ['svc'], 'deployed on HOSTED-2')
+    check(http.get('/HOSTED-1/history').get_json() == [], 'HOSTED-1 untouched')
+    print("Orchestrator Routing Verified.")
+
+
+if __name__ == "__main__":
+    verify_routing()
+    verify_agents_are_independent()
+    verify_orchestrator_through_host()
+    print("SUCCESS: All checks passed.")
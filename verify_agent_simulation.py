@@ -0,0 +1,53 @@
+"""user-033: simulated agent latency, failures and throttling."""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from verify_support import AgentProcess, check
+from load_test import percentile
+
+def verify_latency():
+    print("Verifying simulated latency...")
+    with AgentProcess('--latency-dist', 'fixed', '--latency-ms', '150') as agent:
+        started = time.perf_counter()
+        r = agent.command('deploy')
+        check(r.status_code == 200 and time.perf_counter() - started >= 0.15, 'fixed latency of 150 ms')
+    print("Latency Verified.")
+
+
+def verify_failures_are_recorded():
+    print("Verifying simulated failures are answered with 500 and kept in the history...")
+    with AgentProcess('--failure-rate', '1', '--seed', '1') as agent:
+        r = agent.command('distribute', 'broken')
+        check(r.status_code == 500 and r.json()['status'] == 'failure', f'status {r.status_code}')
+        history = agent.history()
+        check([(h['type'], h['package'], h['status']) for h in history] == [('distribute', 'broken', 'failure')],
+              f'history {history}')
+    print("Failures Verified.")
+
+
+def verify_throttling():
+    print("Verifying commands above --max-concurrent get 429...")
+    with AgentProcess('--max-concurrent', '1', '--latency-ms', '500') as agent:
+        with ThreadPoolExecutor(3) as pool:
+            codes = sorted(r.status_code for r in pool.map(agent.command, ['deploy'] * 3))
+        check(codes == [200, 429, 429], f'status codes {codes}')
+        check(requests.get(agent.url).json()['inflight'] == 0, 'nothing left in flight')
+    print("Throttling Verified.")
+
+
+def verify_percentile():
+    print("Verifying the load test percentiles...")
+    samples = list(range(1, 101))
+    check((percentile(samples, 50), percentile(samples, 95), percentile(samples, 100)) == (50, 95, 100), 'percentiles')
+    check(percentile([], 95) == 0.0, 'no samples')
+    print("Percentiles Verified.")
+
+
+if __name__ == "__main__":
+    verify_latency()
+    verify_failures_are_recorded()
+    verify_throttling()
+    verify_percentile()
+    print("SUCCESS: All checks passed.")
@@ -0,0 +1,112 @@
+"""user-037: content-addressed agent artifact store with resumed downloads and LRU eviction."""
+import hashlib
+import os
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer
+
+from verify_support import WORK_DIR, check
+from agent_server import build_parser, create_agent_app
+from artifact_cache import ArtifactCache, ArtifactError, ChecksumMismatch
+from nexus_stub import RangeRequestHandler
+
+KB = 1024
+NEXUS_DIR = os.path.join(WORK_DIR, 'nexus')
+
+
+class QuietHandler(RangeRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def start_nexus():
+    os.makedirs(NEXUS_DIR, exist_ok=True)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(QuietHandler, directory=NEXUS_DIR))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def artifact(name, size):
+    content = os.urandom(size)
+    with open(os.path.join(NEXUS_DIR, name), 'wb') as f:
+        f.write(content)
+    return hashlib.sha256(content).hexdigest()
+
+
+def verify_download_once(nexus):
+    print("Verifying artifacts are stored once by digest...")
+    digest = artifact('app-1.0.tar.gz', 150 * KB)
+    cache = ArtifactCache(os.path.join(WORK_DIR, 'store-1'), 10 * 1024 * KB)
+    first = cache.fetch(f'{nexus}/app-1.0.tar.gz')
+    check(first['digest'] == digest and not first['cache_hit'] and first['downloaded_bytes'] == 150 * KB, f'{first}')
+    second = cache.fetch(f'{nexus}/app-1.0.tar.gz')
+    check(second['cache_hit'] and second['downloaded_bytes'] == 0, 'same URL served from the store')
+    mirror = cache.fetch(f'{nexus}/mirror/app-1.0.tar.gz', expected_sha256=digest.upper())
+    check(mirror['cache_hit'] and mirror['path'] == first['path'], 'same checksum on another URL served from the store')
+    reopened = ArtifactCache(cache.root, cache.quota_bytes)
+    check(reopened.lookup(f'{nexus}/app-1.0.tar.gz') == digest, 'index survives a restart')
+    try:
+        cache.fetch(f'{nexus}/app-1.0.tar.gz', expected_sha256='0' * 64)
+        check(False, 'checksum mismatch not detected')
+    except ChecksumMismatch:
+        pass
+    print("Download Once Verified.")
+
+
+def verify_resume(nexus):
+    print("Verifying an interrupted download is resumed with a Range request...")
+    digest = artifact('big-2.0.tar.gz', 400 * KB)
+    cache = ArtifactCache(os.path.join(WORK_DIR, 'store-2'), 10 * 1024 * KB)
+    QuietHandler.drop_after_kb = 100
+    try:
+        cache.fetch(f'{nexus}/big-2.0.tar.gz')
+        check(False, 'dropped connection not reported')
+    except ArtifactError:
+        pass
+    finally:
+        QuietHandler.drop_after_kb = 0
+    result = cache.fetch(f'{nexus}/big-2.0.tar.gz')
+    # Everything received before the drop (up to 100 KB, in whole chunks) is not fetched again
+    check(result['resumed'] and 300 * KB <= result['downloaded_bytes'] < 400 * KB, f'resumed {result}')
+    check(result['digest'] == digest, 'hash over the kept part and the rest')
+    check(os.listdir(cache.partial_dir) == [], 'partial files cleaned up')
+    print("Resume Verified.")
+
+
+def verify_lru_eviction(nexus):
+    print("Verifying least recently used artifacts are evicted above the quota...")
+    for name in ('a', 'b', 'c'):
+        artifact(f'{name}.bin', 100 * KB)
+    cache = ArtifactCache(os.path.join(WORK_DIR, 'store-3'), 250 * KB)
+    a = cache.fetch(f'{nexus}/a.bin')['digest']
+    b = cache.fetch(f'{nexus}/b.bin')['digest']
+    cache.objects[a]['last_used'] = cache.objects[b]['last_used'] + 1  # a used after b
+    c = cache.fetch(f'{nexus}/c.bin')['digest']
+    check(set(cache.objects) == {a, c} and cache.used_bytes == 200 * KB, 'b evicted')
+    check(cache.object_path(b) is None and cache.lookup(f'{nexus}/b.bin') is None, 'b forgotten')
+    print("Eviction Verified.")
+
+
+def verify_agent_distribute(nexus):
+    print("Verifying distribute downloads into the agent store...")
+    digest = artifact('svc-3.0.tar.gz', 50 * KB)
+    options = build_parser().parse_args(['--artifact-dir', os.path.join(WORK_DIR, 'agent-store')])
+    http = create_agent_app('CACHE-AGENT', options).test_client()
+    payload = {'package': 'svc', 'release': 'R3', 'nexus_url': f'{nexus}/svc-3.0.tar.gz'}
+    first = http.post('/distribute', json=payload).get_json()
+    again = http.post('/distribute', json=payload).get_json()
+    check(first['digest'] == digest and first['cache_hit'] is False and again['cache_hit'] is True, f'{first} {again}')
+    check(http.get(f'/artifacts/{digest}').data == open(os.path.join(NEXUS_DIR, 'svc-3.0.tar.gz'), 'rb').read(),
+          'artifact served to other agents')
+    r = http.post('/distribute', json=dict(payload, nexus_url=f'{nexus}/missing.tar.gz'))
+    check(r.status_code == 502 and http.get('/history').get_json()[-1]['status'] == 'failure', 'failed download')
+    print("Agent Distribute Verified.")
+
+
+if __name__ == "__main__":
+    nexus = start_nexus()
+    verify_download_once(nexus)
+    verify_resume(nexus)
+    verify_lru_eviction(nexus)
+    verify_agent_distribute(nexus)
+    print("SUCCESS: All checks passed.")
@@ -0,0 +1,67 @@
+"""user-032: seed_data.py builds a synthetic dataset and benchmark.py times routes on a copy of it."""
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+from contextlib import closing
+
+from verify_support import WORK_DIR, check
+from benchmark import percentile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DB_FILE = os.path.join(WORK_DIR, 'bench.db')
+RESULTS = os.path.join(WORK_DIR, 'results.jsonl')
+
+
+def run(script, *args):
+    result = subprocess.run([sys.executable, os.path.join(HERE, script), *args], cwd=WORK_DIR,
+                            capture_output=True, text=True, env=dict(os.environ, SCHEDULER_ENABLED='0'))
+    check(result.returncode == 0, f'{script} exited with {result.returncode}: {result.stderr[-2000:]}')
+    return result.stdout
+
+
+def counts():
+    with closing(sqlite3.connect(DB_FILE)) as conn:
+        return {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                for table in ('release', 'package', 'deployment_target', 'package_dependencies', 'event_log')}
+
+
+def verify_seed():
+    print("Verifying the synthetic dataset...")
+    run('seed_data.py', '--db', f'sqlite:///{DB_FILE}', '--releases', '12', '--packages', '4', '--targets', '3',
+        '--years', '0.05', '--events-per-day', '5')
+    seeded = counts()
+    check(seeded['release'] == 12 and seeded['package'] == 48 and seeded['deployment_target'] == 3, f'counts {seeded}')
+    check(seeded['package_dependencies'] > 0 and seeded['event_log'] > 0, f'edges and events {seeded}')
+    with closing(sqlite3.connect(DB_FILE)) as conn:
+        # Dependencies only point at earlier packages: the graph is a DAG
+        later = conn.execute('SELECT COUNT(*) FROM package_dependencies WHERE provider_id >= requirer_id').fetchone()[0]
+    check(later == 0, f'{later} edges on later packages')
+    print("Seed Verified.")
+
+
+def verify_benchmark():
+    print("Verifying the benchmark run and its comparison with the previous one...")
+    before = counts()
+    out = run('benchmark.py', '--db', DB_FILE, '--repeat', '2', '--output', RESULTS, '--label', 'first')
+    check('Results appended' in out, f'benchmark output {out}')
+    check(counts() == before, 'the seeded database is left untouched')
+    out = run('benchmark.py', '--db', DB_FILE, '--repeat', '2', '--output', RESULTS, '--label', 'second')
+    check('Compared with first' in out, 'second run compared with the first')
+    with open(RESULTS) as f:
+        runs = [json.loads(line) for line in f]
+    check([r['version'] for r in runs] == ['first', 'second'], 'two runs appended')
+    results = runs[-1]['results']
+    check({'index', 'release_detail', 'distribute_all', 'deploy_all', 'fallback_all'} <= set(results), f'routes {list(results)}')
+    check(all(r['runs'] == 2 and r['min_ms'] <= r['median_ms'] <= r['max_ms'] and r['queries'] > 0
+              for r in results.values()), f'timings {results}')
+    check((percentile(range(1, 101), 50), percentile(range(1, 101), 95), percentile([7], 99)) == (50, 95, 7),
+          'nearest-rank percentiles')
+    print("Benchmark Verified.")
+
+
+if __name__ == "__main__":
+    verify_seed()
+    verify_benchmark()
+    print("SUCCESS: All checks passed.")
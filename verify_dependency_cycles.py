@@ -0,0 +1,64 @@
+"""user-027: dependency cycles are rejected, one edge at a time and in the bulk import."""
+from verify_support import app, check, client, create_release
+from dependency_graph import dependency_graph
+from models import db, package_dependencies
+
+
+def edge_count():
+    with app.app_context():
+        return db.session.query(package_dependencies).count()
+
+
+def verify_add_dependency_rejects_cycle():
+    print("Verifying add_dependency rejects cycles...")
+    release_id, ids = create_release('Cycles 1', ['a', 'b', 'c'], [('a', 'b'), ('b', 'c')])
+    deployer = client('deployer')
+    before = edge_count()
+    r = deployer.post(f"/package/{ids['c']}/dependency", data={'dependency_id': ids['a']}, follow_redirects=True)
+    check('would create a cycle: c -&gt; a -&gt; b -&gt; c' in r.get_data(as_text=True), 'cycle message with the path')
+    check(edge_count() == before, 'cyclic edge not stored')
+    r = deployer.post(f"/package/{ids['a']}/dependency", data={'dependency_id': ids['c']}, follow_redirects=True)
+    check('Dependency on c added' in r.get_data(as_text=True), 'shortcut edge a -> c accepted')
+    with app.app_context():
+        check(dependency_graph.cycle_for_edge(ids['b'], ids['b']) == [ids['b'], ids['b']], 'self edge is a cycle')
+    print("add_dependency Verified.")
+
+
+def verify_import_is_all_or_nothing():
+    print("Verifying the bulk import...")
+    release_id, ids = create_release('Cycles 2', ['x', 'y', 'z'])
+    url = f'/api/release/{release_id}/dependencies'
+    deployer = client('deployer')
+    before = edge_count()
+    # The third edge closes a cycle with the two before it in the same batch
+    r = deployer.post(url, json={'edges': [['x', 'y'], ['y', 'z'], ['z', 'x']]})
+    check(r.status_code == 400, f'cyclic batch status {r.status_code}')
+    check('z -> x would create a cycle' in r.get_json()['errors'][0], f"errors {r.get_json()['errors']}")
+    check(edge_count() == before, 'nothing imported from a rejected batch')
+
+    r = deployer.post(url, json={'edges': [['x', 'y'], ['y', 'z'], ['x', 'y']]})
+    check(r.status_code == 200 and r.get_json()['imported'] == 2, f'valid batch {r.get_json()}')
+    with app.app_context():
+        check(dependency_graph.transitive_dependencies(ids['x']) == {ids['y'], ids['z']}, 'imported edges in the index')
+    print("Bulk Import Verified.")
+
+
+def verify_import_rejects_malformed_bodies():
+    print("Verifying malformed import bodies get 400...")
+    release_id, _ = create_release('Cycles 3', ['p', 'q'])
+    url = f'/api/release/{release_id}/dependencies'
+    deployer = client('deployer')
+    for body in ([['p', 'q']], {'edges': 'pq'}, {'edges': [[['p'], 'q']]}, {'edges': [['p', 'q', 'r']]},
+                 {'edges': [['p', 'unknown']]}):
+        r = deployer.post(url, json=body)
+        check(r.status_code == 400 and r.get_json()['status'] == 'error', f'{body!r}: status {r.status_code}')
+    r = deployer.post(url, data='not json', content_type='application/json')
+    check(r.status_code == 400, f'invalid JSON: status {r.status_code}')
+    print("Malformed Bodies Verified.")
+
+
+if __name__ == "__main__":
+    verify_add_dependency_rejects_cycle()
+    verify_import_is_all_or_nothing()
+    verify_import_rejects_malformed_bodies()
+    print("SUCCESS: All checks passed.")
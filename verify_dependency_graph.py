@@ -0,0 +1,53 @@
+"""user-026: transitive dependency queries answered from the in-memory graph index."""
+from verify_support import app, check, client, create_release
+from dependency_graph import dependency_graph
+from models import db, Package
+
+
+def verify_transitive_queries():
+    print("Verifying transitive dependencies and dependents...")
+    # app -> lib -> core, app -> util; other release: plugin -> app
+    _, ids = create_release('Graph 1', ['app', 'lib', 'core', 'util'],
+                            [('app', 'lib'), ('lib', 'core'), ('app', 'util')])
+    _, other = create_release('Graph 2', ['plugin'])
+    with app.app_context():
+        db.session.get(Package, other['plugin']).dependencies.append(db.session.get(Package, ids['app']))
+        db.session.commit()
+
+        check(dependency_graph.transitive_dependencies(ids['app']) == {ids['lib'], ids['core'], ids['util']},
+              'transitive dependencies of app')
+        check(dependency_graph.transitive_dependents(ids['core']) == {ids['lib'], ids['app'], other['plugin']},
+              'transitive dependents of core (across releases)')
+        check(dependency_graph.dependencies_of(ids['app']) == {ids['lib'], ids['util']}, 'direct dependencies of app')
+        waves = dependency_graph.topological_waves(ids.values())
+        check(waves == [sorted([ids['core'], ids['util']]), [ids['lib']], [ids['app']]], f'waves {waves}')
+
+    r = client('viewer').get(f"/api/package/{ids['lib']}/dependencies")
+    body = r.get_json()
+    check(r.status_code == 200, f'API status {r.status_code}')
+    check([p['name'] for p in body['requires']] == ['core'], f"requires {body['requires']}")
+    check(sorted(p['name'] for p in body['required_by']) == ['app', 'plugin'], f"required_by {body['required_by']}")
+    r = client('viewer').get(f"/api/package/{ids['core']}/dependencies?transitive=0")
+    check([p['name'] for p in r.get_json()['required_by']] == ['lib'], 'direct dependents of core')
+    print("Transitive Queries Verified.")
+
+
+def verify_index_follows_commits():
+    print("Verifying the index is rebuilt after a change...")
+    _, ids = create_release('Graph 3', ['a', 'b'])
+    with app.app_context():
+        check(dependency_graph.transitive_dependencies(ids['a']) == set(), 'no dependencies yet')
+    r = client('deployer').post(f"/package/{ids['a']}/dependency", data={'dependency_id': ids['b']})
+    check(r.status_code == 302, f'add_dependency status {r.status_code}')
+    with app.app_context():
+        check(dependency_graph.transitive_dependencies(ids['a']) == {ids['b']}, 'new edge visible after commit')
+    client('deployer').post(f"/package/{ids['a']}/remove_dependency", data={'dependency_id': ids['b']})
+    with app.app_context():
+        check(dependency_graph.transitive_dependencies(ids['a']) == set(), 'removed edge gone after commit')
+    print("Index Invalidation Verified.")
+
+
+if __name__ == "__main__":
+    verify_transitive_queries()
+    verify_index_follows_commits()
+    print("SUCCESS: All checks passed.")
@@ -0,0 +1,71 @@
+"""user-034: every agent command is recorded as a numbered DeploymentAttempt with its timing."""
+from datetime import datetime
+
+from verify_support import AgentResponse, AgentStub, app, check, client, create_release, create_target, set_deployments
+import app as orchestrator
+from models import db, DeploymentAttempt, Package, PackageDeploymentStatus
+
+
+def attempts(package_id, target_id):
+    with app.app_context():
+        return [(a.operation, a.attempt, a.outcome) for a in DeploymentAttempt.query.filter_by(
+            package_id=package_id, target_id=target_id).order_by(DeploymentAttempt.id)]
+
+
+def verify_attempts_are_numbered():
+    print("Verifying failed and successful attempts are numbered per operation...")
+    _, ids = create_release('Attempts 1', ['svc'])
+    target_id = create_target('Attempts PROD')
+    set_deployments(target_id, [ids['svc']], PackageDeploymentStatus.distributed)
+    deployer = client('deployer')
+    answers = iter([AgentResponse(500), AgentResponse(503), AgentResponse()])
+    AgentStub(lambda url, payload: next(answers)).install()
+    for _ in range(3):
+        deployer.post(f"/package/{ids['svc']}/deploy", data={'target_id': target_id})
+    check(attempts(ids['svc'], target_id) == [('deploy', 1, 'failure'), ('deploy', 2, 'failure'), ('deploy', 3, 'success')],
+          f"attempts {attempts(ids['svc'], target_id)}")
+    with app.app_context():
+        first = DeploymentAttempt.query.filter_by(package_id=ids['svc'], attempt=1).one()
+        check(first.error == 'Agent returned status 500', f'error {first.error}')
+        check(first.latency_seconds >= 0 and first.finished_at >= first.started_at, 'timing recorded')
+    print("Attempt Numbering Verified.")
+
+
+def verify_failure_survives_without_caller_commit():
+    print("Verifying an attempt is kept while the caller's changes are not committed with it...")
+    _, ids = create_release('Attempts 2', ['job'])
+    target_id = create_target('Attempts QA')
+    with app.app_context():
+        package = db.session.get(Package, ids['job'])
+        package.name = 'renamed'  # pending, never committed by the caller
+        orchestrator.record_deployment_attempt(ids['job'], target_id, 'distribute', datetime.utcnow(), 0.5, False, 'boom')
+        db.session.rollback()
+        check(db.session.get(Package, ids['job']).name == 'job', "caller's pending change not committed")
+    check(attempts(ids['job'], target_id) == [('distribute', 1, 'failure')], 'attempt committed on its own')
+    print("Separate Commit Verified.")
+
+
+def verify_stats_endpoints():
+    print("Verifying the attempt statistics endpoints...")
+    _, ids = create_release('Attempts 3', ['fast', 'slow'])
+    fast_target, slow_target = create_target('Stats FAST'), create_target('Stats SLOW')
+    with app.app_context():
+        for n, latency in enumerate([1.0, 2.0, 3.0, 4.0]):
+            orchestrator.record_deployment_attempt(ids['slow'], slow_target, 'deploy', datetime.utcnow(), 100 + latency, n != 0)
+        orchestrator.record_deployment_attempt(ids['fast'], fast_target, 'deploy', datetime.utcnow(), 0.001, True)
+    viewer = client('viewer')
+    packages = viewer.get('/api/stats/slowest_packages?limit=1').get_json()['packages']
+    check([p['package_id'] for p in packages] == [ids['slow']] and packages[0]['attempts'] == 4, f'slowest {packages}')
+    targets = {t['target_id']: t for t in viewer.get('/api/stats/slowest_targets').get_json()['targets']}
+    check(targets[slow_target]['failures'] == 1 and targets[slow_target]['max_seconds'] == 104.0, f'{targets[slow_target]}')
+    body = viewer.get('/api/stats/target_percentiles?percentile=50').get_json()
+    p50 = {t['target_id']: t['p50_seconds'] for t in body['targets']}
+    check(p50[slow_target] == 102.0 and p50[fast_target] == 0.001, f'p50 {p50}')
+    print("Statistics Verified.")
+
+
+if __name__ == "__main__":
+    verify_attempts_are_numbered()
+    verify_failure_survives_without_caller_commit()
+    verify_stats_endpoints()
+    print("SUCCESS: All checks passed.")
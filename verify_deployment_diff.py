@@ -0,0 +1,71 @@
+"""user-049: set differences between two targets, or a target and a release definition."""
+from verify_support import check, client, create_release, create_target, set_deployments
+from models import PackageDeploymentStatus
+
+distributed = PackageDeploymentStatus.distributed
+
+
+def setup(suffix):
+    # 1.0 on PROD, 2.0 on STAGE; PROD already has 2.0's `a` distributed
+    old_id, old = create_release(f'Diff{suffix} 1.0', ['a', 'b', 'c'])
+    new_id, new = create_release(f'Diff{suffix} 2.0', ['a', 'b', 'd'])
+    prod_id, stage_id = create_target(f'Diff{suffix} PROD'), create_target(f'Diff{suffix} STAGE')
+    set_deployments(prod_id, old.values())
+    set_deployments(prod_id, [new['a']], distributed)
+    set_deployments(stage_id, new.values())
+    return old_id, new_id, prod_id, stage_id
+
+
+def diff(**args):
+    r = client('viewer').get('/api/diff', query_string=args)
+    check(r.status_code == 200, f'{args}: status {r.status_code} {r.get_json()}')
+    return r.get_json()
+
+
+def verify_target_vs_target():
+    print("Verifying the difference between two targets...")
+    old_id, new_id, prod_id, stage_id = setup('')
+    stage, prod = f'target:{stage_id}', f'target:{prod_id}'
+    body = diff(left=stage, right=prod)
+    check(body['counts'] == {'left': 3, 'right': 3}, f"by package id {body['counts']}")
+    items = {i['package']: i for i in body['items']}
+    check(items['a']['status'] == 'deployed' and items['a']['other_status'] == 'distributed', f"other side status {items['a']}")
+    check(items['d']['other_status'] is None, 'not on the other target at all')
+
+    check(diff(left=stage, right=prod, status='distributed')['counts'] == {'left': 2, 'right': 3}, 'distributed counts as present')
+    check(diff(left=stage, right=prod, release_id=new_id)['counts'] == {'left': 3, 'right': 0}, 'scoped to one release')
+    body = diff(left=prod, right=stage, direction='right', limit=2)
+    check([i['package'] for i in body['items']] == ['a', 'b'] and body['has_more'], f"page {body['items']}")
+    body = diff(left=prod, right=stage, direction='right', limit=2, offset=2)
+    check([i['package'] for i in body['items']] == ['d'] and not body['has_more'], 'last page')
+    print("Target Diff Verified.")
+
+
+def verify_target_vs_release():
+    print("Verifying the difference between a target and a release definition...")
+    _, new_id, prod_id, _ = setup(' R')
+    body = diff(left=f'target:{prod_id}', right=f'release:{new_id}')
+    check(body['counts'] == {'left': 1, 'right': 1}, f"by name {body['counts']}")
+    check(body['items'][0]['package'] == 'c' and body['items'][0]['release'] == 'Diff R 1.0', f"only on PROD {body['items']}")
+    body = diff(left=f'target:{prod_id}', right=f'release:{new_id}', direction='right')
+    check([(i['package'], i['status']) for i in body['items']] == [('d', None)], f"missing from PROD {body['items']}")
+    print("Release Diff Verified.")
+
+
+def verify_invalid_arguments():
+    print("Verifying invalid diff arguments...")
+    viewer = client('viewer')
+    for args in ({'left': 'target:1'}, {'left': 'host:1', 'right': 'target:1'}, {'left': 'target:999', 'right': 'target:1'},
+                 {'left': 'target:1', 'right': 'target:1', 'status': 'gone'},
+                 {'left': 'target:1', 'right': 'target:1', 'direction': 'up'}):
+        check(viewer.get('/api/diff', query_string=args).status_code == 400, f'{args} rejected')
+    check(viewer.get('/diff?left=target:1&right=release:1').status_code == 200, 'diff page renders')
+    check('Unknown target 999' in viewer.get('/diff?left=target:999&right=target:1').get_data(as_text=True), 'page error')
+    print("Invalid Arguments Verified.")
+
+
+if __name__ == "__main__":
+    verify_target_vs_target()
+    verify_target_vs_release()
+    verify_invalid_arguments()
+    print("SUCCESS: All checks passed.")
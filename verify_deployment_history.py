@@ -0,0 +1,102 @@
+"""user-047: deployment state transitions, checkpoints and point-in-time queries."""
+import os
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from verify_support import app, check, client, create_release, create_target, set_deployments
+import deployment_history
+from deployment_history import HISTORY_START, create_checkpoints, decode_state, encode_state, ensure_baseline, snapshot, state_at
+from models import db, DeploymentCheckpoint, PackageDeployment, PackageDeploymentStatus
+
+APP_DB = os.environ['DATABASE_URL'][len('sqlite:///'):]
+deployed, distributed = PackageDeploymentStatus.deployed, PackageDeploymentStatus.distributed
+
+
+def moment():
+    """A point in time strictly between the transitions before and after it."""
+    time.sleep(0.01)
+    at = datetime.utcnow()
+    time.sleep(0.01)
+    return at
+
+
+def verify_encoding():
+    print("Verifying the packed checkpoint state...")
+    state = {7: 3, 1: 2, 100000: 1, 42: 3}
+    entries, payload = encode_state(state)
+    check(entries == 4 and decode_state(entries, payload) == state, 'round trip')
+    check(decode_state(*encode_state({})) == {}, 'empty state')
+    print("Encoding Verified.")
+
+
+def verify_point_in_time():
+    print("Verifying the state at earlier points in time...")
+    _, ids = create_release('History 1.0', ['api', 'web', 'db'], [('api', 'db'), ('web', 'api')])
+    target_id = create_target('History PROD')
+    set_deployments(target_id, [ids['db'], ids['api']], distributed)
+    first = moment()
+    set_deployments(target_id, [ids['db'], ids['api'], ids['web']])
+    second = moment()
+    with app.app_context():
+        db.session.delete(PackageDeployment.query.filter_by(package_id=ids['web'], target_id=target_id).one())
+        db.session.commit()
+    client('deployer').post(f"/package/{ids['db']}/fallback_cascade", data={'target_id': target_id})  # Core UPDATE
+    third = moment()
+
+    with app.app_context():
+        check(snapshot(target_id, first) == {ids['db']: distributed, ids['api']: distributed}, 'after distribute')
+        check(snapshot(target_id, second) == {ids['db']: deployed, ids['api']: deployed, ids['web']: deployed}, 'after deploy')
+        check(snapshot(target_id, third) == {ids['db']: distributed, ids['api']: distributed}, 'delete and cascade recorded')
+
+        create_checkpoints(settle_seconds=0)
+        state, replayed = state_at(target_id, datetime.utcnow())
+        check(replayed == 0 and state == {ids['db']: 2, ids['api']: 2}, f'checkpoint replaces the replay ({replayed})')
+        state, replayed = state_at(target_id, second)
+        check(replayed == 5, f'older times replay from the baseline ({replayed})')
+
+    r = client('viewer').get(f'/api/target/{target_id}/state', query_string={'at': second.isoformat()})
+    check(sorted(d['package'] for d in r.get_json()['deployments']) == ['api', 'db', 'web'], 'API state')
+    aware = second.replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=2)))
+    r = client('viewer').get(f'/api/target/{target_id}/state', query_string={'at': aware.isoformat()})
+    check(r.status_code == 200 and r.get_json()['at'] == second.isoformat(), f"offset normalized to UTC: {r.get_json()['at']}")
+    check(len(r.get_json()['deployments']) == 3, 'same state through an offset')
+    check(client('viewer').get(f'/api/target/{target_id}/state?at=yesterday').status_code == 400, 'bad ?at= rejected')
+    check(client('viewer').get(f'/api/target/{target_id}/state?at=2000-01-01').status_code == 404, 'before the history')
+    check(client('viewer').get(f'/target/{target_id}/history').status_code == 200, 'history page renders')
+    print("Point In Time Verified.")
+
+
+def verify_baseline_race():
+    print("Verifying only one worker writes the baseline...")
+    with app.app_context():
+        check(db.session.query(DeploymentCheckpoint).filter_by(target_id=HISTORY_START, baseline=True).count() == 1,
+              'history start recorded on an empty database')
+        check(ensure_baseline() == 0, 'no second baseline once the history started')
+
+        # A fresh database where another worker commits its baseline between our check and our commit
+        db.session.query(DeploymentCheckpoint).delete()
+        db.session.commit()
+
+        def other_worker(session):
+            with closing(sqlite3.connect(APP_DB)) as conn, conn:
+                conn.execute('INSERT INTO deployment_checkpoint (target_id, timestamp, entries, payload, baseline) '
+                             'VALUES (?, ?, 0, ?, 1)', (HISTORY_START, datetime.utcnow().isoformat(' '), encode_state({})[1]))
+
+        event.listen(Session, 'before_commit', other_worker, once=True)
+        check(ensure_baseline() == 0, 'the losing worker returns 0')
+        check(db.session.query(DeploymentCheckpoint).filter_by(baseline=True).count() == 1, "only the winner's baseline")
+        check(deployment_history.naive_utc(datetime(2026, 1, 1, 12, tzinfo=timezone(timedelta(hours=-5)))) ==
+              datetime(2026, 1, 1, 17), 'naive_utc converts an offset')
+    print("Baseline Race Verified.")
+
+
+if __name__ == "__main__":
+    verify_encoding()
+    verify_point_in_time()
+    verify_baseline_race()
+    print("SUCCESS: All checks passed.")
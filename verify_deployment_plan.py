@@ -0,0 +1,76 @@
+"""user-029: dry-run deployment plan with waves and estimates from recorded deploy durations."""
+import time
+
+from verify_support import AgentResponse, AgentStub, check, client, create_release, create_target, deployment_status, set_deployments
+from models import PackageDeploymentStatus
+
+distributed = PackageDeploymentStatus.distributed
+
+
+def slow_agent(url, payload):
+    time.sleep(0.02)  # something to measure
+    return AgentResponse()
+
+
+def deploy(package_id, target_id):
+    set_deployments(target_id, [package_id], distributed)
+    client('deployer').post(f'/package/{package_id}/deploy', data={'target_id': target_id})
+    check(deployment_status(package_id, target_id) == PackageDeploymentStatus.deployed, f'deploy of {package_id}')
+
+
+def verify_plan():
+    print("Verifying waves, actions and estimate sources...")
+    AgentStub(slow_agent).install()
+    target_id = create_target('Plan PROD')
+    other_target_id = create_target('Plan QA')
+    # History: `core` of an earlier release on PROD, `tool` only on QA
+    _, old = create_release('Plan 1.0', ['core', 'tool'])
+    deploy(old['core'], target_id)
+    deploy(old['tool'], other_target_id)
+
+    release_id, ids = create_release('Plan 2.0', ['core', 'svc', 'ui', 'tool', 'lonely', 'broken'],
+                                     [('svc', 'core'), ('ui', 'svc'), ('broken', 'lonely')])
+    set_deployments(target_id, [ids[n] for n in ('core', 'svc', 'ui', 'tool', 'broken')], distributed)
+
+    r = client('viewer').get(f'/api/release/{release_id}/plan?target_id={target_id}')
+    check(r.status_code == 200, f'plan status {r.status_code}')
+    plan = r.get_json()
+    steps = {s['name']: s for s in plan['steps']}
+    check([sorted(wave) for wave in plan['waves']] == [['core', 'tool'], ['svc'], ['ui']], f"waves {plan['waves']}")
+    check(steps['lonely']['action'] == 'skip', 'not distributed package is skipped')
+    check(steps['broken']['action'] == 'fail' and 'lonely' in steps['broken']['reason'], 'missing dependency fails')
+    check(plan['summary'] == {'deploy': 4, 'already_deployed': 0, 'skip': 1, 'fail': 1}, f"summary {plan['summary']}")
+
+    sources = {name: steps[name]['estimate_source'] for name in ('core', 'tool', 'svc')}
+    check(sources == {'core': 'history', 'tool': 'other_targets', 'svc': 'target_average'}, f'sources {sources}')
+    check(steps['core']['estimate_seconds'] >= 0.02, 'estimate from the measured duration')
+    check(plan['estimate']['critical_path'] == ['core', 'svc', 'ui'], f"critical path {plan['estimate']['critical_path']}")
+    check(abs(plan['estimate']['sequential_seconds'] - sum(s['estimate_seconds'] for s in steps.values()
+                                                             if s['action'] == 'deploy')) < 1e-9, 'sequential sum')
+
+    fresh_target_id = create_target('Plan DEV')
+    set_deployments(fresh_target_id, [ids['lonely']], distributed)
+    plan = client('viewer').get(f'/api/release/{release_id}/plan?target_id={fresh_target_id}').get_json()
+    estimates = {s['name']: (s['estimate_seconds'], s['estimate_source']) for s in plan['steps'] if s['action'] == 'deploy'}
+    check(estimates == {'lonely': (5.0, 'default')}, f'no history anywhere: {estimates}')
+    print("Plan Verified.")
+
+
+def verify_plan_changes_nothing():
+    print("Verifying the plan calls no agent...")
+    stub = AgentStub().install()
+    release_id, ids = create_release('Plan 3.0', ['solo'])
+    target_id = create_target('Plan STAGE')
+    set_deployments(target_id, [ids['solo']], distributed)
+    r = client('viewer').get(f'/release/{release_id}/plan?target_id={target_id}')
+    check(r.status_code == 200 and 'solo' in r.get_data(as_text=True), 'plan page renders')
+    check(not stub.calls, 'no agent called')
+    check(deployment_status(ids['solo'], target_id) == distributed, 'nothing deployed')
+    check(client('viewer').get(f'/api/release/{release_id}/plan').status_code == 400, 'target_id required')
+    print("No Side Effects Verified.")
+
+
+if __name__ == "__main__":
+    verify_plan()
+    verify_plan_changes_nothing()
+    print("SUCCESS: All checks passed.")
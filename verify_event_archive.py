@@ -0,0 +1,121 @@
+"""user-044: old events move into monthly gzip archives without loss or duplicates."""
+import os
+from datetime import datetime
+
+from verify_support import app, check, client
+from sqlalchemy import delete
+
+import event_archive
+from event_archive import EventArchive, archive_events, retention_cutoff
+from models import db, EventLog
+
+archive = EventArchive(app.config['EVENT_ARCHIVE_DIR'])
+
+
+def add_events(timestamps):
+    with app.app_context():
+        events = [EventLog(timestamp=ts, category='release', operation='archive_test', description=f'event {n}', user='system')
+                  for n, ts in enumerate(timestamps)]
+        db.session.add_all(events)
+        db.session.commit()
+        return [e.id for e in events]
+
+
+def archived_ids(month):
+    return [e.id for e in archive.read(month)]
+
+
+def db_ids():
+    with app.app_context():
+        return [i for (i,) in db.session.query(EventLog.id).filter_by(operation='archive_test').order_by(EventLog.id)]
+
+
+def verify_rotation():
+    print("Verifying old months move into the archive in batches...")
+    january = add_events([datetime(2024, 1, d, 12) for d in range(1, 11)])
+    february = add_events([datetime(2024, 2, d, 12) for d in range(1, 6)])
+    recent = add_events([datetime(2024, 3, 2, 12)])
+    with app.app_context():
+        stats = archive_events(archive, datetime(2024, 3, 1), batch_size=4)
+    check(stats['archived'] == 15 and stats['deleted'] == 15, f'stats {stats}')
+    check(archived_ids('2024-01') == january and archived_ids('2024-02') == february, 'archived in id order')
+    check(db_ids() == recent, 'only the current month left in the database')
+    index = archive.index()
+    check(index['2024-01']['count'] == 10 and index['2024-01']['max_id'] == january[-1], f'index {index}')
+    check(index['2024-02']['first'] == '2024-02-01T12:00:00', 'first timestamp')
+    check(retention_cutoff(30, datetime(2024, 3, 15)) == datetime(2024, 2, 1), 'cutoff rounded to the month')
+    print("Rotation Verified.")
+
+
+def verify_interrupted_run_is_not_duplicated():
+    print("Verifying a run interrupted before the delete does not archive twice...")
+    april = add_events([datetime(2024, 4, d, 12) for d in range(1, 4)])
+
+    def crash(*args):
+        raise KeyboardInterrupt('killed between writing the archive and deleting the rows')
+
+    event_archive.delete = crash
+    try:
+        with app.app_context():
+            archive_events(archive, datetime(2024, 5, 1))
+        check(False, 'the run was not interrupted')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        event_archive.delete = delete
+    check(archived_ids('2024-04') == april and set(april) <= set(db_ids()), 'archived, not deleted yet')
+    with app.app_context():
+        archive_events(archive, datetime(2024, 5, 1))
+    check(archived_ids('2024-04') == april, 'no duplicates after the rerun')
+    check(db_ids() == [] and 'pending' not in archive.index()['2024-04'], 'rows deleted by the rerun')
+    print("Interrupted Run Verified.")
+
+
+def verify_reused_ids():
+    print("Verifying events that reuse the ids of archived rows are archived too...")
+    # Everything is archived now: SQLite hands out the ids of the deleted rows again
+    reused = add_events([datetime(2024, 4, 20, 12)])
+    check(reused[0] <= archive.index()['2024-04']['max_id'], f'id {reused[0]} reused')
+    with app.app_context():
+        archive_events(archive, datetime(2024, 5, 1))
+    check(archived_ids('2024-04')[-1] == reused[0] and archive.index()['2024-04']['count'] == 4, 'archived, not dropped')
+    print("Reused Ids Verified.")
+
+
+def verify_torn_tail_and_lost_index():
+    print("Verifying a torn member and a lost index.json...")
+    january = archived_ids('2024-01')
+    with open(archive.path('2024-01'), 'ab') as f:
+        f.write(b'\x1f\x8b\x08\x00garbage of an append that crashed')
+    check(archived_ids('2024-01') == january, 'reader stops before the torn member')
+
+    os.remove(os.path.join(archive.directory, 'index.json'))
+    rebuilt = archive.index()
+    check(rebuilt['2024-01']['count'] == 10 and rebuilt['2024-04']['count'] == 4, f'rebuilt index {rebuilt}')
+    check(rebuilt['2024-01']['size'] < os.path.getsize(archive.path('2024-01')), 'torn member not counted')
+
+    late = add_events([datetime(2024, 1, 28, 12)])
+    with app.app_context():
+        archive_events(archive, datetime(2024, 5, 1))
+    check(archived_ids('2024-01') == january + late, 'append after a rebuild keeps everything, drops the torn tail')
+    check(archive.index()['2024-01']['count'] == 11, 'count after the append')
+    print("Torn Tail Verified.")
+
+
+def verify_events_page():
+    print("Verifying the /events page reads an archived month...")
+    viewer = client('viewer')
+    page = viewer.get('/events?archive=2024-02').get_data(as_text=True)
+    check(all(f'event {n}' in page for n in range(5)), 'archived events listed')
+    r = viewer.get('/events?archive=1999-01', follow_redirects=True)
+    check('No archived events for 1999-01' in r.get_data(as_text=True), 'unknown month')
+    print("Events Page Verified.")
+
+
+if __name__ == "__main__":
+    verify_rotation()
+    verify_interrupted_run_is_not_duplicated()
+    verify_reused_ids()
+    verify_torn_tail_and_lost_index()
+    verify_events_page()
+    print("SUCCESS: All checks passed.")
@@ -0,0 +1,78 @@
+"""user-028: cascading fallback of a package and everything deployed that requires it."""
+from verify_support import app, check, client, create_release, create_target, deployment_status, set_deployments
+from models import db, PackageDeployment, PackageDeploymentStatus
+
+deployed, distributed = PackageDeploymentStatus.deployed, PackageDeploymentStatus.distributed
+
+
+def setup(name):
+    # web -> api -> db, report -> db; `report` is only distributed, `other` unrelated
+    release_id, ids = create_release(name, ['db', 'api', 'web', 'report', 'other'],
+                                     [('api', 'db'), ('web', 'api'), ('report', 'db')])
+    target_id = create_target(f'{name} PROD')
+    set_deployments(target_id, [ids['db'], ids['api'], ids['web'], ids['other']])
+    set_deployments(target_id, [ids['report']], distributed)
+    return ids, target_id
+
+
+def verify_dry_run():
+    print("Verifying the dry run lists the impact without changing anything...")
+    ids, target_id = setup('Cascade 1')
+    r = client('deployer').get(f"/package/{ids['db']}/fallback_cascade?target_id={target_id}")
+    page = r.get_data(as_text=True)
+    check(r.status_code == 200, f'dry run status {r.status_code}')
+    # Dependents first: web, api, then db itself
+    check(page.index('<td>web</td>') < page.index('<td>api</td>') < page.index('<td>db</td>'), 'rollback order web, api, db')
+    check('<td>report</td>' not in page and '<td>other</td>' not in page, 'not deployed / unrelated packages not listed')
+    check(deployment_status(ids['db'], target_id) == deployed, 'dry run changed nothing')
+    print("Dry Run Verified.")
+
+
+def verify_cascade():
+    print("Verifying the cascade reverts the package and its deployed dependents...")
+    ids, target_id = setup('Cascade 2')
+    r = client('deployer').post(f"/package/{ids['api']}/fallback_cascade", data={'target_id': target_id},
+                                follow_redirects=True)
+    check('2 packages reverted' in r.get_data(as_text=True), 'success message')
+    check(deployment_status(ids['api'], target_id) == distributed, 'api reverted')
+    check(deployment_status(ids['web'], target_id) == distributed, 'web (requires api) reverted')
+    check(deployment_status(ids['db'], target_id) == deployed, 'db (a dependency, not a dependent) kept')
+    check(deployment_status(ids['other'], target_id) == deployed, 'unrelated package kept')
+    print("Cascade Verified.")
+
+
+def verify_version_guard():
+    print("Verifying the confirmed versions guard the cascade...")
+    ids, target_id = setup('Cascade 3')
+    with app.app_context():
+        versions = {d.id: d.version for d in PackageDeployment.query.filter(
+            PackageDeployment.target_id == target_id,
+            PackageDeployment.package_id.in_([ids['api'], ids['web']]))}
+    url = f"/package/{ids['api']}/fallback_cascade"
+    deployer = client('deployer')
+
+    # A deployment changed after the preview: the stale versions no longer match
+    with app.app_context():
+        web = PackageDeployment.query.filter_by(package_id=ids['web'], target_id=target_id).one()
+        web.status = distributed
+        db.session.commit()
+        web.status = deployed
+        db.session.commit()
+    r = deployer.post(url, data={'target_id': target_id, 'versions': [f'{i}:{v}' for i, v in versions.items()]},
+                      follow_redirects=True)
+    check('aborted' in r.get_data(as_text=True), 'stale versions abort the cascade')
+    check(deployment_status(ids['api'], target_id) == deployed, 'nothing reverted on a stale preview')
+
+    # A tampered form is treated like a changed impact, not a server error
+    for value in ([f'{i}:abc' for i in versions], ['x:1']):
+        r = deployer.post(url, data={'target_id': target_id, 'versions': value})
+        check(r.status_code == 302 and 'fallback_cascade' in r.headers['Location'], f'{value}: back to the dry run')
+    check(deployment_status(ids['api'], target_id) == deployed, 'nothing reverted on a tampered form')
+    print("Version Guard Verified.")
+
+
+if __name__ == "__main__":
+    verify_dry_run()
+    verify_cascade()
+    verify_version_guard()
+    print("SUCCESS: All checks passed.")
@@ -0,0 +1,67 @@
+"""user-039: fan-out distribution fetches each artifact from Nexus once and relays it agent to agent."""
+from collections import Counter
+
+from verify_support import AgentResponse, AgentStub, check, client, create_release, create_target, deployment_status
+from models import PackageDeploymentStatus
+
+DIGEST = 'ab' * 32
+
+
+def agent_host(url):
+    return url.split('//', 1)[1].split('/', 1)[0]
+
+
+def verify_tree_distribution():
+    print("Verifying one Nexus download per package and relays from holders only...")
+    release_id, ids = create_release('Fanout 1', ['core', 'ui'])
+    targets = {n: create_target(f'FAN-{n}') for n in range(1, 8)}
+    stub = AgentStub(lambda url, payload: AgentResponse(body={'status': 'success', 'digest': DIGEST})).install()
+    r = client('deployer').post(f'/release/{release_id}/distribute_fanout', follow_redirects=True, data={
+        'target_ids': list(targets.values()), 'seed_target_id': targets[1], 'fanout': 2})
+    check('Distributed 14 package copies to 7 targets with 2 Nexus downloads.' in r.get_data(as_text=True), 'summary')
+
+    for name in ('core', 'ui'):
+        calls = [(agent_host(url), payload) for url, payload, _ in stub.calls if payload['package'] == name]
+        check(calls[0] == ('fan-1.invalid:5001', {'package': name, 'nexus_url': f'http://nexus.invalid/Fanout 1/{name}',
+                                                  'release': 'Fanout 1'}), f'seed fetches from Nexus: {calls[0]}')
+        holders = {calls[0][0]}
+        for receiver, payload in calls[1:]:
+            check(payload['checksum'] == DIGEST and payload['nexus_url'].endswith(f'/artifacts/{DIGEST}'), 'relay payload')
+            check(agent_host(payload['nexus_url']) in holders, f'{receiver} relayed from a holder')
+            holders.add(receiver)
+        check(len(calls) == 7 and len(holders) == 7, f'{name}: one call per target')
+        first_round = Counter(agent_host(p['nexus_url']) for _, p in calls[1:3])
+        check(first_round == {'fan-1.invalid:5001': 2}, f'the seed serves `fanout` receivers first: {first_round}')
+    check(all(deployment_status(ids['ui'], t) == PackageDeploymentStatus.distributed for t in targets.values()),
+          'distributed everywhere')
+    print("Tree Distribution Verified.")
+
+
+def verify_digest_mismatch_and_seed_without_store():
+    print("Verifying a wrong digest is rejected and a seed needs an artifact store...")
+    release_id, ids = create_release('Fanout 2', ['svc'])
+    seed, good, bad = create_target('FAN-SEED'), create_target('FAN-GOOD'), create_target('FAN-BAD')
+
+    def answer(url, payload):
+        return AgentResponse(body={'status': 'success', 'digest': '00' * 32 if 'fan-bad' in url else DIGEST})
+
+    AgentStub(answer).install()
+    r = client('deployer').post(f'/release/{release_id}/distribute_fanout', follow_redirects=True, data={
+        'target_ids': [seed, good, bad], 'seed_target_id': seed})
+    check('checksum mismatch' in r.get_data(as_text=True), 'mismatch reported')
+    check(deployment_status(ids['svc'], good) == PackageDeploymentStatus.distributed, 'good target distributed')
+    check(deployment_status(ids['svc'], bad) is None, 'mismatching target not marked distributed')
+
+    release_id, ids = create_release('Fanout 3', ['svc'])
+    AgentStub(lambda url, payload: AgentResponse(body={'status': 'success'})).install()
+    r = client('deployer').post(f'/release/{release_id}/distribute_fanout', follow_redirects=True,
+                                data={'target_ids': [seed, good]})
+    check('seed agent has no artifact store' in r.get_data(as_text=True), 'seed without --artifact-dir')
+    check(deployment_status(ids['svc'], good) is None, 'nothing relayed')
+    print("Digest Checks Verified.")
+
+
+if __name__ == "__main__":
+    verify_tree_distribution()
+    verify_digest_mismatch_and_seed_without_store()
+    print("SUCCESS: All checks passed.")
@@ -0,0 +1,77 @@
+"""user-038: agent commands carry an Idempotency-Key and agents run each key once."""
+from concurrent.futures import ThreadPoolExecutor
+
+from verify_support import AgentResponse, AgentStub, check, client, create_release, create_target, set_deployments
+from agent_server import build_parser, create_agent_app
+from models import PackageDeploymentStatus
+
+
+def agent(*flags):
+    app = create_agent_app('IDEMPOTENT', build_parser().parse_args(list(flags)))
+    return app, app.extensions['agent_state']
+
+
+def command(app, key, package='svc'):
+    return app.test_client().post('/deploy', json={'package': package, 'release': 'R'},
+                                  headers={'Idempotency-Key': key} if key else {})
+
+
+def verify_key_generations():
+    print("Verifying retries reuse the key and a redeploy after success gets a new one...")
+    _, ids = create_release('Keys 1', ['svc'])
+    target_id = create_target('Keys PROD')
+    set_deployments(target_id, [ids['svc']], PackageDeploymentStatus.distributed)
+    answers = iter([AgentResponse(504), AgentResponse(500), AgentResponse(), AgentResponse()])
+    stub = AgentStub(lambda url, payload: next(answers)).install()
+    deployer = client('deployer')
+    for _ in range(3):
+        deployer.post(f"/package/{ids['svc']}/deploy", data={'target_id': target_id})
+    set_deployments(target_id, [ids['svc']], PackageDeploymentStatus.distributed)
+    deployer.post(f"/package/{ids['svc']}/deploy", data={'target_id': target_id})
+    keys = [headers['Idempotency-Key'] for _, _, headers in stub.calls]
+    base = f"pkg{ids['svc']}.tgt{target_id}.deploy"
+    check(keys == [f'{base}.g0'] * 3 + [f'{base}.g1'], f'keys {keys}')
+    print("Key Generations Verified.")
+
+
+def verify_agent_replays_completed_commands():
+    print("Verifying the agent replays a completed command...")
+    app, state = agent()
+    first, second = command(app, 'k1'), command(app, 'k1')
+    check(first.status_code == second.status_code == 200 and second.data == first.data, 'same answer')
+    check(second.headers.get('Idempotent-Replayed') == 'true' and 'Idempotent-Replayed' not in first.headers, 'replay header')
+    check(len(state.history) == 1, f'ran once: {state.history}')
+    command(app, None), command(app, None)
+    check(len(state.history) == 3, 'commands without a key always run')
+
+    app, state = agent('--failure-rate', '1')
+    command(app, 'k2'), command(app, 'k2')
+    check(len(state.history) == 2, 'failures are not stored, the retry runs again')
+
+    app, state = agent('--idempotency-size', '1')
+    command(app, 'a'), command(app, 'b'), command(app, 'a')
+    check(len(state.history) == 3, 'oldest key forgotten beyond --idempotency-size')
+    print("Replay Verified.")
+
+
+def verify_concurrent_duplicates_wait():
+    print("Verifying a duplicate waits for the command in progress...")
+    app, state = agent('--latency-ms', '300')
+    with ThreadPoolExecutor(2) as pool:
+        responses = list(pool.map(lambda _: command(app, 'slow'), range(2)))
+    check([r.status_code for r in responses] == [200, 200], 'both answered')
+    check(sorted(r.headers.get('Idempotent-Replayed', '') for r in responses) == ['', 'true'], 'one ran, one replayed')
+    check(len(state.history) == 1, 'ran once')
+
+    app, state = agent('--latency-ms', '300', '--idempotency-wait', '0.05')
+    with ThreadPoolExecutor(2) as pool:
+        codes = sorted(r.status_code for r in pool.map(lambda _: command(app, 'slow'), range(2)))
+    check(codes == [200, 409], f'impatient duplicate gets 409: {codes}')
+    print("Concurrent Duplicates Verified.")
+
+
+if __name__ == "__main__":
+    verify_key_generations()
+    verify_agent_replays_completed_commands()
+    verify_concurrent_duplicates_wait()
+    print("SUCCESS: All checks passed.")
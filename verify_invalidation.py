@@ -0,0 +1,97 @@
+"""user-043: app factory, environment config and cross-worker cache invalidation."""
+import os
+import sqlite3
+from contextlib import closing
+
+from sqlalchemy import text
+
+from verify_support import WORK_DIR, app, check, client, create_release
+import app as orchestrator
+import invalidation
+from config import load_config, shared_secret_key
+from models import db
+from invalidation import DatabaseBackend, InvalidationBus
+
+APP_DB = os.environ['DATABASE_URL'][len('sqlite:///'):]
+
+
+def verify_bus_between_processes():
+    print("Verifying the bus notifies other processes, not the publisher...")
+    url = f"sqlite:///{os.path.join(WORK_DIR, 'bus.db')}"
+    worker_a, worker_b = InvalidationBus(), InvalidationBus()
+    calls = {'a': 0, 'b': 0}
+    worker_a.subscribe('graph', lambda: calls.__setitem__('a', calls['a'] + 1))
+    worker_b.subscribe('graph', lambda: calls.__setitem__('b', calls['b'] + 1))
+    worker_a.configure(DatabaseBackend.from_url(url))
+    worker_b.configure(DatabaseBackend.from_url(url), poll_seconds=3600)
+
+    worker_a.publish('graph')
+    worker_a.poll()
+    worker_b.poll(force=True)
+    check(calls == {'a': 0, 'b': 1}, f'after a publishes: {calls}')
+    worker_b.publish('graph')
+    worker_a.poll()
+    worker_b.poll()  # throttled by poll_seconds, but its own change needs no action anyway
+    check(calls == {'a': 1, 'b': 1}, f'after b publishes: {calls}')
+
+    # Both publish before either polls: each still hears about the other's change
+    worker_a.publish('graph')
+    worker_b.publish('graph')
+    worker_a.poll()
+    worker_b.poll(force=True)
+    check(calls == {'a': 2, 'b': 2}, f'interleaved publishes: {calls}')
+    print("Bus Verified.")
+
+
+def verify_graph_follows_other_workers():
+    print("Verifying a change committed by another worker reaches this worker's graph...")
+    _, ids = create_release('Workers 1', ['web', 'api'])
+    viewer = client('viewer')
+    url = f"/api/package/{ids['web']}/dependencies"
+    check(viewer.get(url).get_json()['requires'] == [], 'no dependency yet (graph loaded)')
+
+    # Another worker: writes through its own connection and publishes through the shared table
+    with closing(sqlite3.connect(APP_DB)) as conn, conn:
+        conn.execute('INSERT INTO package_dependencies (requirer_id, provider_id) VALUES (?, ?)', (ids['web'], ids['api']))
+    check(viewer.get(url).get_json()['requires'] == [], 'cached until published')
+    DatabaseBackend.from_url(os.environ['DATABASE_URL']).bump('dependency_graph')
+    check([p['name'] for p in viewer.get(url).get_json()['requires']] == ['api'], 'seen after the publish')
+    print("Cross-Worker Invalidation Verified.")
+
+
+def verify_bulk_import_publishes():
+    print("Verifying the bulk import publishes the graph change...")
+    release_id, _ = create_release('Workers 2', ['x', 'y'])
+    backend = invalidation.bus.backend
+    before = backend.versions(['dependency_graph'])['dependency_graph']
+    client('deployer').post(f'/api/release/{release_id}/dependencies', json={'edges': [['x', 'y']]})
+    check(backend.versions(['dependency_graph'])['dependency_graph'] == before + 1, 'version bumped')
+    print("Bulk Import Publish Verified.")
+
+
+def verify_config():
+    print("Verifying environment config and the single app per process...")
+    instance = os.path.join(WORK_DIR, 'instance')
+    key = shared_secret_key(instance)
+    check(len(key) == 64 and shared_secret_key(instance) == key, 'workers share the generated secret key')
+    config = load_config(instance, {'DATABASE_URL': 'sqlite:////tmp/other.db', 'SQLITE_WAL': '0', 'LEASE_TTL_SECONDS': '90'})
+    check(config['SQLALCHEMY_DATABASE_URI'] == 'sqlite:////tmp/other.db' and config['SQLITE_WAL'] is False
+          and config['LEASE_TTL_SECONDS'] == 90 and config['SECRET_KEY'] == key, 'values from the environment')
+    check(load_config(instance, {'SECRET_KEY': 's3cret'})['SECRET_KEY'] == 's3cret', 'explicit SECRET_KEY wins')
+    check(orchestrator.create_app() is app, 'later calls return the same app')
+    try:
+        orchestrator.create_app({'TESTING': False})
+        check(False, 'overrides accepted after the first call')
+    except RuntimeError:
+        pass
+    with app.app_context():
+        check(db.session.execute(text('PRAGMA journal_mode')).scalar() == 'wal', 'WAL mode')
+    print("Config Verified.")
+
+
+if __name__ == "__main__":
+    verify_bus_between_processes()
+    verify_graph_follows_other_workers()
+    verify_bulk_import_publishes()
+    verify_config()
+    print("SUCCESS: All checks passed.")
@@ -0,0 +1,111 @@
+"""user-042: target leases serialize operations per target; deployments are versioned."""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm.exc import StaleDataError
+
+from verify_support import AgentStub, app, check, client, create_release, create_target, deployment_status, set_deployments
+from leases import LeaseBusy, LeaseLost, acquire, acquire_all, current_leases, lease_owner
+from models import db, PackageDeployment, PackageDeploymentStatus, TargetLease
+
+
+def expire(target_id):
+    db.session.query(TargetLease).filter_by(target_id=target_id).update(
+        {'expires_at': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+
+def verify_lease_lifecycle():
+    print("Verifying acquire, busy, expiry takeover and release...")
+    target_id, other_id = create_target('Lease A'), create_target('Lease B')
+    with app.app_context():
+        first = acquire(target_id, lease_owner('alice'), 'deploy_all')
+        try:
+            acquire(target_id, lease_owner('bob'), 'fallback_all')
+            check(False, 'second lease granted')
+        except LeaseBusy as e:
+            check(e.lease.operation == 'deploy_all' and 'Lease A is busy' in str(e), f'busy: {e}')
+
+        expire(target_id)
+        second = acquire(target_id, lease_owner('bob'), 'fallback_all')
+        try:
+            first.heartbeat(force=True)
+            check(False, 'expired holder kept its lease')
+        except LeaseLost:
+            pass
+        second.heartbeat(force=True)
+        first.release()  # a stale token releases nothing
+        check(current_leases()[target_id].operation == 'fallback_all', 'taken over lease kept')
+        second.release()
+        check(target_id not in current_leases(), 'released')
+
+        # All or nothing: one busy target leaves no lease behind
+        blocker = acquire(other_id, lease_owner('carol'), 'distribute')
+        try:
+            acquire_all([target_id, other_id], lease_owner('dave'), 'deploy_all')
+            check(False, 'acquire_all with a busy target')
+        except LeaseBusy:
+            pass
+        check(set(current_leases()) == {other_id}, 'no partial lease set')
+
+        # Waiting serializes instead of rejecting
+        threading.Timer(0.3, lambda: app.app_context().push() or blocker.release()).start()
+        started = time.monotonic()
+        with acquire_all([other_id], lease_owner('dave'), 'deploy_all', wait=5):
+            check(time.monotonic() - started >= 0.25, 'waited for the holder')
+        check(current_leases() == {}, 'lease set released on exit')
+    print("Lease Lifecycle Verified.")
+
+
+def verify_routes_respect_leases():
+    print("Verifying bulk and single-package routes reject a leased target...")
+    release_id, ids = create_release('Leased 1', ['svc'])
+    target_id = create_target('Lease PROD')
+    set_deployments(target_id, [ids['svc']], PackageDeploymentStatus.distributed)
+    stub = AgentStub().install()
+    deployer, manager = client('deployer'), client('release_manager')
+    with app.app_context():
+        lease = acquire(target_id, lease_owner('other'), 'distribute_all')
+    r = deployer.post(f'/release/{release_id}/deploy_all', data={'target_id': target_id}, follow_redirects=True)
+    check('prevented' in r.get_data(as_text=True) and 'distribute_all' in r.get_data(as_text=True), 'deploy_all rejected')
+    r = deployer.post(f"/package/{ids['svc']}/deploy", data={'target_id': target_id}, follow_redirects=True)
+    check('Deployment prevented' in r.get_data(as_text=True), 'single deploy rejected')
+    check(stub.calls == [] and deployment_status(ids['svc'], target_id) == PackageDeploymentStatus.distributed,
+          'no agent call, nothing changed')
+    with app.app_context():
+        lease.release()
+    deployer.post(f"/package/{ids['svc']}/deploy", data={'target_id': target_id})
+    check(deployment_status(ids['svc'], target_id) == PackageDeploymentStatus.deployed, 'deployed once free')
+    with app.app_context():
+        check(current_leases() == {}, 'route released its lease')
+    check(manager.post(f'/release/{release_id}/fallback_all', data={'target_id': 'abc'}).status_code == 400,
+          'fallback_all rejects a malformed target_id')
+    print("Route Leases Verified.")
+
+
+def verify_versioned_deployments():
+    print("Verifying a concurrent change to a deployment is detected...")
+    _, ids = create_release('Leased 2', ['svc'])
+    target_id = create_target('Lease QA')
+    set_deployments(target_id, [ids['svc']])
+    with app.app_context():
+        stale = PackageDeployment.query.filter_by(package_id=ids['svc'], target_id=target_id).one()
+        version = stale.version
+        set_deployments(target_id, [ids['svc']], PackageDeploymentStatus.distributed)  # another session
+        stale.status = PackageDeploymentStatus.not_deployed
+        try:
+            db.session.commit()
+            check(False, 'stale update committed')
+        except StaleDataError:
+            db.session.rollback()
+        check(PackageDeployment.query.filter_by(package_id=ids['svc'], target_id=target_id).one().version == version + 1,
+              'version bumped by the other session only')
+    print("Versioned Deployments Verified.")
+
+
+if __name__ == "__main__":
+    verify_lease_lifecycle()
+    verify_routes_respect_leases()
+    verify_versioned_deployments()
+    print("SUCCESS: All checks passed.")
@@ -0,0 +1,61 @@
+"""user-030: Prometheus metrics for agent calls, request latency and status gauges."""
+from verify_support import AgentResponse, AgentStub, check, client, create_release, create_target, set_deployments
+from models import PackageDeploymentStatus
+
+distributed = PackageDeploymentStatus.distributed
+
+
+def metric_lines(name):
+    page = client('viewer').get('/metrics').get_data(as_text=True)
+    return [line for line in page.splitlines() if line.startswith(name)]
+
+
+def value(lines, *fragments):
+    matching = [line for line in lines if all(f in line for f in fragments)]
+    check(len(matching) == 1, f'one series matching {fragments}, got {matching}')
+    return float(matching[0].rsplit(' ', 1)[1])
+
+
+def verify_agent_call_metrics():
+    print("Verifying agent calls are counted by outcome...")
+    _, ids = create_release('Metrics 1', ['ok', 'bad'])
+    target_id = create_target('Metrics PROD', url='http://metrics-prod.invalid:5001')
+    set_deployments(target_id, ids.values(), distributed)
+    deployer = client('deployer')
+    AgentStub().install()
+    deployer.post(f"/package/{ids['ok']}/deploy", data={'target_id': target_id})
+    AgentStub(lambda url, payload: AgentResponse(500)).install()
+    deployer.post(f"/package/{ids['bad']}/deploy", data={'target_id': target_id})
+
+    target = 'target="http://metrics-prod.invalid:5001"'
+    calls = metric_lines('orchestrator_agent_calls_total{')
+    check(value(calls, target, 'endpoint="deploy"', 'result="success"') == 1, 'one successful deploy call')
+    check(value(calls, target, 'endpoint="deploy"', 'result="http_500"') == 1, 'one failed deploy call')
+    durations = metric_lines('orchestrator_agent_call_duration_seconds')
+    check(value(durations, '_count{', target, 'endpoint="deploy"') == 2, 'both calls timed')
+    check(value(durations, '_bucket{', target, 'le="+Inf"') == 2, '+Inf bucket holds every call')
+    print("Agent Call Metrics Verified.")
+
+
+def verify_request_metrics_and_gauges():
+    print("Verifying request latency, query counts and status gauges...")
+    viewer = client('viewer')
+    for _ in range(3):
+        viewer.get('/')
+    requests_seen = value(metric_lines('orchestrator_http_request_duration_seconds_count{'),
+                          'route="/"', 'method="GET"', 'status="200"')
+    check(requests_seen >= 3, f'/ requests timed: {requests_seen}')
+    check(value(metric_lines('orchestrator_http_request_db_queries_sum{'), 'route="/"') > 0,
+          'SQL statements counted per request')
+    check(any(line.startswith('orchestrator_package_deployments{status=') for line in
+              metric_lines('orchestrator_package_deployments')), 'package deployment gauge')
+    page = viewer.get('/metrics')
+    check(page.mimetype == 'text/plain', f'content type {page.mimetype}')
+    check('# TYPE orchestrator_agent_calls_total counter' in page.get_data(as_text=True), 'TYPE lines')
+    print("Request Metrics Verified.")
+
+
+if __name__ == "__main__":
+    verify_agent_call_metrics()
+    verify_request_metrics_and_gauges()
+    print("SUCCESS: All checks passed.")
@@ -0,0 +1,66 @@
+"""user-050: release packages are paged and filtered; card details come from the JSON endpoints."""
+import re
+
+from verify_support import app, check, client, create_release, create_target, set_deployments
+import app as orchestrator
+from models import db, Package, PackageDeploymentStatus, PackageStatus
+
+
+def card_ids(page):
+    return [int(i) for i in re.findall(r'data-package-id="(\d+)"', page)]
+
+
+def verify_paging_and_filters():
+    print("Verifying the package cards are paged and filtered...")
+    names = [f'pkg{n:03d}' for n in range(120)]
+    release_id, ids = create_release('Paging 1.0', names)
+    with app.app_context():
+        for name in names[:5]:
+            db.session.get(Package, ids[name]).status = PackageStatus.deployed
+        db.session.commit()
+    viewer = client('viewer')
+    size = orchestrator.PACKAGE_PAGE_SIZE
+
+    page = viewer.get(f'/release/{release_id}').get_data(as_text=True)
+    check(card_ids(page) == [ids[n] for n in names[:size]], 'first page in name order')
+    check(f'1-{size} of 120' in page and f'offset={size}' in page, 'range and next link')
+    page = viewer.get(f'/release/{release_id}?offset=100').get_data(as_text=True)
+    check(card_ids(page) == [ids[n] for n in names[100:]], 'last page')
+
+    page = viewer.get(f'/release/{release_id}?status=deployed').get_data(as_text=True)
+    check(card_ids(page) == [ids[n] for n in names[:5]], 'status filter')
+    page = viewer.get(f'/release/{release_id}?q=pkg11').get_data(as_text=True)
+    check(card_ids(page) == [ids[n] for n in names[110:120]], 'name filter')
+    page = viewer.get(f'/release/{release_id}?status=bogus&q=zzz').get_data(as_text=True)
+    check(not card_ids(page) and 'No packages match the filter.' in page, 'unknown status ignored, nothing matches')
+    print("Paging Verified.")
+
+
+def verify_card_endpoints():
+    print("Verifying the card badges and dependency options...")
+    release_id, ids = create_release('Paging 2.0', ['api', 'db', 'web'], [('api', 'db')])
+    _, other = create_release('Paging 3.0', ['elsewhere'])
+    prod_id, qa_id = create_target('Paging PROD'), create_target('Paging QA')
+    set_deployments(prod_id, [ids['api'], ids['db'], other['elsewhere']])
+    set_deployments(qa_id, [ids['api']], PackageDeploymentStatus.distributed)
+    viewer = client('viewer')
+
+    r = viewer.get(f"/api/release/{release_id}/deployments?package_ids={ids['api']},{ids['web']},{other['elsewhere']}")
+    deployments = r.get_json()['deployments']
+    check([(d['target'], d['status']) for d in deployments[str(ids['api'])]] ==
+          [('Paging PROD', 'deployed'), ('Paging QA', 'distributed')], f'api badges {deployments}')
+    check(deployments[str(ids['web'])] == [] and deployments[str(other['elsewhere'])] == [], 'other releases not leaked')
+    check(viewer.get(f'/api/release/{release_id}/deployments?package_ids=1,x').status_code == 400, 'bad ids rejected')
+
+    options = viewer.get(f"/api/package/{ids['api']}/dependency_options").get_json()
+    check([d['name'] for d in options['dependencies']] == ['db'], f'dependencies {options}')
+    check([c['name'] for c in options['candidates']] == ['web'], 'candidates: same release, not self or existing')
+    page = viewer.get(f'/release/{release_id}').get_data(as_text=True)
+    check('Paging PROD: 2<' in page and 'Paging QA:' not in page, 'deployed count per target')
+    print("Card Endpoints Verified.")
+
+
+if __name__ == "__main__":
+    verify_paging_and_filters()
+    verify_card_endpoints()
+    print("SUCCESS: All checks passed.")
@@ -0,0 +1,56 @@
+"""user-031: opt-in SQL profiler with debug headers and a slow-request log."""
+import atexit
+import json
+import os
+import shutil
+import tempfile
+
+# The profiler is configured at startup: enable it before verify_support creates the app
+LOG_DIR = tempfile.mkdtemp(prefix='verify-profiler-')
+atexit.register(shutil.rmtree, LOG_DIR, ignore_errors=True)
+LOG_FILE = os.path.join(LOG_DIR, 'slow.log')
+os.environ.update(SQL_PROFILER='1', SQL_PROFILER_HEADERS='1', SQL_PROFILER_SLOW_SECONDS='60',
+                  SQL_PROFILER_LOG=LOG_FILE)
+
+from verify_support import check, client, create_release  # noqa: E402
+from profiler import summarize  # noqa: E402
+
+
+def verify_summary():
+    print("Verifying the per-request summary...")
+    profile = {'SELECT a': [6, 0.006], 'SELECT b': [1, 0.010], 'UPDATE c': [2, 0.001]}
+    report = summarize(profile, n_plus_one_threshold=5)
+    check(report['queries'] == 9 and report['distinct_statements'] == 3, f'counts {report}')
+    check(report['db_ms'] == 17.0, f"db_ms {report['db_ms']}")
+    check([s['statement'] for s in report['top_statements']] == ['SELECT b', 'SELECT a', 'UPDATE c'],
+          'top statements by time')
+    check([s['statement'] for s in report['n_plus_one_suspects']] == ['SELECT a'], 'N+1 suspect')
+    print("Summary Verified.")
+
+
+def verify_headers_and_log():
+    print("Verifying debug headers and the N+1 log...")
+    for n in range(6):
+        create_release(f'Profiled {n}', ['pkg'])
+    r = client('viewer').get('/')
+    queries = int(r.headers['X-SQL-Queries'])
+    check(queries > 0, f'X-SQL-Queries {queries}')
+    check(float(r.headers['X-SQL-Time-ms']) >= 0, 'X-SQL-Time-ms')
+    check(r.headers['Server-Timing'].startswith('db;dur=') and f'"{queries} queries"' in r.headers['Server-Timing'],
+          f"Server-Timing {r.headers['Server-Timing']}")
+
+    # One query per release on the index: the repeated statement is an N+1 suspect
+    check(int(r.headers['X-SQL-N-Plus-One']) >= 1, f"X-SQL-N-Plus-One {r.headers['X-SQL-N-Plus-One']}")
+    with open(LOG_FILE) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    index_records = [record for record in records if record['path'] == '/']
+    # Not slow (threshold 60s), logged for its suspects only
+    check(len(index_records) == 1 and index_records[0]['event'] == 'n_plus_one', f'log {index_records}')
+    check(index_records[0]['queries'] == queries and index_records[0]['n_plus_one_suspects'], 'record has the report')
+    print("Headers and Log Verified.")
+
+
+if __name__ == "__main__":
+    verify_summary()
+    verify_headers_and_log()
+    print("SUCCESS: All checks passed.")
@@ -0,0 +1,75 @@
+"""user-048: drift between agent histories and the database, reported and corrected under the target lease."""
+from datetime import datetime
+
+from verify_support import AgentProcess, app, check, client, create_release, create_target, deployment_status, free_port, set_deployments
+import reconcile
+from models import db, EventLog, PackageDeploymentStatus, TargetLease
+
+deployed, distributed = PackageDeploymentStatus.deployed, PackageDeploymentStatus.distributed
+
+
+def agent_url(target):
+    return target.url
+
+
+def verify_report_and_fix():
+    print("Verifying drift is found in paged histories and corrected...")
+    with AgentProcess() as agent:
+        _, ids = create_release('R1', ['lost', 'gone', 'fine'])  # AgentProcess commands use release R1
+        target_id = create_target('Reconcile PROD', url=agent.url)
+        offline_id = create_target('Reconcile DOWN', url=f'http://127.0.0.1:{free_port()}')
+        set_deployments(target_id, [ids['lost'], ids['fine']], distributed)
+        set_deployments(target_id, [ids['gone']])
+        # The agent deployed `lost` but the reply never reached the DB; `gone` is not in its history
+        for endpoint, package in (('distribute', 'fine'), ('distribute', 'lost'), ('deploy', 'lost'), ('distribute', 'stray')):
+            check(agent.command(endpoint, package).status_code == 200, f'{endpoint} {package}')
+
+        with app.app_context():
+            report = reconcile.reconcile(agent_url, budget=10, page_size=2)
+        check(report['complete'] == 1 and report['records'] == 4, f"histories {report['complete']} / {report['records']}")
+        check([i['target_id'] for i in report['incomplete']] == [offline_id], f"incomplete {report['incomplete']}")
+        check(report['counts'] == {'db_behind': 1, 'unconfirmed': 1, 'unknown': 1}, f"counts {report['counts']}")
+        kinds = {e['kind']: e for e in report['drift']}
+        check(kinds['db_behind']['package'] == 'lost' and kinds['db_behind']['agent_status'] == 'deployed', 'lost deploy')
+        check(kinds['unconfirmed']['package'] == 'gone', 'unconfirmed deployment')
+        check(kinds['unknown']['package'] == 'stray', 'unknown package')
+
+        r = client('admin').post('/targets/reconcile', data={'fix': '1'})
+        check('Corrected 1 deployments' in r.get_data(as_text=True), 'fix through the page')
+    check(deployment_status(ids['lost'], target_id) == deployed, 'lost deploy corrected')
+    check(deployment_status(ids['gone'], target_id) == deployed, 'unconfirmed is only reported')
+    with app.app_context():
+        check(EventLog.query.filter_by(operation='reconcile').count() == 1, 'correction logged')
+    print("Report And Fix Verified.")
+
+
+def verify_failed_correction_is_rolled_back():
+    print("Verifying a failing correction leaves nothing behind...")
+    _, ids = create_release('Reconcile 2.0', ['first'])
+    target_id = create_target('Reconcile QA')
+    set_deployments(target_id, [ids['first']], distributed)
+    now = datetime.utcnow()
+    entry = dict(kind='db_behind', target_id=target_id, target='Reconcile QA', agent_status='deployed', agent_at=now)
+    # The second package does not exist: the correction fails after changing the first row
+    drift = [dict(entry, package_id=ids['first']), dict(entry, package_id=ids['first'] + 1000)]
+    with app.app_context():
+        try:
+            reconcile.apply_corrections(drift, 'verify')
+            check(False, 'the correction should fail')
+        except AttributeError:
+            pass
+        check(db.session.get(TargetLease, target_id) is None, 'lease released')
+    check(deployment_status(ids['first'], target_id) == distributed, 'partial correction rolled back')
+
+    with app.app_context():
+        result = reconcile.apply_corrections(drift[:1], 'verify')
+    check(result['corrected'] == 1 and deployment_status(ids['first'], target_id) == deployed, 'valid entry applied')
+    with app.app_context():
+        check(reconcile.apply_corrections(drift[:1], 'verify')['skipped'] == 1, 'a row changed since the report is skipped')
+    print("Rollback Verified.")
+
+
+if __name__ == "__main__":
+    verify_report_and_fix()
+    verify_failed_correction_is_rolled_back()
+    print("SUCCESS: All checks passed.")
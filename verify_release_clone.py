@@ -0,0 +1,63 @@
+"""user-046: cloning a release copies its packages and internal dependencies in bulk."""
+from verify_support import app, check, client, create_release, create_target, set_deployments
+from dependency_graph import dependency_graph
+from models import db, Package, PackageStatus, Release
+
+
+def packages_by_name(release_id):
+    with app.app_context():
+        return {p.name: p for p in Package.query.filter_by(release_id=release_id)}
+
+
+def verify_clone():
+    print("Verifying the clone copies packages and dependency edges...")
+    _, external = create_release('Clone Base', ['runtime'])
+    release_id, ids = create_release('Clone 1.0', ['db', 'api', 'web'], [('api', 'db'), ('web', 'api'), ('web', 'db')])
+    create_release('Clone Noise', ['noise'])  # interleaves package ids with the source's
+    with app.app_context():
+        source = db.session.get(Release, release_id)
+        api = db.session.get(Package, ids['api'])
+        api.status = PackageStatus.deployed
+        api.dependencies.append(db.session.get(Package, external['runtime']))
+        db.session.add(Package(name='late', url='http://nexus.invalid/late', release_id=release_id))
+        source.description = 'Quarterly'
+        db.session.commit()
+    set_deployments(create_target('Clone PROD'), ids.values())
+
+    r = client('release_manager').post(f'/release/{release_id}/clone', data={'name': 'Clone 1.1'}, follow_redirects=True)
+    check('with 4 packages and 3 dependencies' in r.get_data(as_text=True), 'counts in the message')
+    with app.app_context():
+        clone = Release.query.filter_by(name='Clone 1.1').one()
+        check(clone.description == 'Quarterly', 'description copied by default')
+        clone_id = clone.id
+    copies = packages_by_name(clone_id)
+    check(sorted(copies) == ['api', 'db', 'late', 'web'], f'packages {sorted(copies)}')
+    check({p.status for p in copies.values()} == {PackageStatus.registered}, 'statuses reset to registered')
+    check(not set(p.id for p in copies.values()) & set(ids.values()), 'new package rows')
+    with app.app_context():
+        edges = {(copies[n].name, {p.id: p.name for p in copies.values()}.get(d))
+                 for n in copies for d in dependency_graph.dependencies_of(copies[n].id)}
+        check(edges == {('api', 'db'), ('web', 'api'), ('web', 'db')}, f'edges between the copies {edges}')
+        check(not db.session.get(Package, copies['api'].id).deployments, 'deployments not copied')
+    print("Clone Verified.")
+
+
+def verify_clone_validation():
+    print("Verifying clone names are validated...")
+    release_id, _ = create_release('Clone 2.0', ['solo'])
+    manager = client('release_manager')
+    r = manager.post(f'/release/{release_id}/clone', data={'name': 'Clone 2.0'}, follow_redirects=True)
+    check('already exists' in r.get_data(as_text=True), 'duplicate name rejected')
+    r = manager.post(f'/release/{release_id}/clone', data={'name': '  '}, follow_redirects=True)
+    check('name for the new release is required' in r.get_data(as_text=True), 'blank name rejected')
+    check(client('deployer').post(f'/release/{release_id}/clone', data={'name': 'Clone 2.1'}).status_code in (302, 403),
+          'deployers may not clone')
+    with app.app_context():
+        check(Release.query.filter_by(name='Clone 2.1').first() is None, 'no release created by a deployer')
+    print("Validation Verified.")
+
+
+if __name__ == "__main__":
+    verify_clone()
+    verify_clone_validation()
+    print("SUCCESS: All checks passed.")
@@ -0,0 +1,85 @@
+"""user-041: schedule conflicts answered from a per-target interval index (treap)."""
+import random
+from datetime import date, timedelta
+
+from verify_support import app, check, client, create_release, create_target
+from models import ScheduledDeployment
+from schedule_index import ScheduleIndex, schedule_index
+
+DAY = timedelta(days=1)
+
+
+def conflict_count(target_id, start, end):
+    r = client('viewer').get(f'/api/schedule_conflicts?target_id={target_id}&start={start}&end={end}')
+    check(r.status_code == 200, f'conflicts status {r.status_code}')
+    return r.get_json()['count']
+
+
+def add_schedule(release_id, target_id, start, end):
+    r = client('release_manager').post(f'/release/{release_id}/schedule', follow_redirects=True, data={
+        'target_id': str(target_id), 'start_date': start.isoformat(), 'end_date': end.isoformat()})
+    return r.get_data(as_text=True)
+
+
+def verify_route_keeps_index_current():
+    print("Verifying schedules added through the route show up as conflicts without a reload...")
+    release_a, _ = create_release('Window A', ['svc'])
+    release_b, _ = create_release('Window B', ['svc'])
+    target_id, other_target_id = create_target('Conflict PROD'), create_target('Conflict QA')
+    start = date.today() + 10 * DAY
+    check(conflict_count(target_id, start, start + 30 * DAY) == 0, 'no conflicts yet')  # loads the index
+    loaded = schedule_index._roots
+
+    check('Schedule added.' in add_schedule(release_a, target_id, start, start + 5 * DAY), 'first window added')
+    page = add_schedule(release_b, target_id, start + 3 * DAY, start + 8 * DAY)
+    check('overlaps on Conflict PROD with: Window A' in page, 'overlap warning')
+    check('Schedule added.' in add_schedule(release_b, other_target_id, start, start + 5 * DAY), 'other target unaffected')
+    check(schedule_index._roots is loaded, 'index updated in place, not reloaded')
+    check(conflict_count(target_id, start, start + 30 * DAY) == 1, 'one conflict on the target')
+    body = client('viewer').get(f'/api/schedule_conflicts?target_id={target_id}&start={start}&end={start + 30 * DAY}').get_json()
+    conflict = body['conflicts'][0]
+    check((conflict['overlap_start'], conflict['overlap_end']) == ((start + 3 * DAY).isoformat(), (start + 5 * DAY).isoformat()),
+          f'overlap {conflict}')
+
+    with app.app_context():
+        first = ScheduledDeployment.query.filter_by(release_id=release_a, target_id=target_id).one().id
+    client('release_manager').post(f'/schedule/{first}/delete')
+    check(conflict_count(target_id, start, start + 30 * DAY) == 0, 'conflict gone with the deleted window')
+
+    page = add_schedule(release_a, 'abc', start, start)
+    check('Unknown target abc' in page, 'non-numeric target rejected')
+    print("Route Sync Verified.")
+
+
+def verify_treap_against_brute_force():
+    print("Verifying interval queries against a linear scan...")
+    rng = random.Random(41)
+    index = ScheduleIndex()
+    index._roots = {}
+    windows = {}
+    base = date(2026, 1, 1)
+    for schedule_id in range(1, 400):
+        start = base + rng.randrange(300) * DAY
+        windows[schedule_id] = (start, start + rng.randrange(20) * DAY)
+        index.add(7, *windows[schedule_id], schedule_id)
+    for schedule_id in rng.sample(sorted(windows), 100):
+        index.remove(7, windows.pop(schedule_id)[0], schedule_id)
+    for _ in range(200):
+        start = base + rng.randrange(320) * DAY
+        end = start + rng.randrange(15) * DAY
+        # Ordered by start date, then schedule id
+        expected = sorted(((s, e, i) for i, (s, e) in windows.items() if s <= end and e >= start),
+                          key=lambda w: (w[0], w[2]))
+        check(index.overlapping(7, start, end) == expected, f'overlapping {start}..{end}')
+    start, end = base, base + 320 * DAY
+    expected = {(a, b) for a in windows for b in windows if a != b
+                and (windows[a][0], a) < (windows[b][0], b) and windows[b][0] <= windows[a][1]}
+    check({tuple(sorted(p[3:], key=lambda i: (windows[i][0], i))) for p in index.conflicts(start, end)} == expected,
+          'conflicting pairs')
+    print("Treap Verified.")
+
+
+if __name__ == "__main__":
+    verify_route_keeps_index_current()
+    verify_treap_against_brute_force()
+    print("SUCCESS: All checks passed.")
@@ -0,0 +1,114 @@
+"""user-040: the executor runs scheduled deployment windows when they open."""
+import time
+from datetime import date, datetime, timedelta
+
+from verify_support import AgentStub, app, check, client, create_release, create_target, deployment_status
+from leases import acquire, lease_owner
+from models import db, EventLog, PackageDeploymentStatus, ScheduledDeployment, ScheduleRun, TargetStatus
+from schedule_executor import schedule_executor, window_bounds
+
+
+def add_schedule(release_id, target_id, start, end):
+    client('release_manager').post(f'/release/{release_id}/schedule', data={
+        'target_id': target_id, 'start_date': start.isoformat(), 'end_date': end.isoformat()})
+    with app.app_context():
+        return ScheduledDeployment.query.filter_by(release_id=release_id, target_id=target_id).one().id
+
+
+def runs(schedule_id):
+    with app.app_context():
+        return [(r.outcome, r.distributed, r.deployed) for r in ScheduleRun.query.filter_by(schedule_id=schedule_id)]
+
+
+def schedule_events(release_name):
+    with app.app_context():
+        events = EventLog.query.filter(EventLog.operation == 'schedule_run', EventLog.description.contains(release_name))
+        return [e.description for e in events.order_by(EventLog.id)]
+
+
+def verify_window_runs():
+    print("Verifying a due window is queued on commit and run once...")
+    release_id, ids = create_release('Sched 1', ['core', 'app'], [('app', 'core')])
+    target_id = create_target('Sched PROD')
+    schedule_id = add_schedule(release_id, target_id, date.today(), date.today() + timedelta(days=1))
+    opens_at = datetime.combine(date.today(), datetime.min.time())
+    check((opens_at, schedule_id, False) in schedule_executor.pending(), 'queued when the schedule was committed')
+
+    stub = AgentStub().install()
+    schedule_executor.run_due(schedule_id)
+    check(runs(schedule_id) == [('success', 2, 2)], f'runs {runs(schedule_id)}')
+    check(all(deployment_status(i, target_id) == PackageDeploymentStatus.deployed for i in ids.values()), 'deployed')
+    check([p['package'] for _, p, _ in stub.calls] == ['core', 'app', 'core', 'app'], 'dependency order')
+    correlation_ids = {headers['X-Correlation-ID'] for _, _, headers in stub.calls}
+    check(len(correlation_ids) == 1, f'one correlation ID for the whole run: {correlation_ids}')
+    schedule_executor.run_due(schedule_id)
+    check(len(runs(schedule_id)) == 1 and len(stub.calls) == 4, 'a window runs only once')
+    print("Window Run Verified.")
+
+
+def verify_missed_and_locked_windows():
+    print("Verifying missed windows and windows of a locked target...")
+    release_id, _ = create_release('Sched 2', ['svc'])
+    target_id = create_target('Sched QA')
+    past = add_schedule(release_id, target_id, date.today() - timedelta(days=3), date.today() - timedelta(days=2))
+    schedule_executor.run_due(past)
+    check([outcome for outcome, _, _ in runs(past)] == ['missed'], 'window ended before it could run')
+
+    locked = create_target('Sched LOCKED', status=TargetStatus.locked)
+    schedule_id = add_schedule(release_id, locked, date.today(), date.today())
+    before = time.time()
+    schedule_executor.run_due(schedule_id)
+    schedule_executor.run_due(schedule_id, retry=True)
+    retries = [due for due, sid, retry in schedule_executor.pending() if sid == schedule_id and retry]
+    check(len(retries) == 2 and all(due.timestamp() > before for due in retries), 'retried later')
+    check(runs(schedule_id) == [], 'no run recorded while locked')
+    waiting = [e for e in schedule_events('Sched 2') if 'waiting' in e]
+    check(len(waiting) == 1 and 'LOCKED' in waiting[0], f'the wait is logged once: {waiting}')
+    print("Missed and Locked Windows Verified.")
+
+
+def verify_busy_target_waits():
+    print("Verifying a window waits for a target leased by another operation...")
+    release_id, _ = create_release('Sched 3', ['svc'])
+    target_id = create_target('Sched STAGE')
+    schedule_id = add_schedule(release_id, target_id, date.today(), date.today())
+    with app.app_context():
+        # The same window being run by another worker's executor is not worth an event
+        lease = acquire(target_id, lease_owner('other-worker'), f'scheduled_deployment #{schedule_id}')
+        schedule_executor.run_due(schedule_id)
+        check(schedule_events('Sched 3') == [], 'no wait logged for the same window')
+        lease.release()
+        lease = acquire(target_id, lease_owner('someone'), 'deploy_all')
+        schedule_executor.run_due(schedule_id)
+        lease.release()
+    waiting = schedule_events('Sched 3')
+    check(len(waiting) == 1 and 'deploy_all' in waiting[0], f'wait for another operation logged: {waiting}')
+    check(runs(schedule_id) == [], 'not run while busy')
+    print("Busy Target Verified.")
+
+
+def verify_background_thread():
+    print("Verifying the background thread runs a window that opens...")
+    AgentStub().install()
+    release_id, _ = create_release('Sched 4', ['svc'])
+    target_id = create_target('Sched DEV')
+    schedule_executor.start()
+    try:
+        schedule_id = add_schedule(release_id, target_id, date.today(), date.today())
+        deadline = time.time() + 10
+        while not runs(schedule_id) and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        schedule_executor.stop()
+    check(runs(schedule_id) == [('success', 1, 1)], f'run by the thread: {runs(schedule_id)}')
+    with app.app_context():
+        check(window_bounds(db.session.get(ScheduledDeployment, schedule_id))[1].date() == date.today(), 'window bounds')
+    print("Background Thread Verified.")
+
+
+if __name__ == "__main__":
+    verify_window_runs()
+    verify_missed_and_locked_windows()
+    verify_busy_target_waits()
+    verify_background_thread()
+    print("SUCCESS: All checks passed.")
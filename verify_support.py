@@ -0,0 +1,172 @@
+"""
+Shared setup of the self-contained verify scripts.
+
+Unlike the older verify_*.py scripts, which drive a server running on :5000, these import the
+app on a throwaway SQLite database and go through the Flask test client, so they need nothing
+running and leave no data behind:
+
+    python verify_dependency_graph.py
+
+Importing this module creates the database with the usual four users; agent calls
+(requests.post in app.py) are answered in-process by AgentStub.
+"""
+import atexit
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+AGENT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'agent_server.py')
+WORK_DIR = tempfile.mkdtemp(prefix='verify-')
+atexit.register(shutil.rmtree, WORK_DIR, ignore_errors=True)
+os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(WORK_DIR, "verify.db")}'
+os.environ['SCHEDULER_ENABLED'] = '0'
+os.environ['EVENT_ARCHIVE_DIR'] = os.path.join(WORK_DIR, 'event_archive')
+
+import requests  # noqa: E402
+
+import app as orchestrator  # noqa: E402  (reads the environment above)
+from models import db, DeploymentTarget, Package, PackageDeployment, PackageDeploymentStatus, Release, Role, TargetStatus, User  # noqa: E402
+
+app = orchestrator.create_app({'TESTING': True})
+HTTP_POST = requests.post  # before any AgentStub replaces it
+
+USERS = {'admin': ('admin_user', Role.admin), 'release_manager': ('rel_mgr', Role.release_manager),
+         'deployer': ('deployer_user', Role.deployer), 'viewer': ('view_only', Role.viewer)}
+
+with app.app_context():
+    for username, role in USERS.values():
+        db.session.add(User(username=username, role=role))
+    db.session.commit()
+
+
+def check(condition, message):
+    if not condition:
+        print(f'FAILED: {message}')
+        sys.exit(1)
+
+
+def client(as_user='admin'):
+    """Test client logged in (through /login, like a browser) as one of USERS."""
+    test_client = app.test_client()
+    with app.app_context():
+        user_id = User.query.filter_by(username=USERS[as_user][0]).one().id
+    test_client.post('/login', data={'user_id': user_id})
+    return test_client
+
+
+def create_release(name, package_names=(), dependencies=()):
+    """Release with packages and (requirer, provider) dependencies by name; returns (release id, {name: package id})."""
+    with app.app_context():
+        release = Release(name=name)
+        db.session.add(release)
+        db.session.flush()
+        packages = {n: Package(name=n, url=f'http://nexus.invalid/{name}/{n}', release_id=release.id) for n in package_names}
+        db.session.add_all(packages.values())
+        db.session.flush()
+        for requirer, provider in dependencies:
+            packages[requirer].dependencies.append(packages[provider])
+        db.session.commit()
+        return release.id, {n: p.id for n, p in packages.items()}
+
+
+def create_target(name, url=None, status=TargetStatus.available):
+    with app.app_context():
+        target = DeploymentTarget(name=name, url=url or f'http://{name.lower()}.invalid:5001', status=status)
+        db.session.add(target)
+        db.session.commit()
+        return target.id
+
+
+def set_deployments(target_id, package_ids, status=PackageDeploymentStatus.deployed):
+    """Put packages into `status` on a target directly (no agent involved)."""
+    with app.app_context():
+        for package_id in package_ids:
+            deployment = PackageDeployment.query.filter_by(package_id=package_id, target_id=target_id).first()
+            if deployment is None:
+                deployment = PackageDeployment(package_id=package_id, target_id=target_id)
+                db.session.add(deployment)
+            deployment.status = status
+        db.session.commit()
+
+
+def deployment_status(package_id, target_id):
+    with app.app_context():
+        deployment = PackageDeployment.query.filter_by(package_id=package_id, target_id=target_id).first()
+        return deployment.status if deployment else None
+
+
+class AgentResponse:
+    def __init__(self, status_code=200, body=None, headers=None):
+        self.status_code = status_code
+        self._body = body
+        self.headers = dict(headers or {})
+        if body is not None:
+            self.headers.setdefault('Content-Type', 'application/json')
+
+    def json(self):
+        return self._body
+
+
+class AgentStub:
+    """
+    Stands in for requests.post in app.py. Records (url, payload, headers) of every call and
+    answers with `answer(url, payload)` if given, else HTTP 200.
+    """
+
+    def __init__(self, answer=None):
+        self.calls = []
+        self.answer = answer
+
+    def __call__(self, url, json=None, headers=None, timeout=None):
+        self.calls.append((url, json, dict(headers or {})))
+        return self.answer(url, json) if self.answer else AgentResponse()
+
+    def install(self):
+        orchestrator.requests.post = self
+        return self
+
+    @staticmethod
+    def uninstall():
+        """Let agent calls go out over HTTP again (to an AgentProcess)."""
+        orchestrator.requests.post = HTTP_POST
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class AgentProcess:
+    """agent_server.py in a subprocess with the given simulation flags."""
+
+    def __init__(self, *flags, name='SIM'):
+        self.url = f'http://127.0.0.1:{free_port()}'
+        self.process = subprocess.Popen([sys.executable, AGENT_SCRIPT, '--port', self.url.rsplit(':', 1)[1],
+                                         '--name', name, *flags],
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def __enter__(self):
+        deadline = time.time() + 15
+        while time.time() < deadline:
+            try:
+                requests.get(self.url, timeout=1)
+                return self
+            except requests.exceptions.ConnectionError:
+                time.sleep(0.1)
+        self.__exit__()
+        check(False, 'agent did not come up')
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait()
+
+    def command(self, endpoint, package='pkg'):
+        return HTTP_POST(f'{self.url}/{endpoint}', json={'package': package, 'release': 'R1'}, timeout=10)
+
+    def history(self):
+        return requests.get(f'{self.url}/history', timeout=10).json()
@@ -0,0 +1,89 @@
+"""user-035: correlation IDs reach the agents and both sides export spans of one trace."""
+import atexit
+import json
+import os
+import shutil
+import tempfile
+
+# The exporter is configured at startup: set the file before verify_support creates the app
+TRACE_DIR = tempfile.mkdtemp(prefix='verify-tracing-')
+atexit.register(shutil.rmtree, TRACE_DIR, ignore_errors=True)
+TRACE_FILE = os.path.join(TRACE_DIR, 'orchestrator.jsonl')
+os.environ['TRACE_EXPORT_FILE'] = TRACE_FILE
+
+from verify_support import AgentProcess, AgentStub, app, check, client, create_release, create_target, set_deployments  # noqa: E402
+from models import PackageDeploymentStatus  # noqa: E402
+import tracing  # noqa: E402
+
+CORRELATION_ID = '0af7651916cd43dd8448eb211c80319c'
+
+
+def exported_spans(path, trace_id):
+    spans = []
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                for resource in json.loads(line)['resourceSpans']:
+                    for scope in resource['scopeSpans']:
+                        spans += [s for s in scope['spans'] if s['traceId'] == trace_id]
+    return spans
+
+
+def verify_headers_reach_the_agent():
+    print("Verifying the correlation ID is reused and forwarded to the agent...")
+    _, ids = create_release('Trace 1', ['svc'])
+    target_id = create_target('Trace PROD')
+    set_deployments(target_id, [ids['svc']], PackageDeploymentStatus.distributed)
+    stub = AgentStub().install()
+    r = client('deployer').post(f"/package/{ids['svc']}/deploy", data={'target_id': target_id},
+                                headers={'X-Correlation-ID': CORRELATION_ID})
+    check(r.headers['X-Correlation-ID'] == CORRELATION_ID, 'incoming correlation ID reused')
+    headers = stub.calls[0][2]
+    check(headers['X-Correlation-ID'] == CORRELATION_ID, 'forwarded as X-Correlation-ID')
+    version, trace_id, parent_span_id, flags = headers['traceparent'].split('-')
+    check(trace_id == CORRELATION_ID and len(parent_span_id) == 16, f"traceparent {headers['traceparent']}")
+
+    spans = {s['spanId']: s for s in exported_spans(TRACE_FILE, CORRELATION_ID)}
+    agent_span = spans.get(parent_span_id)
+    check(agent_span is not None and agent_span['name'] == 'agent.deploy', 'agent call exported as the parent span')
+    root = [s for s in spans.values() if 'parentSpanId' not in s]
+    check(len(root) == 1 and root[0]['name'] == 'POST /package/<int:package_id>/deploy', f'root span {root}')
+
+    other = client('viewer').get('/', headers={'X-Correlation-ID': 'not-a-trace-id'}).headers['X-Correlation-ID']
+    check(other != 'not-a-trace-id' and len(other) == 32, 'malformed IDs are replaced')
+    print("Header Propagation Verified.")
+
+
+def verify_agent_records_the_id():
+    print("Verifying the agent logs the correlation ID in its history...")
+    _, ids = create_release('Trace 2', ['svc'])
+    AgentStub.uninstall()
+    with AgentProcess(name='TRACE-AGENT') as agent:
+        target_id = create_target('Trace QA', url=agent.url)
+        set_deployments(target_id, [ids['svc']], PackageDeploymentStatus.distributed)
+        r = client('deployer').post(f"/package/{ids['svc']}/deploy", data={'target_id': target_id})
+        history = agent.history()
+    check([h['correlation_id'] for h in history] == [r.headers['X-Correlation-ID']], f'agent history {history}')
+    print("Agent History Verified.")
+
+
+def verify_job_trace():
+    print("Verifying work outside a request gets a trace of its own...")
+    with app.app_context():
+        check(tracing.correlation_id() is None, 'no trace outside a request or job')
+        with tracing.job('nightly', run=1) as trace:
+            with tracing.span('step'):
+                headers = tracing.outgoing_headers()
+        check(tracing.correlation_id() is None, 'job trace ends with the job')
+    check(headers['X-Correlation-ID'] == trace.trace_id, 'job correlation ID sent to agents')
+    names = {s['name']: s for s in exported_spans(TRACE_FILE, trace.trace_id)}
+    check(set(names) == {'nightly', 'step'} and names['step']['parentSpanId'] == names['nightly']['spanId'],
+          f'job spans {list(names)}')
+    print("Job Trace Verified.")
+
+
+if __name__ == "__main__":
+    verify_headers_reach_the_agent()
+    verify_agent_records_the_id()
+    verify_job_trace()
+    print("SUCCESS: All checks passed.")
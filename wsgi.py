@@ -0,0 +1,15 @@
+"""
+WSGI entry point for multi-worker servers, configured from the environment (see config.py):
+
+    SECRET_KEY=... gunicorn -w 4 -b 0.0.0.0:5000 wsgi:application
+    waitress-serve --port 5000 --threads 8 wsgi:application
+
+Every worker runs the scheduler unless SCHEDULER_ENABLED=0; target leases make sure a
+window is executed once.
+"""
+from app import create_app, schedule_executor
+
+application = create_app()
+
+if application.config['SCHEDULER_ENABLED']:
+    schedule_executor.start()